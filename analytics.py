@@ -0,0 +1,230 @@
+"""
+指數／基金成分股重疊分析：每個資料快照建立一次「資料集 × 股票」的布林矩陣，
+重疊數、Jaccard 相似度、交集與差集都以 NumPy 向量運算完成。
+
+基金持股權重（持股比率）的前 N 大、累計權重與集中度（HHI、前十大占比）同樣每個快照計算一次；
+基金組合的穿透曝險為「基金 × 股票」稀疏權重矩陣與部位向量的乘積。
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class MembershipMatrix:
+    """
+    ids[i] 為第 i 個資料集，codes[j] 為第 j 檔股票
+    matrix[i, j] 表示資料集 i 是否持有股票 j
+    """
+
+    def __init__(self, ids: List[str], codes: List[str], matrix: np.ndarray, names: Dict[str, str]):
+        self.ids = ids
+        self.codes = np.array(codes, dtype=object)
+        self.matrix = matrix
+        self.names = names
+        self.positions = {dataset_id: i for i, dataset_id in enumerate(ids)}
+
+        # 所有資料集兩兩之間的重疊數：一次矩陣乘法
+        as_int = matrix.astype(np.int32)
+        self.counts = as_int @ as_int.T
+        self.sizes = np.diag(self.counts).copy()
+        union = self.sizes[:, None] + self.sizes[None, :] - self.counts
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.jaccard = np.where(union > 0, self.counts / union, 0.0)
+
+    @classmethod
+    def build(cls, files: Dict, datasets) -> "MembershipMatrix":
+        """由快照建立矩陣；同一 ID 只取第一個有資料的資料集"""
+        members: Dict[str, Dict[str, str]] = {}
+        for dataset in datasets:
+            data = files.get(dataset.file) or {}
+            if data and dataset.id not in members:
+                members[dataset.id] = data
+
+        names: Dict[str, str] = {}
+        for data in members.values():
+            for code, company in data.items():
+                names.setdefault(code, company)
+        codes = sorted(names)
+        column = {code: j for j, code in enumerate(codes)}
+
+        ids = list(members)
+        matrix = np.zeros((len(ids), len(codes)), dtype=bool)
+        for i, dataset_id in enumerate(ids):
+            matrix[i, [column[code] for code in members[dataset_id]]] = True
+        return cls(ids, codes, matrix, names)
+
+    def _stocks(self, mask: np.ndarray) -> Dict[str, str]:
+        return {code: self.names[code] for code in self.codes[mask]}
+
+    def pair(self, a: int, b: int) -> Dict:
+        """兩個資料集的重疊統計、交集與差集"""
+        row_a, row_b = self.matrix[a], self.matrix[b]
+        return {
+            "a": self.ids[a],
+            "b": self.ids[b],
+            "size_a": int(self.sizes[a]),
+            "size_b": int(self.sizes[b]),
+            "overlap": int(self.counts[a, b]),
+            "jaccard": round(float(self.jaccard[a, b]), 6),
+            "intersection": self._stocks(row_a & row_b),
+            "only_a": self._stocks(row_a & ~row_b),
+            "only_b": self._stocks(row_b & ~row_a)
+        }
+
+    def overlap_matrix(self, positions: Optional[List[int]] = None) -> Dict:
+        """多個資料集（預設全部）的兩兩重疊數與 Jaccard 矩陣"""
+        if positions is None:
+            positions = list(range(len(self.ids)))
+        index = np.array(positions, dtype=np.intp)
+        grid = np.ix_(index, index)
+        return {
+            "ids": [self.ids[i] for i in positions],
+            "sizes": self.sizes[index].tolist(),
+            "overlap": self.counts[grid].tolist(),
+            "jaccard": np.round(self.jaccard[grid], 6).tolist()
+        }
+
+
+class HoldingWeights:
+    """
+    各基金最新一季持股的權重（持股比率，單位 %）
+
+    所有基金的持股依基金串接成一維陣列，每檔基金的區段內依權重由大到小排列
+    （無權重的持股排在最後），offsets[f]:offsets[f + 1] 為第 f 檔基金的區段。
+    累計權重、HHI 與前十大占比在每個快照以分段的向量運算一次算完。
+    """
+
+    def __init__(self, funds: List[str], quarters: List, offsets: np.ndarray,
+                 codes: np.ndarray, names: np.ndarray, weights: np.ndarray, shares: np.ndarray,
+                 code_strings: List[str], name_strings: List[str]):
+        self.funds = funds
+        # 各基金最新一季（holdings_store.Quarter）
+        self.quarters = quarters
+        self.positions = {fund: i for i, fund in enumerate(funds)}
+        self.offsets = offsets
+        self.codes = codes
+        self.names = names
+        self.weights = weights
+        self.shares = shares
+        self.code_strings = code_strings
+        self.name_strings = name_strings
+
+        starts, lengths = offsets[:-1], np.diff(offsets)
+        known = ~np.isnan(weights)
+        filled = np.where(known, weights, 0.0)
+        self.filled = filled
+        # 每筆持股所屬的基金（稀疏矩陣的列索引）
+        self.segments = np.repeat(np.arange(len(funds)), lengths)
+        # 代號 ID -> 名稱 ID
+        self.code_names = np.full(len(code_strings), -1, dtype=np.int64)
+        self.code_names[codes] = names
+        # 區段內的名次與累計權重
+        self.ranks = np.arange(len(weights)) - np.repeat(starts, lengths)
+        cumulative = np.cumsum(filled)
+        before = np.concatenate(([0.0], cumulative))[starts]
+        # float32 權重累加的誤差會影響門檻比較，先四捨五入
+        self.cumulative = np.round(cumulative - np.repeat(before, lengths), 6)
+
+        if len(funds):
+            self.counts = lengths
+            self.weighted_counts = np.add.reduceat(known.astype(np.int64), starts)
+            self.total_weights = np.add.reduceat(filled, starts)
+            self.top10 = np.add.reduceat(np.where(self.ranks < 10, filled, 0.0), starts)
+            # HHI 以比率（0~1）計算：持股比率平方和；1 / HHI 為等效持股檔數
+            self.hhi = np.add.reduceat((filled / 100.0) ** 2, starts)
+        else:
+            self.counts = self.weighted_counts = np.zeros(0, dtype=np.int64)
+            self.total_weights = self.top10 = self.hhi = np.zeros(0)
+
+    @classmethod
+    def build(cls, history) -> "HoldingWeights":
+        """由 holdings_store.HoldingsHistory 各基金最新一季的持股建立"""
+        funds, quarters = [], []
+        for fund in history.funds:
+            quarters_of_fund = history.quarters(fund)
+            if quarters_of_fund and len(quarters_of_fund[-1].codes):
+                funds.append(fund)
+                quarters.append(quarters_of_fund[-1])
+
+        lengths = [len(quarter.codes) for quarter in quarters]
+        offsets = np.zeros(len(quarters) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if quarters:
+            codes = np.concatenate([quarter.codes for quarter in quarters])
+            names = np.concatenate([quarter.names for quarter in quarters])
+            weights = np.concatenate([quarter.weights for quarter in quarters]).astype(np.float64)
+            shares = np.concatenate([quarter.shares for quarter in quarters])
+        else:
+            codes = names = np.zeros(0, dtype=np.int32)
+            weights = shares = np.zeros(0)
+
+        # 依 (基金, 權重由大到小, 代號) 排序；NaN 視為 -inf 排在區段最後
+        segment = np.repeat(np.arange(len(quarters)), lengths)
+        order = np.lexsort((codes, -np.nan_to_num(weights, nan=-np.inf), segment))
+        return cls(funds, quarters, offsets, codes[order], names[order], weights[order], shares[order],
+                   history.codes.strings, history.names.strings)
+
+    def _round(self, value: float) -> Optional[float]:
+        return None if value != value else round(float(value), 4)
+
+    def top(self, position: int, n: Optional[int] = None, cumulative: Optional[float] = None) -> List[Dict]:
+        """
+        權重最大的持股：指定 cumulative 時取到累計權重達到該值（%）為止，
+        否則取前 n 筆（未指定時為全部）
+        """
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        if cumulative is not None:
+            count = int(np.searchsorted(self.cumulative[start:end], cumulative, side="left")) + 1
+        else:
+            count = end - start if n is None else n
+        end = min(end, start + count)
+        return [
+            {
+                "rank": int(rank) + 1,
+                "code": self.code_strings[code],
+                "name": self.name_strings[name],
+                "weight": self._round(weight),
+                "shares": None if shares != shares else int(shares),
+                "cumulative_weight": self._round(cumulated) if weight == weight else None
+            }
+            for rank, code, name, weight, shares, cumulated in zip(
+                self.ranks[start:end], self.codes[start:end], self.names[start:end],
+                self.weights[start:end], self.shares[start:end], self.cumulative[start:end])
+        ]
+
+    def concentration(self, position: int) -> Dict:
+        """單一基金的集中度；完全沒有權重資料時各項指標為 None"""
+        has_weights = bool(self.weighted_counts[position])
+        hhi = float(self.hhi[position])
+
+        def metric(value):
+            return self._round(value) if has_weights else None
+
+        return {
+            "fund": self.funds[position],
+            "fund_name": self.quarters[position].fund_name,
+            "holdings_count": int(self.counts[position]),
+            "weighted_count": int(self.weighted_counts[position]),
+            "total_weight": metric(self.total_weights[position]),
+            "top10_weight": metric(self.top10[position]),
+            "hhi": round(hhi, 6) if has_weights else None,
+            "effective_holdings": round(1.0 / hhi, 2) if has_weights and hhi > 0 else None
+        }
+
+    def exposure(self, amounts: np.ndarray) -> np.ndarray:
+        """
+        amounts[f] 為投資在第 f 檔基金的金額，回傳每個代號 ID 的穿透曝險金額
+        即 amounts @ W（W[f, s] 為基金 f 持有股票 s 的比率）：以 CSR 的轉置乘法一次算完
+        """
+        contributions = amounts[self.segments] * self.filled / 100.0
+        return np.bincount(self.codes, weights=contributions, minlength=len(self.code_strings))
+
+    def contributions(self, amounts: np.ndarray, code_ids: np.ndarray) -> Dict[int, Dict[str, float]]:
+        """指定代號的曝險來自哪些基金：{代號 ID: {基金: 金額}}"""
+        mask = np.isin(self.codes, code_ids) & (amounts[self.segments] != 0) & (self.filled > 0)
+        result: Dict[int, Dict[str, float]] = {}
+        for entry in np.flatnonzero(mask):
+            fund = int(self.segments[entry])
+            amount = float(amounts[fund] * self.filled[entry] / 100.0)
+            result.setdefault(int(self.codes[entry]), {})[self.funds[fund]] = round(amount, 2)
+        return result
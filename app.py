@@ -1,26 +1,92 @@
-from fastapi import FastAPI, HTTPException
-from typing import Dict, Optional, List
-import json
-import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from typing import Callable, Dict, Optional, List, Tuple
+import math
+import time
+
+import numpy as np
+
+from catalog import DATA_DIR, Snapshot, StockCatalog
+from crawler_metrics import read_runs, render_runs
+from holdings_store import period_label
+from metrics import IN_FLIGHT, REGISTRY, Gauge, observe_request
+from paging import MAX_PAGE_SIZE, Records, ndjson_response, paginated, parse_fields
+from response_cache import cached_response
+
+# 批次查詢一次最多的股票代號數
+MAX_BATCH_CODES = 5000
+
+# 穿透曝險一次最多的部位數
+MAX_PORTFOLIO_POSITIONS = 5000
+
+# 所有資料於啟動時載入記憶體，檔案變動時自動熱重載
+catalog = StockCatalog(DATA_DIR)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await catalog.start()
+    yield
+    await catalog.stop()
 
 app = FastAPI(
     title="Stock Index API",
-    description="提供台股指數與美股 SP500、NASDAQ100、道瓊斯指數成分股查詢服務"
+    description="提供台股指數與美股 SP500、NASDAQ100、道瓊斯指數成分股查詢服務",
+    lifespan=lifespan
 )
 
-# 數據目錄
-DATA_DIR = "data"
+def _data_age() -> Optional[float]:
+    updated_at = catalog.snapshot.data_updated_at
+    return None if updated_at is None else max(0.0, time.time() - updated_at)
 
-# 定義美股指數列表
-US_INDICES = ["SP500", "NASDAQ100", "DOWJONES"]
+REGISTRY.register(Gauge("stock_api_snapshot_version", "Version of the data snapshot being served",
+                        callback=lambda: catalog.snapshot.version))
+REGISTRY.register(Gauge("stock_api_snapshot_loaded_timestamp_seconds", "Time the data snapshot was loaded",
+                        callback=lambda: catalog.snapshot.loaded_at))
+REGISTRY.register(Gauge("stock_api_data_age_seconds", "Age of the newest data file in the snapshot",
+                        callback=_data_age))
+# 爬蟲寫在 .cache/metrics/ 的最新執行紀錄
+REGISTRY.add_collector(lambda: render_runs(read_runs()))
 
-def load_stock_data(file_name: str) -> Dict:
-    """載入股票數據"""
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """記錄每個路由（以路由樣板為標籤，避免路徑參數造成大量時間序列）的延遲與回應大小"""
+    IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    response = None
     try:
-        with open(os.path.join(DATA_DIR, file_name), 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        size = response.headers.get("content-length") if response is not None else None
+        observe_request(request.method, route.path if route else "unmatched", status,
+                        time.perf_counter() - started, int(size) if size else None)
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    """
+    與 FastAPI 預設的 422 相同，但 NaN / inf 輸入值改以字串輸出（否則錯誤本身無法序列化而變成 500）；
+    /exposure 的部位不合法時與 GET 形式一致回 400
+    """
+    errors = []
+    for error in exc.errors():
+        value = error.get("input")
+        if isinstance(value, float) and not math.isfinite(value):
+            error = {**error, "input": str(value)}
+        errors.append(error)
+    status = 400 if request.url.path == "/exposure" else 422
+    return JSONResponse(status_code=status, content={"detail": jsonable_encoder(errors)})
+
+def respond(request: Request, snapshot: Snapshot, key: str, build: Callable[[], Dict]):
+    """以快照內預先序列化的內容回應（含 ETag / 304 與壓縮版本）；build 只在快取未命中時呼叫"""
+    return cached_response(request, snapshot.responses.get(key, build))
 
 @app.get("/")
 async def read_root():
@@ -30,114 +96,509 @@ async def read_root():
         "available_endpoints": [
             "/indices",
             "/stocks/{index_name}",
+            "/stocks/batch",
             "/stock/{stock_code}",
             "/search/{company_name}",
-            "/market/{market}"
+            "/entities",
+            "/entities/{entity}",
+            "/suggest/{prefix}",
+            "/market/{market}",
+            "/funds",
+            "/funds/{fund_id}/history",
+            "/funds/{fund_id}/holdings",
+            "/funds/{fund_id}/top",
+            "/funds/{fund_id}/concentration",
+            "/funds/concentration",
+            "/exposure",
+            "/stock/{stock_code}/funds",
+            "/changes",
+            "/metrics",
+            "/overlap",
+            "/overlap/{index_a}/{index_b}"
         ]
     }
 
-@app.get("/indices")
-async def get_indices():
-    """獲取所有可用的指數列表"""
-    indices = {
-        "TW": ["0050", "0100"],
-        "US": US_INDICES
+def dataset_info(snapshot: Snapshot, dataset) -> Dict:
+    """資料集的中繼資料（每個快照只在建立快取回應時計算一次）"""
+    return {
+        "id": dataset.id,
+        "market": dataset.market,
+        "type": dataset.type,
+        "name": dataset.name,
+        "count": snapshot.row_count(dataset.file)
     }
-    return {"indices": indices}
+
+@app.get("/indices")
+async def get_indices(request: Request):
+    """獲取所有可用的指數與基金列表（依 data/ 目前的檔案與 funds_summary.json）"""
+    snapshot = catalog.snapshot
+    registry = snapshot.registry
+    return respond(request, snapshot, "/indices", lambda: {
+        "indices": registry.ids(),
+        "datasets": [dataset_info(snapshot, dataset) for dataset in registry.by_id.values()]
+    })
+
+@app.get("/funds")
+async def get_funds(request: Request):
+    """所有 MOPS 基金（funds_summary.json）"""
+    snapshot = catalog.snapshot
+    funds = [dataset for dataset in snapshot.registry.market("TW") if dataset.type == "fund"]
+    return respond(request, snapshot, "/funds", lambda: {
+        "funds": [dataset_info(snapshot, dataset) for dataset in funds]
+    })
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus 文字格式的指標"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+class StockBatchRequest(BaseModel):
+    codes: List[str]
+
+def lookup_stocks(codes: List[str]) -> Dict:
+    """批次查詢多個股票代號，查無的代號列於 not_found 而不使整個請求失敗"""
+    codes = list(dict.fromkeys(code.strip() for code in codes if code.strip()))
+    if len(codes) > MAX_BATCH_CODES:
+        raise HTTPException(status_code=400,
+                            detail=f"Too many codes: {len(codes)} (max {MAX_BATCH_CODES})")
+
+    snapshot = catalog.snapshot
+    membership = snapshot.membership
+    entities = snapshot.entities
+    results, not_found = {}, []
+    for code in codes:
+        markets = membership.get(code)
+        if not markets:
+            not_found.append(code)
+            continue
+        first = next(iter(markets.values()))[0]
+        entity = entities.entity_of(code)
+        results[code] = {"company": first["company"], "entity": entity.id if entity else None,
+                         "memberships": markets}
+    return {"results": results, "not_found": not_found}
+
+@app.get("/stocks/batch")
+async def get_stocks_batch(codes: str = Query(..., description="以逗號分隔的股票代號")):
+    """批次查詢股票所屬指數與基金（GET 形式）"""
+    return lookup_stocks(codes.split(","))
+
+@app.post("/stocks/batch")
+async def post_stocks_batch(body: StockBatchRequest):
+    """批次查詢股票所屬指數與基金"""
+    return lookup_stocks(body.codes)
+
+# 成分股逐筆輸出時的欄位
+STOCK_FIELDS = ("code", "company")
+MARKET_FIELDS = ("index", "code", "company")
+
+def is_incremental(format: str, cursor: Optional[str], limit: Optional[int], fields: Optional[str]) -> bool:
+    """帶了串流或分頁參數時逐筆輸出，否則回傳原本（預先序列化）的完整回應"""
+    return format == "ndjson" or cursor is not None or limit is not None or fields is not None
+
+def stream_or_page(snapshot: Snapshot, records, available, format: str, cursor: Optional[str],
+                   limit: Optional[int], fields: Optional[str], **meta):
+    selected = parse_fields(fields, available)
+    if format == "ndjson":
+        return ndjson_response(records, snapshot.fingerprint, cursor, limit, selected)
+    return paginated(records, snapshot.fingerprint, cursor, limit, selected, **meta)
 
 @app.get("/stocks/{index_name}")
-async def get_index_stocks(index_name: str):
-    """獲取指定指數的所有成分股"""
-    index_name = index_name.upper()
-    
-    if index_name in US_INDICES:
-        data = load_stock_data(f"{index_name.lower()}_data.json")
-        if not data:
-            raise HTTPException(status_code=404, detail=f"{index_name} data not found")
-        return {"market": "US", "index": index_name, "stocks": data}
-    elif index_name in ["0050", "0100"]:
-        data = load_stock_data(f"stock_data_{index_name}.json")
-        if not data:
-            raise HTTPException(status_code=404, detail=f"Data for {index_name} not found")
-        return {"market": "TW", "index": index_name, "stocks": data}
-    else:
+async def get_index_stocks(index_name: str, request: Request,
+                           format: str = Query("json", pattern="^(json|ndjson)$",
+                                               description="ndjson 時每筆成分股一行串流輸出"),
+                           cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+                           limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                           fields: Optional[str] = Query(None, description="以逗號分隔的欄位：code,company")):
+    """獲取指定指數或基金的所有成分股"""
+    snapshot = catalog.snapshot
+    dataset = snapshot.registry.resolve(index_name)
+    if dataset is None:
         raise HTTPException(status_code=404, detail="Invalid index name")
+    # 只檢查筆數，快取命中時不必還原整個成分股表
+    if not snapshot.row_count(dataset.file):
+        raise HTTPException(status_code=404, detail=f"{dataset.id} data not found")
+    if is_incremental(format, cursor, limit, fields):
+        records = Records([({}, snapshot.rows(dataset.file))])
+        return stream_or_page(snapshot, records, STOCK_FIELDS, format, cursor, limit, fields,
+                              market=dataset.market, index=dataset.id, type=dataset.type, name=dataset.name)
+    return respond(request, snapshot, f"/stocks/{dataset.id}", lambda: {
+        "market": dataset.market,
+        "index": dataset.id,
+        "type": dataset.type,
+        "name": dataset.name,
+        "stocks": snapshot.get(dataset.file)
+    })
 
 @app.get("/stock/{stock_code}")
 async def get_stock_info(stock_code: str):
-    """根據股票代號查詢公司資訊"""
-    result = {}
-    
-    # 檢查台股
-    tw_indices = ["0050", "0100"]
-    for index in tw_indices:
-        data = load_stock_data(f"stock_data_{index}.json")
-        if stock_code in data:
-            result["TW"] = {
-                "index": index,
-                "company": data[stock_code]
-            }
-    
-    # 檢查美股
-    for index in US_INDICES:
-        data = load_stock_data(f"{index.lower()}_data.json")
-        if stock_code in data:
-            result["US"] = {
-                "index": index,
-                "company": data[stock_code]
-            }
-
+    """根據股票代號查詢公司資訊，列出所有包含此股票的指數與基金"""
+    result = catalog.snapshot.membership.get(stock_code)
     if not result:
         raise HTTPException(status_code=404, detail=f"Stock {stock_code} not found")
     return result
 
+def entity_info(entity) -> Dict:
+    return {
+        "id": entity.id,
+        "market": entity.market,
+        "name": entity.name,
+        "codes": list(entity.codes),
+        "aliases": list(entity.aliases)
+    }
+
+@app.get("/entities")
+async def group_entities(codes: str = Query(..., description="以逗號分隔的股票代號")):
+    """將多個代號依公司實體分組（例如 GOOG 與 GOOGL 屬於同一家公司）"""
+    codes = list(dict.fromkeys(code.strip() for code in codes.split(",") if code.strip()))
+    if len(codes) > MAX_BATCH_CODES:
+        raise HTTPException(status_code=400,
+                            detail=f"Too many codes: {len(codes)} (max {MAX_BATCH_CODES})")
+    entities = catalog.snapshot.entities
+    groups: Dict[str, Dict] = {}
+    not_found = []
+    for code in codes:
+        entity = entities.entity_of(code)
+        if entity is None:
+            not_found.append(code)
+            continue
+        group = groups.setdefault(entity.id, {"id": entity.id, "name": entity.name, "codes": []})
+        group["codes"].append(code)
+    return {"entities": list(groups.values()), "not_found": not_found}
+
+@app.get("/entities/{key}")
+async def get_entity(key: str):
+    """公司實體（實體 ID 或任一代號）：各種名稱、所有股份類別的代號，以及依資料集去重後的所屬指數與基金"""
+    snapshot = catalog.snapshot
+    entity = snapshot.entities.resolve(key)
+    if entity is None:
+        raise HTTPException(status_code=404, detail=f"Entity {key} not found")
+    markets: Dict[str, Dict[str, Dict]] = {}
+    for code in entity.codes:
+        for market, entries in (snapshot.membership.get(code) or {}).items():
+            datasets = markets.setdefault(market, {})
+            for entry in entries:
+                dataset = datasets.setdefault(entry["index"], {
+                    "type": entry["type"], "index": entry["index"], "name": entry["name"], "codes": []})
+                dataset["codes"].append(code)
+    return {**entity_info(entity),
+            "memberships": {market: list(datasets.values()) for market, datasets in markets.items()}}
+
+def format_hit(doc) -> Dict:
+    """搜尋結果的輸出格式"""
+    return {
+        "code": doc.code,
+        "company": doc.company,
+        "market": doc.market,
+        "indices": list(doc.indices)
+    }
+
 @app.get("/search/{company_name}")
-async def search_company(company_name: str):
-    """根據公司名稱搜尋股票（模糊搜尋）"""
-    result = {"TW": {}, "US": {}}
-    
-    # 搜尋台股
-    tw_indices = ["0050", "0100"]
-    for index in tw_indices:
-        data = load_stock_data(f"stock_data_{index}.json")
-        matches = {code: name for code, name in data.items() 
-                  if company_name.lower() in name.lower()}
-        if matches:
-            result["TW"][index] = matches
-    
-    # 搜尋美股
-    for index in US_INDICES:
-        data = load_stock_data(f"{index.lower()}_data.json")
-        matches = {code: name for code, name in data.items() 
-                  if company_name.lower() in name.lower()}
-        if matches:
-            result["US"][index] = matches
-
-    if not result["TW"] and not result["US"]:
+async def search_company(company_name: str,
+                         limit: int = Query(20, ge=1, le=100),
+                         offset: int = Query(0, ge=0)):
+    """根據公司名稱搜尋股票（模糊搜尋），依相關度排序並分頁"""
+    total, hits = catalog.snapshot.search.search(company_name, offset=offset, limit=limit)
+    if not total:
         raise HTTPException(status_code=404, 
                           detail=f"No matches found for {company_name}")
-    return result
+    return {
+        "query": company_name,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "results": [format_hit(doc) for doc in hits]
+    }
+
+@app.get("/suggest/{prefix}")
+async def suggest_company(prefix: str, limit: int = Query(10, ge=1, le=50)):
+    """輸入提示：依公司名稱、英文單字或股票代號前綴補全"""
+    hits = catalog.snapshot.search.suggest(prefix, limit=limit)
+    return {"prefix": prefix, "results": [format_hit(doc) for doc in hits]}
 
 @app.get("/market/{market}")
-async def get_market_stocks(market: str):
-    """獲取指定市場的所有股票"""
+async def get_market_stocks(market: str, request: Request,
+                            format: str = Query("json", pattern="^(json|ndjson)$",
+                                                description="ndjson 時每筆成分股一行串流輸出"),
+                            cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+                            limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                            fields: Optional[str] = Query(None, description="以逗號分隔的欄位：index,code,company")):
+    """獲取指定市場所有指數與基金的成分股"""
     market = market.upper()
-    result = {}
-    
-    if market == "TW":
-        for index in ["0050", "0100"]:
-            data = load_stock_data(f"stock_data_{index}.json")
-            if data:
-                result[index] = data
-    elif market == "US":
-        for index in US_INDICES:
-            data = load_stock_data(f"{index.lower()}_data.json")
+    snapshot = catalog.snapshot
+    datasets = snapshot.registry.market(market)
+    if not datasets:
+        raise HTTPException(status_code=404, detail="Invalid market")
+
+    if is_incremental(format, cursor, limit, fields):
+        # 各資料集依序串接，不組出整個市場的巢狀 dict
+        records = Records([({"index": dataset.id}, snapshot.rows(dataset.file)) for dataset in datasets])
+        return stream_or_page(snapshot, records, MARKET_FIELDS, format, cursor, limit, fields, market=market)
+
+    def build():
+        result = {}
+        for dataset in datasets:
+            data = snapshot.get(dataset.file)
             if data:
-                result[index] = data
+                result[dataset.id] = data
+        return {"market": market, "data": result}
+    return respond(request, snapshot, f"/market/{market}", build)
+
+def resolve_datasets(snapshot: Snapshot, ids: List[str]) -> List[int]:
+    """ID 經路由表對應到重疊矩陣中的位置"""
+    positions = []
+    for dataset_id in ids:
+        dataset = snapshot.registry.resolve(dataset_id)
+        position = snapshot.overlap.positions.get(dataset.id) if dataset else None
+        if position is None:
+            raise HTTPException(status_code=404, detail=f"Index or fund {dataset_id} not found")
+        positions.append(position)
+    return positions
+
+@app.get("/overlap")
+async def get_overlap_matrix(ids: Optional[str] = Query(None, description="以逗號分隔的指數／基金，預設全部")):
+    """所有（或指定）指數與基金兩兩之間的重疊數與 Jaccard 相似度"""
+    snapshot = catalog.snapshot
+    positions = None
+    if ids:
+        positions = resolve_datasets(snapshot, [i.strip() for i in ids.split(",") if i.strip()])
+    return snapshot.overlap.overlap_matrix(positions)
+
+@app.get("/overlap/{index_a}/{index_b}")
+async def get_overlap_pair(index_a: str, index_b: str):
+    """兩個指數／基金的重疊數、Jaccard 相似度、交集與差集"""
+    snapshot = catalog.snapshot
+    a, b = resolve_datasets(snapshot, [index_a, index_b])
+    return snapshot.overlap.pair(a, b)
+
+def quarter_info(quarter) -> Dict:
+    return {
+        "period": period_label(quarter.year, quarter.season),
+        "year": quarter.year,
+        "season": quarter.season,
+        "holdings_count": len(quarter.codes)
+    }
+
+def fund_key(snapshot: Snapshot, fund_id: str) -> str:
+    """
+    基金 ID、ETF 代碼或基金名稱（不分大小寫）-> 持股歷史與權重使用的基金 ID
+    不在目前資料集中的基金（例如只有回補歷史）沿用原本的 ID
+    """
+    dataset = snapshot.registry.resolve_fund(fund_id)
+    return dataset.id if dataset is not None else fund_id.strip()
+
+@app.get("/funds/{fund_id}/history")
+async def get_fund_history(fund_id: str, holdings: bool = Query(False, description="是否附上每季持股明細")):
+    """基金所有已儲存季度的持股"""
+    snapshot = catalog.snapshot
+    fund_id = fund_key(snapshot, fund_id)
+    history = snapshot.history
+    quarters = history.quarters(fund_id)
+    if not quarters:
+        raise HTTPException(status_code=404, detail=f"No history for fund {fund_id}")
+    result = []
+    for quarter in quarters:
+        entry = quarter_info(quarter)
+        if holdings:
+            entry["holdings"] = history.holdings(quarter)
+        result.append(entry)
+    return {"fund": fund_id, "fund_name": quarters[-1].fund_name, "quarters": result}
+
+@app.get("/funds/{fund_id}/holdings")
+async def get_fund_holdings_as_of(fund_id: str,
+                                  year: Optional[int] = Query(None, description="民國年"),
+                                  season: Optional[int] = Query(None, ge=1, le=4)):
+    """基金於指定季度（含）以前最近一次公布的持股；未指定時為最新一季"""
+    if season is not None and year is None:
+        raise HTTPException(status_code=400, detail="season requires year")
+    snapshot = catalog.snapshot
+    fund_id = fund_key(snapshot, fund_id)
+    history = snapshot.history
+    quarters = history.quarters(fund_id)
+    if year is None:
+        quarter = quarters[-1] if quarters else None
     else:
-        raise HTTPException(status_code=404, detail="Invalid market")
+        quarter = history.as_of(fund_id, year, season or 4)
+    if quarter is None:
+        raise HTTPException(status_code=404, detail=f"No holdings for fund {fund_id} as of the given quarter")
+    return {"fund": fund_id, "fund_name": quarter.fund_name, **quarter_info(quarter),
+            "holdings": history.holdings(quarter)}
 
-    if not result:
+@app.get("/funds/concentration")
+async def get_funds_concentration(request: Request):
+    """所有基金最新一季持股的集中度：HHI、等效持股檔數、前十大權重合計"""
+    snapshot = catalog.snapshot
+    weights = snapshot.weights
+    return respond(request, snapshot, "/funds/concentration", lambda: {
+        "funds": [{**weights.concentration(i), "period": period_label(quarter.year, quarter.season)}
+                  for i, quarter in enumerate(weights.quarters)]
+    })
+
+def has_fund_file(snapshot: Snapshot, fund_id: str) -> bool:
+    """
+    基金在目前資料集中（有 fund_*.json）；fund_*.json 只有代號與名稱，
+    持股比率只存在持股歷史，因此這類基金可能沒有權重資料
+    """
+    return snapshot.registry.resolve_fund(fund_id) is not None
+
+def fund_weights_position(snapshot: Snapshot, fund_id: str) -> int:
+    position = snapshot.weights.positions.get(fund_key(snapshot, fund_id))
+    if position is None:
+        if has_fund_file(snapshot, fund_id):
+            raise HTTPException(status_code=404,
+                                detail=f"No weight data for fund {fund_id} (holdings history has no quarter for it)")
+        raise HTTPException(status_code=404, detail=f"No holdings for fund {fund_id}")
+    return position
+
+@app.get("/funds/{fund_id}/top")
+async def get_fund_top_holdings(fund_id: str,
+                                n: int = Query(10, ge=1, le=MAX_PAGE_SIZE, description="前 N 大持股"),
+                                cumulative: Optional[float] = Query(None, gt=0, le=100,
+                                                                    description="取到累計權重（%）達到此值為止，指定時忽略 n")):
+    """基金最新一季依持股比率排序的前 N 大持股，或累計權重達到門檻的持股"""
+    snapshot = catalog.snapshot
+    weights = snapshot.weights
+    position = fund_weights_position(snapshot, fund_id)
+    quarter = weights.quarters[position]
+    return {
+        "fund": weights.funds[position],
+        "fund_name": quarter.fund_name,
+        "period": period_label(quarter.year, quarter.season),
+        "holdings": weights.top(position, n=None if cumulative is not None else n, cumulative=cumulative)
+    }
+
+@app.get("/funds/{fund_id}/concentration")
+async def get_fund_concentration(fund_id: str):
+    """基金最新一季持股的集中度"""
+    snapshot = catalog.snapshot
+    weights = snapshot.weights
+    position = fund_weights_position(snapshot, fund_id)
+    quarter = weights.quarters[position]
+    return {**weights.concentration(position), "period": period_label(quarter.year, quarter.season)}
+
+class ExposurePosition(BaseModel):
+    fund: str
+    # 金額必須為正的有限數值（NaN / inf 無法輸出成 JSON，負數會讓比率失去意義）
+    amount: float = Field(gt=0, allow_inf_nan=False)
+
+class ExposureRequest(BaseModel):
+    positions: List[ExposurePosition]
+
+def portfolio_exposure(positions: List[Tuple[str, float]], limit: int, breakdown: bool) -> Dict:
+    """
+    基金組合對每檔股票的穿透曝險（以各基金最新一季的持股比率計算）
+    同一基金出現多次時金額相加；有持股檔案但持股歷史中沒有權重的基金列於 no_weight_data，
+    完全查無的基金列於 not_found
+    """
+    if len(positions) > MAX_PORTFOLIO_POSITIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Too many positions: {len(positions)} (max {MAX_PORTFOLIO_POSITIONS})")
+    snapshot = catalog.snapshot
+    weights = snapshot.weights
+    amounts = np.zeros(len(weights.funds))
+    not_found, no_weight_data = [], []
+    for fund_id, amount in positions:
+        position = weights.positions.get(fund_key(snapshot, fund_id))
+        if position is None:
+            (no_weight_data if has_fund_file(snapshot, fund_id) else not_found).append(fund_id)
+            continue
+        # 溢位在下方檢查
+        with np.errstate(over="ignore"):
+            amounts[position] += amount
+    if not np.isfinite(amounts).all():
+        raise HTTPException(status_code=400, detail="Position amounts are too large")
+
+    exposure = weights.exposure(amounts)
+    held = np.flatnonzero(exposure)
+    top = held[np.argsort(-exposure[held], kind="stable")][:limit]
+    total = float(amounts.sum())
+    contributions = weights.contributions(amounts, top) if breakdown else {}
+
+    stocks = []
+    for code_id in top.tolist():
+        entry = {
+            "code": weights.code_strings[code_id],
+            "name": weights.name_strings[weights.code_names[code_id]],
+            "exposure": round(float(exposure[code_id]), 2),
+            "weight": round(float(exposure[code_id]) / total * 100, 4) if total else None
+        }
+        if breakdown:
+            entry["funds"] = contributions.get(code_id, {})
+        stocks.append(entry)
+
+    covered = float(exposure.sum())
+    return {
+        "total": round(total, 2),
+        "covered": round(covered, 2),
+        "coverage": round(covered / total * 100, 4) if total else None,
+        "stocks_count": int(len(held)),
+        "stocks": stocks,
+        "not_found": not_found,
+        "no_weight_data": no_weight_data
+    }
+
+@app.get("/exposure")
+async def get_exposure(positions: str = Query(..., description="以逗號分隔的 基金:金額，例如 0050:100000,0056:50000"),
+                       limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                       breakdown: bool = Query(False, description="是否附上每檔股票來自各基金的金額")):
+    """基金組合的穿透曝險（GET 形式）"""
+    parsed = []
+    for item in positions.split(","):
+        if not item.strip():
+            continue
+        fund, _, amount = item.rpartition(":")
+        try:
+            value = float(amount)
+            if not fund.strip() or not (math.isfinite(value) and value > 0):
+                raise ValueError(item)
+            parsed.append((fund.strip(), value))
+        except ValueError:
+            raise HTTPException(status_code=400,
+                                detail=f"Invalid position {item!r}, expected fund:amount with a positive amount")
+    return portfolio_exposure(parsed, limit, breakdown)
+
+@app.post("/exposure")
+async def post_exposure(body: ExposureRequest,
+                        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                        breakdown: bool = Query(False, description="是否附上每檔股票來自各基金的金額")):
+    """基金組合的穿透曝險：彙總各基金持股後，每檔股票的曝險金額與占組合的比率"""
+    return portfolio_exposure([(p.fund, p.amount) for p in body.positions], limit, breakdown)
+
+@app.get("/stock/{stock_code}/funds")
+async def get_stock_funds_as_of(stock_code: str,
+                                year: int = Query(..., description="民國年"),
+                                season: int = Query(4, ge=1, le=4)):
+    """指定季度時持有此股票的基金（各基金取該季含以前最近一次的持股）"""
+    history = catalog.snapshot.history
+    funds = []
+    for fund, quarter, position in history.holders_as_of(stock_code, year, season):
+        weight = float(quarter.weights[position])
+        funds.append({
+            "fund": fund,
+            "fund_name": quarter.fund_name,
+            "period": period_label(quarter.year, quarter.season),
+            "weight": None if weight != weight else round(weight, 4)
+        })
+    if not funds:
         raise HTTPException(status_code=404,
-                          detail=f"No data found for market {market}")
-    return {"market": market, "data": result}
\ No newline at end of file
+                            detail=f"No fund held {stock_code} as of {period_label(year, season)}")
+    return {"stock_code": stock_code, "as_of": period_label(year, season), "funds": funds}
+
+@app.get("/changes")
+async def get_changes(since: int = Query(0, ge=0, description="上次取得的游標（seq）"),
+                      limit: int = Query(100, ge=1, le=1000),
+                      dataset: Optional[str] = Query(None, description="只列出指定指數／基金")):
+    """成分股變動紀錄（新增、移除、更名），以游標遞增分頁"""
+    snapshot = catalog.snapshot
+    if dataset is not None:
+        # 與其他端點相同：不分大小寫，基金也可用 ETF 代碼或名稱
+        resolved = snapshot.registry.resolve(dataset)
+        if resolved is None:
+            raise HTTPException(status_code=404, detail=f"Index or fund {dataset} not found")
+        dataset = resolved.id
+    changes = snapshot.changes
+    entries, cursor = changes.since(since, limit, dataset)
+    return {
+        "changes": entries,
+        "cursor": cursor,
+        "has_more": cursor < changes.latest
+    }
@@ -0,0 +1,179 @@
+"""
+API 負載測試（完全離線）
+
+    python bench/bench_api.py                      # 行程內（ASGI）測試
+    python bench/bench_api.py --server             # 另啟本機 uvicorn 測試
+    python bench/bench_api.py --concurrency 1 --concurrency 32 --requests 500
+
+對每個路由在各並行數下送出固定數量的請求，回報 p50 / p95 / p99 延遲與每秒請求數。
+資料使用 data/ 目前的內容。
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from common import ROOT_DIR
+
+# 涵蓋 app.py 每一類路由的代表請求
+ROUTES = [
+    "/",
+    "/indices",
+    "/stocks/SP500",
+    "/stocks/0050",
+    "/funds",
+    "/stocks/batch?codes=2330,2317,2454,AAPL,MSFT,NVDA,GOOGL,ZZZZ",
+    "/stock/2330",
+    "/stock/AAPL",
+    "/entities/GOOG",
+    "/search/台積",
+    "/search/inc?limit=50",
+    "/suggest/al",
+    "/market/US",
+    "/market/TW",
+    "/market/US?format=ndjson",
+    "/market/US?limit=100&fields=code",
+    "/overlap",
+    "/overlap/SP500/NASDAQ100",
+    "/changes",
+]
+
+DEFAULT_CONCURRENCY = [1, 8, 32]
+DEFAULT_REQUESTS = 200
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """最近排名法的百分位數"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float, statuses: Dict[int, int]) -> Dict:
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+async def drive(client: httpx.AsyncClient, path: str, concurrency: int, total: int) -> Dict:
+    """以 concurrency 個工作者共送出 total 個請求"""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+async def run_routes(client: httpx.AsyncClient, mode: str, routes, levels, total) -> Dict[str, Dict]:
+    results = {}
+    for path in routes:
+        # 預熱：讓快照內的回應快取先建立
+        await client.get(path)
+        for concurrency in levels:
+            result = await drive(client, path, concurrency, total)
+            results[f"api.{mode}.{path}.c{concurrency}"] = result
+            print(f"{mode:<9} c={concurrency:<3} {path:<60} "
+                  f"p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+                  f"p99={result['p99_ms']:8.2f}ms {result['rps'] or 0:9.1f} req/s")
+    return results
+
+
+async def bench_in_process(routes, levels, total) -> Dict[str, Dict]:
+    """以 ASGITransport 直接呼叫 FastAPI app，不經過網路"""
+    os.chdir(ROOT_DIR)
+    import app as app_module
+
+    await app_module.catalog.start()
+    try:
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_routes(client, "inprocess", routes, levels, total)
+    finally:
+        await app_module.catalog.stop()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/indices")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("uvicorn did not become ready")
+
+
+async def bench_server(routes, levels, total, workers: int = 1) -> Dict[str, Dict]:
+    """啟動本機 uvicorn 後以 HTTP 測試"""
+    port = _free_port()
+    env = dict(os.environ, CATALOG_RELOAD_INTERVAL="0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT_DIR, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await _wait_ready(base_url)
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+            return await run_routes(client, "server", routes, levels, total)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def run(server: bool = False, levels=None, total: int = DEFAULT_REQUESTS, routes=None,
+        workers: int = 1) -> Dict[str, Dict]:
+    levels = levels or DEFAULT_CONCURRENCY
+    routes = routes or ROUTES
+    if server:
+        return asyncio.run(bench_server(routes, levels, total, workers))
+    return asyncio.run(bench_in_process(routes, levels, total))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 負載測試")
+    parser.add_argument("--server", action="store_true", help="啟動本機 uvicorn 並以 HTTP 測試")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn 工作行程數（--server）")
+    parser.add_argument("--concurrency", type=int, action="append", default=[],
+                        help="並行數（可重複指定，預設 1 8 32）")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS,
+                        help="每個路由在每個並行數下的請求數")
+    parser.add_argument("--route", action="append", default=[], help="只測試指定路由")
+    args = parser.parse_args()
+    run(args.server, args.concurrency, args.requests, args.route, args.workers)
+
+
+if __name__ == "__main__":
+    main()
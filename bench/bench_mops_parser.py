@@ -0,0 +1,63 @@
+"""
+比較 MOPS 基金持股的兩種解析引擎（legacy: BeautifulSoup + pandas；stream: lxml 單次掃描）
+
+    python bench/bench_mops_parser.py                  # 使用 fixtures/ 與合成資料
+    python bench/bench_mops_parser.py --fixture x.html # 指定錄製的回應
+
+先確認兩者在每個測試檔上的輸出完全相同，再比較耗時。
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import statistics
+
+from common import FIXTURE_DIR, load_script, time_call
+from mops_fixture import build_fixture
+
+mops = load_script("crawler-mops-individual.py", "crawler_mops_individual")
+
+
+def run_parser(engine: str, html: str):
+    # 解析器會印出找到的基金，測量時關閉輸出
+    with contextlib.redirect_stdout(io.StringIO()):
+        return list(mops.PARSERS[engine](html))
+
+
+def bench_case(name: str, html: str, repeat: int):
+    legacy, legacy_times = time_call(run_parser, "legacy", html, repeat=repeat)
+    stream, stream_times = time_call(run_parser, "stream", html, repeat=repeat)
+    if legacy != stream:
+        raise SystemExit(f"{name}: stream parser output differs from legacy parser")
+
+    legacy_ms = statistics.median(legacy_times) * 1000
+    stream_ms = statistics.median(stream_times) * 1000
+    print(f"{name:<28} {len(html) / 1024:9.0f} KB {len(stream):6d} funds "
+          f"{legacy_ms:10.1f} ms {stream_ms:10.1f} ms {legacy_ms / stream_ms:7.1f}x")
+    return {"case": name, "bytes": len(html), "funds": len(stream),
+            "legacy_ms": legacy_ms, "stream_ms": stream_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MOPS 解析器基準測試")
+    parser.add_argument("--fixture", action="append", default=[],
+                        help="錄製的 t78sb04 回應（可重複指定）")
+    parser.add_argument("--scale", type=int, action="append", default=[],
+                        help="合成資料的基金倍數（預設 1 與 10）")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = []
+    for path in args.fixture or sorted(glob.glob(os.path.join(FIXTURE_DIR, "mops_*.html"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            cases.append((os.path.basename(path), f.read()))
+    for scale in args.scale or [1, 10]:
+        cases.append((f"synthetic x{scale}", build_fixture(scale)))
+
+    print(f"{'case':<28} {'size':>12} {'':>12} {'legacy':>13} {'stream':>13} {'speedup':>8}")
+    return [bench_case(name, html, args.repeat) for name, html in cases]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+爬蟲解析器的基準測試（完全離線）
+
+- parse_individual_funds：fixtures/ 下錄製的 MOPS 回應，以及基金數 1×、10×、100× 的合成回應
+  （含寫入暫存世代與發布，每次在全新的暫存 data/ 目錄中執行）
+- parse_stock_table：slickcharts 頁面，以及成分股數 10×、100× 的合成頁面
+
+    python bench/bench_parsers.py
+    python bench/bench_parsers.py --engine legacy --scale 10
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict
+
+import mops_fixture
+import slickcharts_fixture
+from common import DATA_DIR, FIXTURE_DIR, load_script
+
+DEFAULT_SCALES = [1, 10, 100]
+
+
+def _fixtures(pattern: str):
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, pattern))):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield os.path.basename(path), f.read()
+
+
+def _stats(samples, size: int, records: int) -> Dict:
+    median = statistics.median(samples)
+    return {
+        "bytes": size,
+        "records": records,
+        "median_ms": round(median * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "mb_per_s": round(size / 1024 / 1024 / median, 2) if median > 0 else None,
+    }
+
+
+def bench_mops(html: str, engine: str, repeat: int) -> Dict:
+    mops = load_script("crawler-mops-individual.py", "crawler_mops_individual")
+    samples = []
+    funds = 0
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp()
+        data_dir = os.path.join(workdir, "data")
+        shutil.copytree(DATA_DIR, data_dir, ignore=shutil.ignore_patterns("generations", "node_modules"))
+        mops.DATA_DIR = data_dir
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                funds = len(mops.parse_individual_funds(html, 114, 1, engine=engine))
+                samples.append(time.perf_counter() - started)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return _stats(samples, len(html.encode("utf-8")), funds)
+
+
+def bench_slickcharts(html: str, repeat: int) -> Dict:
+    crawler = load_script("crawler-i18n.py", "crawler_i18n")
+    samples = []
+    rows = 0
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            rows = len(crawler.parse_stock_table(html, "sp500") or {})
+            samples.append(time.perf_counter() - started)
+    return _stats(samples, len(html.encode("utf-8")), rows)
+
+
+def _report(key: str, result: Dict):
+    print(f"{key:<48} {result['bytes'] / 1024:10.0f} KB {result['records']:7d} rec "
+          f"{result['median_ms']:10.1f} ms {result['mb_per_s'] or 0:8.2f} MB/s")
+
+
+def run(scales=None, engine: str = "stream", repeat: int = 3) -> Dict[str, Dict]:
+    scales = scales or DEFAULT_SCALES
+    results = {}
+
+    cases = list(_fixtures("mops_*.html"))
+    cases += [(f"synthetic_x{scale}", mops_fixture.build_fixture(scale)) for scale in scales]
+    for name, html in cases:
+        key = f"parser.mops.{engine}.{name}"
+        results[key] = bench_mops(html, engine, repeat)
+        _report(key, results[key])
+
+    cases = list(_fixtures("slickcharts_*.html"))
+    cases += [(f"synthetic_x{scale}", slickcharts_fixture.build_fixture(scale=scale)) for scale in scales]
+    for name, html in cases:
+        key = f"parser.slickcharts.{name}"
+        results[key] = bench_slickcharts(html, repeat)
+        _report(key, results[key])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬蟲解析器基準測試")
+    parser.add_argument("--engine", default="stream", choices=["stream", "legacy"])
+    parser.add_argument("--scale", type=int, action="append", default=[],
+                        help="合成資料倍數（可重複指定，預設 1 10 100）")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.scale, args.engine, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+效能測試共用工具
+"""
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from script_loader import load_script  # noqa: E402
+
+
+def time_call(func, *args, repeat: int = 5, **kwargs):
+    """執行 repeat 次，回傳 (最後一次結果, 每次耗時秒數列表)"""
+    result = None
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        samples.append(time.perf_counter() - started)
+    return result, samples
@@ -0,0 +1,86 @@
+"""
+產生 MOPS t78sb04 格式的 HTML，供解析器基準測試使用
+
+版面仿照 MOPS 回應：每個基金先有一個標題表格
+（「元大台灣卓越50證券投資信託基金　公司代號：A00005」），接著是持股明細表格，
+表尾有「小計」「總計」列。持股內容取自 data/ 下現有的 fund_*.json，
+scale > 1 時會複製出更多基金以模擬更大的回應。
+"""
+import json
+import os
+from html import escape
+
+from common import DATA_DIR
+
+
+def load_funds(data_dir: str = DATA_DIR):
+    """依 funds_summary.json 讀取 (基金名稱, {股票代號: 股票名稱})"""
+    with open(os.path.join(data_dir, "funds_summary.json"), 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    funds = []
+    for entry in summary:
+        path = os.path.join(data_dir, entry["file"])
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            funds.append((entry["fund_name"], json.load(f)))
+    return funds
+
+
+def _full_name(fund_name: str) -> str:
+    name = fund_name if fund_name.startswith("元大") else f"元大{fund_name}"
+    return f"{name}證券投資信託基金"
+
+
+def fund_tables(index: int, fund_name: str, holdings) -> str:
+    rows = []
+    total = len(holdings)
+    for rank, (code, name) in enumerate(holdings.items(), 1):
+        weight = round(100.0 * (total - rank + 1) / (total * (total + 1) / 2), 2)
+        shares = (total - rank + 1) * 1000
+        rows.append(
+            f"<tr><td>{escape(code)}</td><td>{escape(name)}</td>"
+            f"<td style='text-align:right'>{shares:,}</td>"
+            f"<td style='text-align:right'>{weight:.2f}</td></tr>"
+        )
+    return (
+        "<table class='noBorder'>\n<tr><td>"
+        f"{escape(_full_name(fund_name))}　　公司代號：　A{index:05d}"
+        "</td></tr>\n</table>\n"
+        "<table class='hasBorder'>\n"
+        "<tr><th>股票代號</th><th>股票名稱</th><th>持股數</th><th>持股比率</th></tr>\n"
+        + "\n".join(rows) +
+        "\n<tr><td>小計</td><td></td><td></td><td>100.00</td></tr>"
+        "\n<tr><td>總計</td><td></td><td></td><td>100.00</td></tr>\n"
+        "</table>\n<br>\n"
+    )
+
+
+def build_fixture(scale: int = 1, data_dir: str = DATA_DIR) -> str:
+    """產生 HTML；scale 為基金數的倍數"""
+    funds = load_funds(data_dir)
+    parts = ["<html><head><meta charset='utf-8'></head><body>\n"]
+    index = 0
+    for copy in range(scale):
+        for fund_name, holdings in funds:
+            index += 1
+            name = fund_name if copy == 0 else f"{fund_name}{copy}號"
+            parts.append(fund_tables(index, name, holdings))
+    parts.append("</body></html>\n")
+    return "".join(parts)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="產生 MOPS t78sb04 格式的測試 HTML")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    html = build_fixture(args.scale)
+    if args.output == "-":
+        print(html)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(html)
@@ -0,0 +1,110 @@
+"""
+執行所有基準測試並與基準線比較
+
+    python bench/run.py                        # 行程內 API + 解析器，結果寫入 bench/results/latest.json
+    python bench/run.py --server               # 另外測試本機 uvicorn
+    python bench/run.py --save-baseline        # 將本次結果存為 bench/baseline.json
+    python bench/run.py --compare              # 與基準線比較，有退步時以非零狀態結束
+
+延遲類指標（p50 / p95 / p99 / median）超過基準線 (1 + tolerance) 倍即視為退步。
+基準線與機器有關，請在部署使用的同型機器上建立。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List
+
+import bench_api
+import bench_parsers
+from common import ROOT_DIR
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, "results", "latest.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# 用於比較的延遲指標
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms", "median_ms")
+DEFAULT_TOLERANCE = 0.25
+
+
+def collect(args) -> Dict:
+    results = {}
+    if not args.skip_api:
+        results.update(bench_api.run(False, args.concurrency, args.requests))
+        if args.server:
+            results.update(bench_api.run(True, args.concurrency, args.requests))
+    if not args.skip_parsers:
+        results.update(bench_parsers.run(args.scale, repeat=args.repeat))
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """回傳退步的項目說明"""
+    regressions = []
+    for key, base in baseline.get("results", {}).items():
+        result = current["results"].get(key)
+        if result is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if metric in base and metric in result and base[metric]:
+                ratio = result[metric] / base[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{key} {metric}: {base[metric]:.3f} -> {result[metric]:.3f} ({ratio:.2f}x)")
+    return regressions
+
+
+def write_json(path: str, data: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="執行所有基準測試")
+    parser.add_argument("--server", action="store_true", help="另外測試本機 uvicorn")
+    parser.add_argument("--concurrency", type=int, action="append", default=[])
+    parser.add_argument("--requests", type=int, default=bench_api.DEFAULT_REQUESTS)
+    parser.add_argument("--scale", type=int, action="append", default=[])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--skip-parsers", action="store_true")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    current = collect(args)
+    write_json(args.output, current)
+    print(f"\nResults written to {os.path.relpath(args.output, ROOT_DIR)}")
+
+    if args.save_baseline:
+        write_json(args.baseline, current)
+        print(f"Baseline saved to {os.path.relpath(args.baseline, ROOT_DIR)}")
+
+    if args.compare:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+產生 slickcharts 指數成分股頁面格式的 HTML，供 crawler-i18n.py 表格解析的基準測試使用
+
+表格欄位與 slickcharts 相同：# / Company / Symbol / Portfolio% / Price / Chg / % Chg，
+內容取自 data/ 下現有的 *_data.json。
+"""
+import json
+import os
+from html import escape
+
+from common import DATA_DIR
+
+
+def build_fixture(file_name: str = "sp500_data.json", scale: int = 1, data_dir: str = DATA_DIR) -> str:
+    with open(os.path.join(data_dir, file_name), 'r', encoding='utf-8') as f:
+        stocks = json.load(f)
+
+    rows = []
+    rank = 0
+    for copy in range(scale):
+        for symbol, company in stocks.items():
+            rank += 1
+            symbol = symbol if copy == 0 else f"{symbol}{copy}"
+            rows.append(
+                f"<tr><td>{rank}</td>"
+                f"<td style=\"width:30%\"><a href=\"/symbol/{escape(symbol)}\">{escape(company)}</a></td>"
+                f"<td><a href=\"/symbol/{escape(symbol)}\">{escape(symbol)}</a></td>"
+                f"<td>{100.0 / (rank + 1):.2f}%</td>"
+                f"<td class=\"text-nowrap\"><img src=\"/img/up.gif\"> {100 + rank % 400:.2f}</td>"
+                f"<td class=\"text-nowrap\" style=\"color: green\">{rank % 7 / 3:.2f}</td>"
+                f"<td class=\"text-nowrap\" style=\"color: green\">({rank % 5 / 4:.2f}%)</td></tr>"
+            )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>S&amp;P 500 Companies</title></head>"
+        "<body><div class=\"container-fluid\"><div class=\"row\"><div class=\"col-lg-7\">"
+        "<div class=\"card\"><div class=\"card-body\"><div class=\"table-responsive\">"
+        "<table class=\"table table-hover table-borderless table-sm\">"
+        "<thead><tr><th>#</th><th>Company</th><th>Symbol</th><th>Portfolio%</th>"
+        "<th>Price</th><th>Chg</th><th>% Chg</th></tr></thead><tbody>\n"
+        + "\n".join(rows) +
+        "\n</tbody></table></div></div></div></div></div></div></body></html>\n"
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="產生 slickcharts 格式的測試 HTML")
+    parser.add_argument("--source", default="sp500_data.json")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    html = build_fixture(args.source, args.scale)
+    if args.output == "-":
+        print(html)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(html)
@@ -0,0 +1,312 @@
+"""
+成分股資料目錄：啟動時一次載入 data/ 下所有指數與基金檔案，
+API 的每個請求都從記憶體中的快照回應，不再逐次讀檔解析 JSON。
+
+資料更新時會依 data/CURRENT 指向的世代（見 publish.py）或檔案 mtime、
+SIGHUP 訊號重新載入，並以單一參照替換的方式切換到新快照，不需重啟程序。
+以世代發布時，整個快照都從同一個不可變的世代目錄讀取。
+
+世代中有編譯好的 catalog.bin（見 compiled_catalog.py）時直接以 mmap 開啟，
+不解析 JSON；多個 worker 共用同一份分頁。搜尋索引、重疊矩陣與歷史等衍生結構
+在快照切換前（或啟動後於背景）才建立。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from analytics import HoldingWeights, MembershipMatrix
+from changefeed import CHANGES_FILE, ChangeLog
+from compiled_catalog import CATALOG_FILE, CompiledCatalog
+from datasets import Dataset, DatasetRegistry, list_datasets
+from entities import EntityTable
+from holdings_store import HISTORY_FILE, HoldingsHistory
+from metrics import RELOAD_DURATION, RELOADS, Timer
+from publish import CURRENT_FILE, GENERATIONS_DIR, list_data_files, resolve_root
+from response_cache import ResponseCache
+from search_index import SearchIndex
+
+# 數據目錄
+DATA_DIR = "data"
+
+# 檢查檔案變動的間隔（秒）
+RELOAD_INTERVAL = float(os.environ.get("CATALOG_RELOAD_INTERVAL", "5"))
+
+# 是否使用編譯好的 catalog.bin（設為 0 時一律解析 JSON）
+USE_COMPILED = os.environ.get("CATALOG_COMPILED", "1") != "0"
+
+# 檔名 -> (mtime_ns, size)；以世代發布時為 {"CURRENT": 世代 ID}
+Signature = Dict[str, Any]
+
+
+def build_membership(files: Dict[str, Any], datasets: List[Dataset]) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    建立反向索引：股票代號 -> 依市場分組的所有所屬指數／基金
+    例如 {"2330": {"TW": [{"type": "fund", "index": "0050", ...}, ...]}}
+    """
+    membership = {}
+    for dataset in datasets:
+        for code, company in (files.get(dataset.file) or {}).items():
+            markets = membership.setdefault(code, {})
+            markets.setdefault(dataset.market, []).append({
+                "type": dataset.type,
+                "index": dataset.id,
+                "name": dataset.name,
+                "company": company
+            })
+    return membership
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    某一時間點 data/ 目錄的完整內容（不可變）
+    files / membership 為一般 dict，或 CompiledCatalog 上以 mmap 為底的唯讀 Mapping
+    """
+    files: Mapping[str, Any]
+    signature: Signature
+    version: int = 0
+    loaded_at: float = field(default_factory=time.time)
+    # 資料檔中最新的修改時間（資料新舊程度）
+    data_updated_at: Optional[float] = None
+    datasets: List[Dataset] = field(default_factory=list)
+    membership: Mapping[str, Dict[str, List[Dict]]] = field(default_factory=dict)
+    # 歷史紀錄檔所在的目錄；None 表示沒有歷史
+    root: Optional[str] = None
+    # 預先序列化的回應，隨快照替換而失效
+    responses: ResponseCache = field(default_factory=ResponseCache)
+    # 各檔案的 [(代號, 名稱)]，分頁時依位置存取（第一次分頁時建立）
+    row_lists: Dict[str, List[Tuple[str, str]]] = field(default_factory=dict, repr=False)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """快照內容的識別（各 worker 相同），用於分頁游標"""
+        normalized = json.dumps(self.signature, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+    @cached_property
+    def registry(self) -> DatasetRegistry:
+        return DatasetRegistry(self.datasets)
+
+    @property
+    def sources(self) -> Mapping[str, Any]:
+        """
+        建立衍生結構時讀取的檔案內容：catalog.bin 的檔案逐一還原後即丟棄，
+        warm() 只留下衍生結構，不會把每個檔案都還原在 worker 的記憶體中
+        """
+        transient = getattr(self.files, "transient", None)
+        return transient() if transient is not None else self.files
+
+    @cached_property
+    def entities(self) -> EntityTable:
+        return EntityTable.load(self.sources, self.datasets)
+
+    @cached_property
+    def search(self) -> SearchIndex:
+        return SearchIndex.build(self.sources, self.datasets)
+
+    @cached_property
+    def overlap(self) -> MembershipMatrix:
+        return MembershipMatrix.build(self.sources, self.datasets)
+
+    @cached_property
+    def history(self) -> HoldingsHistory:
+        if self.root is None:
+            return HoldingsHistory()
+        return HoldingsHistory.load(os.path.join(self.root, HISTORY_FILE))
+
+    @cached_property
+    def weights(self) -> HoldingWeights:
+        return HoldingWeights.build(self.history)
+
+    @cached_property
+    def changes(self) -> ChangeLog:
+        if self.root is None:
+            return ChangeLog([])
+        return ChangeLog.load(os.path.join(self.root, CHANGES_FILE))
+
+    def warm(self):
+        """預先建立所有衍生結構，避免第一個請求承擔建立成本"""
+        for name in ("registry", "entities", "search", "overlap", "history", "weights", "changes"):
+            getattr(self, name)
+
+    def get(self, file_name: str) -> Dict:
+        """取得已載入的檔案內容，不存在時回傳空 dict（與舊的 load_stock_data 相同）"""
+        return self.files.get(file_name) or {}
+
+    def rows(self, file_name: str) -> List[Tuple[str, str]]:
+        """檔案的 [(代號, 名稱)]；同一快照只建立一次（並行建立時結果相同，取先存入者）"""
+        rows = self.row_lists.get(file_name)
+        if rows is None:
+            rows = self.row_lists.setdefault(file_name, list(self.get(file_name).items()))
+        return rows
+
+    def row_count(self, file_name: str) -> int:
+        """檔案的筆數；catalog.bin 的 {代號: 名稱} 檔案直接由 entries 範圍取得，不需還原內容"""
+        count = getattr(self.files, "row_count", None)
+        if count is not None:
+            return count(file_name)
+        return len(self.get(file_name))
+
+
+def scan_signature(data_dir: str) -> Signature:
+    """
+    目前資料的識別：以世代發布時只需比對 CURRENT 指向的世代，
+    否則為 data/ 下所有資料檔的 mtime 與大小
+    """
+    root, generation = resolve_root(data_dir)
+    if generation is not None:
+        return {CURRENT_FILE: generation}
+    signature = {}
+    for file_name in list_data_files(root):
+        stat = os.stat(os.path.join(root, file_name))
+        signature[file_name] = (stat.st_mtime_ns, stat.st_size)
+    return signature
+
+
+def open_compiled(root: str, signature: Signature) -> Optional[CompiledCatalog]:
+    """開啟 root 下的 catalog.bin；不存在、格式不符或已過期時回傳 None"""
+    path = os.path.join(root, CATALOG_FILE)
+    if not USE_COMPILED or not os.path.exists(path):
+        return None
+    try:
+        compiled = CompiledCatalog(path)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring compiled catalog {path}: {e}")
+        return None
+    # 世代內的 catalog.bin 與世代一起發布，不會過期；data/ 頂層的則需比對編譯時的檔案識別
+    if CURRENT_FILE not in signature:
+        expected = {name: list(value) for name, value in signature.items()}
+        if compiled.signature != expected:
+            print(f"Compiled catalog {path} is stale, loading JSON instead")
+            return None
+    return compiled
+
+
+def load_snapshot(data_dir: str, version: int = 0) -> Snapshot:
+    """
+    載入目前世代（或 data/）的資料，建立新的快照
+    有可用的 catalog.bin 時以 mmap 開啟，否則解析所有 JSON 檔
+    """
+    signature = scan_signature(data_dir)
+    root = data_dir
+    if CURRENT_FILE in signature:
+        root = os.path.join(data_dir, GENERATIONS_DIR, signature[CURRENT_FILE])
+
+    compiled = open_compiled(root, signature)
+    if compiled is not None:
+        return Snapshot(files=compiled.files, signature=signature, version=version,
+                        data_updated_at=compiled.data_updated_at, datasets=compiled.datasets,
+                        membership=compiled.membership, root=root)
+
+    files = {}
+    data_updated_at = None
+    for file_name in list_data_files(root):
+        path = os.path.join(root, file_name)
+        mtime = os.stat(path).st_mtime
+        data_updated_at = mtime if data_updated_at is None else max(data_updated_at, mtime)
+        if not file_name.endswith(".json"):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            files[file_name] = json.load(f)
+    datasets = list_datasets(files)
+    return Snapshot(files=files, signature=signature, version=version,
+                    data_updated_at=data_updated_at, datasets=datasets,
+                    membership=build_membership(files, datasets), root=root)
+
+
+class StockCatalog:
+    """
+    持有目前的資料快照，並負責熱重載
+
+    讀取端只需取用 `catalog.snapshot`，取得的快照在整個請求中保持一致；
+    重載時建立全新的 Snapshot 再替換參照，因此讀取端不需要加鎖。
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, reload_interval: float = RELOAD_INTERVAL):
+        self.data_dir = data_dir
+        self.reload_interval = reload_interval
+        self._snapshot = Snapshot(files={}, signature={})
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._warming: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def reload(self, force: bool = False, warm: bool = True) -> bool:
+        """
+        檔案有變動（或 force=True）時重新載入
+        回傳是否切換到新的快照；載入失敗（例如檔案寫到一半）時保留舊快照
+        warm=True 時在切換前建立好所有衍生結構
+        """
+        with self._lock:
+            current = self._snapshot
+            if not force and scan_signature(self.data_dir) == current.signature:
+                return False
+            try:
+                with Timer() as timer:
+                    snapshot = load_snapshot(self.data_dir, version=current.version + 1)
+                    if warm:
+                        snapshot.warm()
+            except (OSError, ValueError) as e:
+                RELOADS.inc(result="failure")
+                print(f"Failed to reload data from {self.data_dir}: {e}")
+                return False
+            RELOADS.inc(result="success")
+            RELOAD_DURATION.observe(timer.seconds)
+            self._snapshot = snapshot
+            print(f"Loaded data snapshot v{snapshot.version} ({len(snapshot.files)} files)")
+            return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                print(f"Catalog watcher error: {e}")
+
+    async def _warm(self, snapshot: Snapshot):
+        try:
+            await asyncio.to_thread(snapshot.warm)
+        except Exception as e:
+            print(f"Failed to build derived indexes: {e}")
+
+    async def start(self):
+        """
+        首次載入並啟動背景監看；在 event loop 外執行檔案 I/O
+        衍生結構改在背景建立，使用 catalog.bin 時 worker 幾乎立即可以開始服務
+        """
+        await asyncio.to_thread(self.reload, True, False)
+        self._warming = asyncio.create_task(self._warm(self._snapshot))
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self._on_sighup)
+        except (NotImplementedError, RuntimeError, AttributeError, ValueError):
+            # Windows 或非主執行緒下無法註冊訊號
+            pass
+        if self.reload_interval > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    def _on_sighup(self):
+        print("SIGHUP received, reloading data")
+        asyncio.get_running_loop().create_task(asyncio.to_thread(self.reload, True))
+
+    async def stop(self):
+        """停止背景監看與尚未完成的衍生結構建立"""
+        tasks = [task for task in (self._task, self._warming) if task is not None]
+        self._task = self._warming = None
+        for task in tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,99 @@
+"""
+成分股變動紀錄
+
+每次爬蟲寫入新資料前，與上一版以集合運算一次算出新增、移除與更名，
+隨新的資料世代一起追加到 history/changes.jsonl。每筆紀錄有遞增的 seq，
+API 的 /changes?since=<seq> 以此作為游標分頁讀取。
+
+    {"seq": 12, "time": "2026-01-02T04:30:00+08:00", "source": "i18n", "dataset": "SP500",
+     "added": {"XYZ": "XYZ Corp"}, "removed": {"ABC": "ABC Inc"},
+     "renamed": {"META": ["Facebook Inc", "Meta Platforms Inc"]}}
+"""
+import json
+import os
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+CHANGES_FILE = os.path.join("history", "changes.jsonl")
+
+
+def diff_constituents(old: Optional[Dict[str, str]], new: Dict[str, str]) -> Dict:
+    """比較新舊 {代號: 名稱}，回傳 added / removed / renamed"""
+    old = old or {}
+    old_codes, new_codes = old.keys(), new.keys()
+    return {
+        "added": {code: new[code] for code in new_codes - old_codes},
+        "removed": {code: old[code] for code in old_codes - new_codes},
+        "renamed": {code: [old[code], new[code]]
+                    for code in new_codes & old_codes if old[code] != new[code]}
+    }
+
+
+def has_changes(delta: Dict) -> bool:
+    return bool(delta["added"] or delta["removed"] or delta["renamed"])
+
+
+def read_changes(path: str) -> List[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def record_changes(generation, source: str,
+                   snapshots: Dict[str, Tuple[Optional[Dict], Dict]]) -> int:
+    """
+    snapshots 為 {資料集: (舊資料, 新資料)}；有變動者在暫存世代（publish.Generation）
+    的變動紀錄追加一筆，回傳新增的紀錄數
+    舊資料為 None（第一次爬取）時新資料即為基準，不產生紀錄，否則每個成分股都會被記為新增
+    """
+    entries = read_changes(generation.path(CHANGES_FILE))
+    seq = entries[-1]["seq"] if entries else 0
+    now = datetime.now().astimezone().isoformat(timespec="seconds")
+
+    lines = []
+    for dataset, (old, new) in snapshots.items():
+        if old is None:
+            continue
+        delta = diff_constituents(old, new)
+        if not has_changes(delta):
+            continue
+        seq += 1
+        lines.append(json.dumps({"seq": seq, "time": now, "source": source, "dataset": dataset, **delta},
+                                ensure_ascii=False, separators=(",", ":")))
+    return generation.append_lines(CHANGES_FILE, lines)
+
+
+class ChangeLog:
+    """變動紀錄的唯讀檢視，隨資料快照載入"""
+
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        self.seqs = [entry["seq"] for entry in entries]
+
+    @classmethod
+    def load(cls, path: str) -> "ChangeLog":
+        return cls(read_changes(path))
+
+    @property
+    def latest(self) -> int:
+        return self.seqs[-1] if self.seqs else 0
+
+    def since(self, cursor: int, limit: int, dataset: Optional[str] = None) -> Tuple[List[Dict], int]:
+        """
+        回傳 seq > cursor 的紀錄（最多 limit 筆）與下一頁的游標
+        dataset 為資料集路由表的正式 ID（見 DatasetRegistry.resolve）
+        沒有更多紀錄時游標等於傳入值，客戶端可持續以此輪詢
+        """
+        position = bisect_right(self.seqs, cursor)
+        page = []
+        next_cursor = cursor
+        for entry in self.entries[position:]:
+            next_cursor = entry["seq"]
+            if dataset is None or entry["dataset"] == dataset:
+                page.append(entry)
+                if len(page) >= limit:
+                    break
+        return page, next_cursor
@@ -0,0 +1,364 @@
+"""
+編譯後的二進位資料目錄（catalog.bin）
+
+發布世代時將所有 data/*.json 編譯成單一檔案，API 的每個 worker 以唯讀 mmap 開啟：
+啟動時不需解析任何 JSON，分頁由作業系統在多個 worker 之間共用，
+每個 worker 的記憶體不隨基金數增加。
+
+檔案格式（little-endian）：
+
+    magic "STKCAT01" | uint32 中繼資料長度 | 中繼資料 JSON | 對齊 8 位元組的各區段
+
+- strings：所有代號與公司名稱去重後依字典序排列（字串 ID 的順序即字串順序），
+  以 uint32 位移陣列 + UTF-8 內容存放
+- entries：每個 {代號: 名稱} 檔案的內容依原檔順序排列（entry_code / entry_name 為字串 ID），
+  tables 記錄各檔案的範圍
+- codes / member_offsets / member_dataset / member_entry：依代號排序的反向索引，
+  每個代號對應的 (資料集, entry) 依資料集順序排列，與 catalog.build_membership 相同
+- raw：其他 JSON 檔（例如 funds_summary.json）的原始內容，讀取時才解析
+
+    python compiled_catalog.py            # 編譯目前發布中的資料（data/CURRENT 或 data/）
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from datasets import Dataset, is_table, list_datasets
+
+CATALOG_FILE = "catalog.bin"
+
+MAGIC = b"STKCAT01"
+FORMAT_VERSION = 1
+
+# 各區段的 numpy 型別
+SECTIONS = {
+    "string_offsets": "<u4",
+    "string_data": "u1",
+    "entry_code": "<u4",
+    "entry_name": "<u4",
+    "codes": "<u4",
+    "member_offsets": "<u4",
+    "member_dataset": "<u2",
+    "member_entry": "<u4",
+    "raw": "u1",
+}
+
+
+def build_catalog(root: str, names: List[str], signature: Optional[Dict] = None) -> bytes:
+    """
+    將 root 下的 JSON 檔編譯成 catalog.bin 的內容
+    signature 為編譯時的檔案識別（見 catalog.scan_signature），載入時用來判斷是否過期
+    """
+    files: Dict[str, Any] = {}
+    raw_content: Dict[str, bytes] = {}
+    data_updated_at = None
+    for name in names:
+        path = os.path.join(root, name)
+        mtime = os.stat(path).st_mtime
+        data_updated_at = mtime if data_updated_at is None else max(data_updated_at, mtime)
+        if not name.endswith(".json"):
+            continue
+        with open(path, 'rb') as f:
+            content = f.read()
+        files[name] = json.loads(content)
+        raw_content[name] = content
+
+    datasets = list_datasets(files)
+    # {代號: 名稱} 形式的檔案以 entries 存放，其餘存原始 JSON
+    tables = [name for name in files if is_table(files[name])]
+
+    # 字串表：依字典序排列後的位置即字串 ID
+    strings = sorted({s for name in tables for item in files[name].items() for s in item})
+    string_ids = {s: i for i, s in enumerate(strings)}
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=string_offsets[1:])
+
+    entry_code, entry_name, table_ranges = [], [], {}
+    for name in tables:
+        start = len(entry_code)
+        for code, company in files[name].items():
+            entry_code.append(string_ids[code])
+            entry_name.append(string_ids[company])
+        table_ranges[name] = (start, len(entry_code))
+
+    # 反向索引：與 build_membership 相同，依資料集順序、檔案內順序累積
+    members: Dict[int, List] = {}
+    for position, dataset in enumerate(datasets):
+        if dataset.file not in table_ranges:
+            continue
+        start, end = table_ranges[dataset.file]
+        for entry in range(start, end):
+            members.setdefault(entry_code[entry], []).append((position, entry))
+    codes = sorted(members)
+    member_offsets = np.zeros(len(codes) + 1, dtype="<u4")
+    np.cumsum([len(members[code]) for code in codes], out=member_offsets[1:])
+    pairs = [pair for code in codes for pair in members[code]]
+
+    raw_names = [name for name in files if name not in table_ranges]
+    raw_ranges, raw_parts, size = {}, [], 0
+    for name in raw_names:
+        raw_ranges[name] = (size, len(raw_content[name]))
+        raw_parts.append(raw_content[name])
+        size += len(raw_content[name])
+
+    arrays = {
+        "string_offsets": string_offsets,
+        "string_data": np.frombuffer(b"".join(encoded), dtype="u1"),
+        "entry_code": np.array(entry_code, dtype="<u4"),
+        "entry_name": np.array(entry_name, dtype="<u4"),
+        "codes": np.array(codes, dtype="<u4"),
+        "member_offsets": member_offsets,
+        "member_dataset": np.array([p[0] for p in pairs], dtype="<u2"),
+        "member_entry": np.array([p[1] for p in pairs], dtype="<u4"),
+        "raw": np.frombuffer(b"".join(raw_parts), dtype="u1"),
+    }
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "signature": signature,
+        "data_updated_at": data_updated_at,
+        "files": list(files),
+        "datasets": [list(dataset) for dataset in datasets],
+        "tables": table_ranges,
+        "raw_files": raw_ranges,
+        "sections": {},
+    }
+    # 區段位移相對於中繼資料之後（對齊 8 位元組）的起點
+    parts, offset = [], 0
+    for name, array in arrays.items():
+        meta["sections"][name] = [offset, int(array.size)]
+        parts.append(array.tobytes())
+        padding = -array.nbytes % 8
+        parts.append(b"\0" * padding)
+        offset += array.nbytes + padding
+
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    header = MAGIC + struct.pack("<I", len(meta_bytes)) + meta_bytes
+    header += b"\0" * (-len(header) % 8)
+    return header + b"".join(parts)
+
+
+def compile_catalog(root: str, names: List[str], signature: Optional[Dict] = None) -> str:
+    """編譯並以暫存檔 + rename 寫入 root/catalog.bin，回傳路徑"""
+    path = os.path.join(root, CATALOG_FILE)
+    content = build_catalog(root, names, signature)
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class CompiledCatalog:
+    """以唯讀 mmap 開啟的 catalog.bin；所有陣列都是 mmap 上的零複製 view"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = self._mmap
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled catalog")
+        (meta_size,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        start = len(MAGIC) + 4
+        meta = json.loads(bytes(buffer[start:start + meta_size]).decode("utf-8"))
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {meta.get('version')}")
+
+        self.path = path
+        self.signature: Optional[Dict] = meta.get("signature")
+        self.data_updated_at: Optional[float] = meta.get("data_updated_at")
+        self.file_names: List[str] = meta["files"]
+        self.datasets = [Dataset(*dataset) for dataset in meta["datasets"]]
+        self.tables: Dict[str, List[int]] = meta["tables"]
+        self.raw_files: Dict[str, List[int]] = meta["raw_files"]
+        base = start + meta_size + (-(start + meta_size) % 8)
+        self._string_base = base + meta["sections"]["string_data"][0]
+        for name, dtype in SECTIONS.items():
+            offset, count = meta["sections"][name]
+            setattr(self, name, np.frombuffer(buffer, dtype=dtype, count=count, offset=base + offset))
+        self.files = FileView(self)
+        self.membership = MembershipView(self)
+
+    def string(self, string_id: int) -> str:
+        base = self._string_base
+        start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+        return self._mmap[base + start:base + end].decode("utf-8")
+
+    def table(self, name: str) -> Dict[str, str]:
+        """依原檔順序還原 {代號: 名稱}"""
+        start, end = self.tables[name]
+        string = self.string
+        return {string(code): string(company)
+                for code, company in zip(self.entry_code[start:end].tolist(),
+                                         self.entry_name[start:end].tolist())}
+
+    def row_count(self, name: str) -> int:
+        """{代號: 名稱} 檔案的筆數，不需還原內容；不存在時為 0"""
+        if name not in self.tables:
+            return 0
+        start, end = self.tables[name]
+        return end - start
+
+    def find_code(self, code: str) -> int:
+        """代號在 codes 中的位置；不存在時為 -1（字串 ID 依字典序排列，可直接二分搜尋）"""
+        codes = self.codes
+        low, high = 0, len(codes)
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(int(codes[middle])) < code:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(codes) and self.string(int(codes[low])) == code:
+            return low
+        return -1
+
+    def memberships(self, position: int) -> Dict[str, List[Dict]]:
+        start, end = self.member_offsets[position], self.member_offsets[position + 1]
+        markets: Dict[str, List[Dict]] = {}
+        for dataset_position, entry in zip(self.member_dataset[start:end].tolist(),
+                                           self.member_entry[start:end].tolist()):
+            dataset = self.datasets[dataset_position]
+            markets.setdefault(dataset.market, []).append({
+                "type": dataset.type,
+                "index": dataset.id,
+                "name": dataset.name,
+                "company": self.string(int(self.entry_name[entry]))
+            })
+        return markets
+
+
+class FileView(Mapping):
+    """
+    檔名 -> 內容；第一次存取時才從 mmap 還原，之後沿用同一個物件
+    （只有被讀取過的檔案會佔用 worker 的記憶體）
+    """
+
+    def __init__(self, catalog: CompiledCatalog):
+        self._catalog = catalog
+        self._materialized: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _decode(self, name: str):
+        catalog = self._catalog
+        if name in catalog.tables:
+            return catalog.table(name)
+        if name in catalog.raw_files:
+            offset, size = catalog.raw_files[name]
+            return json.loads(catalog.raw[offset:offset + size].tobytes())
+        raise KeyError(name)
+
+    def __getitem__(self, name: str):
+        content = self._materialized.get(name)
+        if content is not None:
+            return content
+        if name not in self:
+            raise KeyError(name)
+        with self._lock:
+            content = self._materialized.get(name)
+            if content is None:
+                content = self._materialized[name] = self._decode(name)
+        return content
+
+    def peek(self, name: str):
+        """取得檔案內容但不保留：已還原過的沿用，否則每次從 mmap 重新還原"""
+        content = self._materialized.get(name)
+        return content if content is not None else self._decode(name)
+
+    def transient(self) -> "TransientFileView":
+        return TransientFileView(self)
+
+    def __contains__(self, name) -> bool:
+        return name in self._catalog.tables or name in self._catalog.raw_files
+
+    def row_count(self, name: str) -> int:
+        """檔案的筆數；{代號: 名稱} 檔案不需還原內容"""
+        if name in self._catalog.tables:
+            return self._catalog.row_count(name)
+        return len(self[name]) if name in self else 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._catalog.file_names)
+
+    def __len__(self) -> int:
+        return len(self._catalog.file_names)
+
+
+class TransientFileView(Mapping):
+    """
+    與 FileView 相同的檔案，但讀取時不保留還原的內容（FileView.peek）
+    供一次性掃描所有檔案的衍生結構使用，建立完成後只留下衍生結構本身
+    """
+
+    def __init__(self, files: FileView):
+        self._files = files
+
+    def __getitem__(self, name: str):
+        return self._files.peek(name)
+
+    def __contains__(self, name) -> bool:
+        return name in self._files
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+class MembershipView(Mapping):
+    """代號 -> 依市場分組的所屬指數／基金（格式同 catalog.build_membership）"""
+
+    def __init__(self, catalog: CompiledCatalog):
+        self._catalog = catalog
+
+    def __getitem__(self, code: str) -> Dict[str, List[Dict]]:
+        position = self._catalog.find_code(code) if isinstance(code, str) else -1
+        if position < 0:
+            raise KeyError(code)
+        return self._catalog.memberships(position)
+
+    def __contains__(self, code) -> bool:
+        return isinstance(code, str) and self._catalog.find_code(code) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        string = self._catalog.string
+        return (string(int(code)) for code in self._catalog.codes)
+
+    def __len__(self) -> int:
+        return len(self._catalog.codes)
+
+
+def main():
+    # catalog 與 publish 都匯入本模組，指令列才延後匯入
+    from catalog import scan_signature
+    from publish import list_data_files, resolve_root
+
+    parser = argparse.ArgumentParser(description="將資料編譯成 catalog.bin")
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+
+    root, generation = resolve_root(args.data_dir)
+    names = list_data_files(root)
+    # 未使用世代時 data/ 的檔案可能再被修改，記錄編譯時的識別供載入時比對
+    signature = scan_signature(args.data_dir) if generation is None else None
+    path = compile_catalog(root, names, signature)
+    print(f"Compiled {len(names)} files into {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-import requests
+import argparse
 from bs4 import BeautifulSoup
-import json
 import os
+import time
+
+from crawler_http import DEFAULT_BACKOFF, DEFAULT_PER_HOST, DEFAULT_RETRIES, HostLimiter, make_session
+from crawler_state import CrawlerState
 
 # 創建數據目錄
 DATA_DIR = "data"
@@ -9,85 +12,85 @@ if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
 
-def get_stock_data(index_name):
-    """抓取指定指數的成分股數據"""
-    urls = {
-        'sp500': "https://www.slickcharts.com/sp500",
-        'nasdaq100': "https://www.slickcharts.com/nasdaq100",
-        'dowjones': "https://www.slickcharts.com/dowjones"
-    }
-    
-    if index_name not in urls:
-        print(f"Invalid index name: {index_name}")
-        return None
+URLS = {
+    'sp500': "https://www.slickcharts.com/sp500",
+    'nasdaq100': "https://www.slickcharts.com/nasdaq100",
+    'dowjones': "https://www.slickcharts.com/dowjones"
+}
 
-    stock_dict = {}
-    try:
-        url = urls[index_name]
-        print(f"Accessing URL for {index_name}: {url}")
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        table = soup.find('table')
-        
-        if not table:
-            print(f"No table found for {index_name}")
-            return None
-        
-        # 獲取所有行（跳過表頭）
-        rows = table.find_all('tr')[1:]
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) >= 3:  # 確保至少有公司名稱和代號欄位
-                company_name = cols[1].text.strip()
-                symbol = cols[2].text.strip()
-                if symbol and company_name:
-                    stock_dict[symbol] = company_name
-                    print(f"Added {index_name}: {symbol} -> {company_name}")
+# 指數 -> 輸出檔名
+INDEX_FILES = {
+    'sp500': 'sp500_data.json',
+    'nasdaq100': 'nasdaq100_data.json',
+    'dowjones': 'dowjones_data.json'
+}
 
-        return stock_dict
-    except Exception as e:
-        print(f"Error occurred while fetching {index_name} data: {str(e)}")
-        return None
+# 同時抓取的來源數
+DEFAULT_CONCURRENCY = 3
 
-def save_stock_data(data, filename):
-    """保存數據到文件"""
-    filepath = os.path.join(DATA_DIR, filename)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"Data saved to {filepath}")
 
-def collect_all_indices():
-    """收集所有指數的數據"""
-    indices = {
-        'sp500': 'sp500_data.json',
-        'nasdaq100': 'nasdaq100_data.json',
-        'dowjones': 'dowjones_data.json'
-    }
+def parse_stock_table(html, index_name):
+    """從 slickcharts 頁面的第一個表格取出 {代號: 公司名稱}"""
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table')
     
-    results = {}
-    for index_name, filename in indices.items():
-        print(f"\nStarting {index_name} data collection...")
-        stock_data = get_stock_data(index_name)
-        if stock_data:
-            save_stock_data(stock_data, filename)
-            results[index_name] = len(stock_data)
-            print(f"✓ Successfully collected {len(stock_data)} {index_name} stocks")
-        else:
-            print(f"✗ Failed to collect {index_name} data")
+    if not table:
+        print(f"No table found for {index_name}")
+        return None
     
-    return results
+    stock_dict = {}
+    # 獲取所有行（跳過表頭）
+    rows = table.find_all('tr')[1:]
+    for row in rows:
+        cols = row.find_all('td')
+        if len(cols) >= 3:  # 確保至少有公司名稱和代號欄位
+            company_name = cols[1].text.strip()
+            symbol = cols[2].text.strip()
+            if symbol and company_name:
+                stock_dict[symbol] = company_name
+    print(f"Parsed {len(stock_dict)} {index_name} rows")
+    return stock_dict
+
+def collect_all_indices(concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                        retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """
+    收集所有指數的數據，回傳 {指數: 筆數}（只含這次發布的指數）
+    交由 pipeline.py 的 SlickchartsSource 執行：並行抓取、最少筆數檢查（MIN_INDEX_ROWS）、
+    所有指數在同一個世代發布，驗證資訊只在發布成功後才更新
+    """
+    # pipeline 會載入本腳本，執行時才匯入以免循環
+    import pipeline
+
+    session = make_session(pool_size=max(concurrency, per_host))
+    limiter = HostLimiter(per_host)
+    state = CrawlerState()
+    started = time.perf_counter()
+    sources = [pipeline.SlickchartsSource(index_name, session, limiter, state, retries=retries, backoff=backoff)
+               for index_name in INDEX_FILES]
+    reports = pipeline.run_pipeline(sources, state, concurrency, backoff=backoff)
+    pipeline.print_report(reports)
+    print(f"Total wall time: {time.perf_counter() - started:.2f}s")
+    return {source.name: len(source.stocks) for source in sources
+            if source.stocks is not None and pipeline.succeeded(reports[source.name])}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="抓取 SP500、NASDAQ100、道瓊斯成分股")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="同時抓取的來源數（1 為逐一抓取）")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                        help="同一主機同時進行中的請求上限")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="失敗後的重試次數")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF,
+                        help="重試退避的基準秒數")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
     print("Starting data collection for all indices...")
-    results = collect_all_indices()
+    results = collect_all_indices(concurrency=args.concurrency, per_host=args.per_host,
+                                  retries=args.retries, backoff=args.backoff)
     
     print("\nCollection Summary:")
     for index_name, count in results.items():
-        print(f"{index_name}: {count} stocks collected")
\ No newline at end of file
+        print(f"{index_name}: {count} stocks collected")
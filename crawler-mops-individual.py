@@ -1,14 +1,29 @@
 """
 解析 MOPS 基金持股回應，將每個基金的持股分別儲存
+
+    python crawler-mops-individual.py                       # 探測並抓取最新已公布的季度
+    python crawler-mops-individual.py --year 113 --season 2
+    python crawler-mops-individual.py --backfill 108Q1:113Q4 --concurrency 4 --rate 1
 """
-import requests
-import pandas as pd
+import argparse
 import json
+import pandas as pd
 import os
 import re
-from io import StringIO
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO, StringIO
 from bs4 import BeautifulSoup
 
+from crawler_http import (DEFAULT_BACKOFF, DEFAULT_RETRIES, RateLimiter, fetch, make_session,
+                          print_timing_report)
+from crawler_state import CrawlerState, load_json_file
+from changefeed import record_changes
+from crawler_metrics import CrawlRun
+from holdings_store import append_quarters
+from publish import Generation
+
 # 設定資料目錄
 DATA_DIR = "data"
 if not os.path.exists(DATA_DIR):
@@ -31,16 +46,83 @@ def extract_fund_code_from_company_id(company_id: str) -> str:
     # 這裡可能需要額外的映射邏輯
     return company_id
 
-def parse_individual_funds(html_content: str, year: int, season: int):
+def identify_fund(table_text: str, current_fund, current_fund_code):
+    """
+    若表格為基金標題（含「公司代號：」與基金全名），回傳新的 (基金名稱, 基金代碼)
+    否則原樣回傳目前的基金
+    每個基金標題都重新開始：無法辨識的基金回傳 (None, None)，其後的持股表格不會
+    被算到前一個沒有持股表格的基金
+    """
+    # 格式：「元大台灣卓越50證券投資信託基金    公司代號：    A00005」
+    if '公司代號：' not in table_text or '證券投資信託基金' not in table_text:
+        return current_fund, current_fund_code
+
+    for line in table_text.strip().split('\n'):
+        if '證券投資信託基金' not in line:
+            continue
+        # 嘗試從映射表找到對應的股票代碼
+        for fund_name, code in FUND_NAME_MAPPING.items():
+            if fund_name in line:
+                print(f"找到基金: {fund_name} ({code})")
+                return fund_name, code
+
+        # 如果沒有在映射表中，嘗試自動提取（簡化基金名稱）
+        match = re.search(r'元大(.+?)證券投資信託基金', line)
+        if match:
+            fund_name = match.group(1).strip()
+            print(f"找到未映射的基金: {fund_name}")
+            return fund_name, None
+    return None, None
+
+def is_holdings_table(table_text: str) -> bool:
+    """持股明細表格包含「股票代號」與「持股比率」欄位"""
+    return '股票代號' in table_text and '持股比率' in table_text
+
+def parse_number(value):
+    """儲存格內容 -> float（去除千分位與 %）；空白或無法解析時為 None"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)
+    text = str(value).replace(',', '').replace('%', '').strip()
+    try:
+        return float(text) if text else None
+    except ValueError:
+        return None
+
+def figure_columns(columns):
+    """持股比率與持股數所在的欄位（找不到時為 None）"""
+    weight_col = shares_col = None
+    for i, column in enumerate(columns):
+        column = str(column)
+        if weight_col is None and '持股比率' in column:
+            weight_col = i
+        elif shares_col is None and '股數' in column:
+            shares_col = i
+    return weight_col, shares_col
+
+def locate_header(df):
     """
-    解析 HTML 回應，提取每個基金的持股資料
+    以第一個同時含「股票代號」與「股票名稱」的列作為欄名（表頭可能是 <th> 或 <td>），
+    與 _table_holdings 相同；找不到時回傳 None
+    """
+    if '股票代號' in df.columns and '股票名稱' in df.columns:
+        return df
+    for position, row in enumerate(df.itertuples(index=False)):
+        cells = [str(cell).strip() for cell in row]
+        if '股票代號' in cells and '股票名稱' in cells:
+            body = df.iloc[position + 1:].copy()
+            body.columns = cells
+            return body
+    return None
+
+def iter_fund_holdings_legacy(html_content: str):
+    """
+    原本的解析方式：BeautifulSoup 找出所有表格，持股表格再交給 pandas.read_html
+    逐一產生 (基金名稱, 基金代碼, {股票代號: 股票名稱}, {股票代號: (持股比率, 持股數)})
     """
     soup = BeautifulSoup(html_content, 'html.parser')
     
-    # 尋找所有包含基金名稱的標題
-    # 通常格式為：<table class='noBorder'> 包含基金名稱
-    fund_sections = []
-    
     # 策略：尋找包含「公司代號」和基金名稱的區塊
     all_tables = soup.find_all('table')
     
@@ -49,72 +131,32 @@ def parse_individual_funds(html_content: str, year: int, season: int):
     
     for table in all_tables:
         table_text = table.get_text()
-        
-        # 檢查是否包含基金名稱標題
-        # 格式：「元大台灣卓越50證券投資信託基金    公司代號：    A00005」
-        if '公司代號：' in table_text and '證券投資信託基金' in table_text:
-            # 提取基金名稱
-            lines = table_text.strip().split('\n')
-            for line in lines:
-                if '證券投資信託基金' in line:
-                    # 嘗試從映射表找到對應的股票代碼
-                    for fund_name, code in FUND_NAME_MAPPING.items():
-                        if fund_name in line:
-                            current_fund = fund_name
-                            current_fund_code = code
-                            print(f"找到基金: {current_fund} ({current_fund_code})")
-                            break
-                    
-                    # 如果沒有在映射表中，嘗試自動提取
-                    if not current_fund:
-                        # 簡化基金名稱
-                        match = re.search(r'元大(.+?)證券投資信託基金', line)
-                        if match:
-                            current_fund = match.group(1).strip()
-                            print(f"找到未映射的基金: {current_fund}")
+        current_fund, current_fund_code = identify_fund(table_text, current_fund, current_fund_code)
         
         # 檢查是否為持股明細表格（包含「股票代號」欄位）
-        if current_fund and '股票代號' in table_text and '持股比率' in table_text:
+        if current_fund and is_holdings_table(table_text):
             try:
                 # 使用 pandas 解析這個表格
                 df_list = pd.read_html(StringIO(str(table)))
                 for df in df_list:
-                    if '股票代號' in df.columns:
+                    df = locate_header(df)
+                    if df is not None:
                         # 清理資料
                         df = df.dropna(how='all')
                         
                         # 過濾掉小計和總計行
-                        if '股票代號' in df.columns:
-                            df = df[~df['股票代號'].astype(str).str.contains('小計|總計', na=False)]
-                        
-                        # 儲存此基金的持股
-                        # 使用固定檔名（不含年度季度），方便排程自動更新
-                        if current_fund_code:
-                            # 使用股票代碼作為檔名
-                            filename = f"fund_{current_fund_code}.json"
-                        else:
-                            # 使用基金名稱作為檔名
-                            safe_name = re.sub(r'[^\w\s-]', '', current_fund).replace(' ', '_')
-                            filename = f"fund_{safe_name}.json"
-                        
-                        save_path = os.path.join(DATA_DIR, filename)
+                        df = df[~df['股票代號'].astype(str).str.contains('小計|總計', na=False)]
                         
                         # 提取需要的欄位並轉換為簡單的 key-value 格式（與 SP500 一致）
-                        if '股票代號' in df.columns and '股票名稱' in df.columns:
-                            # 轉換為 {"股票代號": "股票名稱"} 格式
-                            fund_data = dict(zip(df['股票代號'].astype(str), df['股票名稱'].astype(str)))
-                            
-                            with open(save_path, 'w', encoding='utf-8') as f:
-                                json.dump(fund_data, f, ensure_ascii=False, indent=2)
-                            
-                            print(f"✓ {current_fund}: {len(fund_data)} 筆 -> {filename}")
-                            
-                            fund_sections.append({
-                                'fund_name': current_fund,
-                                'fund_code': current_fund_code,
-                                'holdings_count': len(fund_data),
-                                'file': filename
-                            })
+                        if '股票名稱' in df.columns:
+                            codes = df['股票代號'].astype(str)
+                            weight_col, shares_col = figure_columns(df.columns)
+                            weights = df.iloc[:, weight_col] if weight_col is not None else [None] * len(df)
+                            shares = df.iloc[:, shares_col] if shares_col is not None else [None] * len(df)
+                            yield current_fund, current_fund_code, dict(
+                                zip(codes, df['股票名稱'].astype(str))), {
+                                code: (parse_number(weight), parse_number(count))
+                                for code, weight, count in zip(codes, weights, shares)}
                         
                         # 重置當前基金（準備下一個）
                         current_fund = None
@@ -122,16 +164,80 @@ def parse_individual_funds(html_content: str, year: int, season: int):
                         break
             except Exception as e:
                 print(f"解析表格失敗: {e}")
-    
-    return fund_sections
 
-def get_all_fund_holdings(year: int, season: int):
+def _cell_texts(row):
+    return [''.join(cell.itertext()).strip() for cell in row if cell.tag in ('td', 'th')]
+
+def _table_holdings(table):
     """
-    獲取所有基金的持股資料並分別儲存
+    從持股表格取出 ({股票代號: 股票名稱}, {股票代號: (持股比率, 持股數)})
+    找不到表頭時回傳 None
     """
-    url = "https://mopsov.twse.com.tw/mops/web/ajax_t78sb04"
-    
-    payload = {
+    code_col = name_col = weight_col = shares_col = None
+    holdings, figures = {}, {}
+    for row in table.iter('tr'):
+        cells = _cell_texts(row)
+        if code_col is None:
+            if '股票代號' in cells and '股票名稱' in cells:
+                code_col, name_col = cells.index('股票代號'), cells.index('股票名稱')
+                weight_col, shares_col = figure_columns(cells)
+            continue
+        if not any(cells) or len(cells) <= max(code_col, name_col):
+            continue
+        code = cells[code_col]
+        # 過濾掉小計和總計行
+        if '小計' in code or '總計' in code:
+            continue
+        holdings[code] = cells[name_col]
+        figures[code] = (
+            parse_number(cells[weight_col]) if weight_col is not None and weight_col < len(cells) else None,
+            parse_number(cells[shares_col]) if shares_col is not None and shares_col < len(cells) else None
+        )
+    return (holdings, figures) if code_col is not None else None
+
+def iter_fund_holdings(html_content: str):
+    """
+    單次掃描的解析方式：以 lxml iterparse 依文件順序處理每個表格的結束事件，
+    偵測基金標題與持股表格後直接取出儲存格文字，不重新序列化 HTML、也不經過 pandas
+    處理完的表格會立即釋放，記憶體用量不隨回應大小成長
+    逐一產生 (基金名稱, 基金代碼, {股票代號: 股票名稱}, {股票代號: (持股比率, 持股數)})
+    """
+    from lxml import etree
+
+    source = BytesIO(html_content.encode('utf-8'))
+    current_fund = None
+    current_fund_code = None
+
+    for _, table in etree.iterparse(source, events=('end',), tag='table', html=True,
+                                    encoding='utf-8', recover=True):
+        # 只處理最內層的表格，外層排版用表格的文字已包含在內層之中
+        if table.find('.//table') is None:
+            table_text = ''.join(table.itertext())
+            current_fund, current_fund_code = identify_fund(table_text, current_fund, current_fund_code)
+
+            if current_fund and is_holdings_table(table_text):
+                parsed = _table_holdings(table)
+                if parsed is not None:
+                    yield (current_fund, current_fund_code) + parsed
+                    current_fund = None
+                    current_fund_code = None
+
+            table.clear()
+            while table.getprevious() is not None:
+                del table.getparent()[0]
+
+# MOPS 基金持股查詢（t78sb04）
+MOPS_URL = "https://mopsov.twse.com.tw/mops/web/ajax_t78sb04"
+
+MOPS_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Referer': 'https://mopsov.twse.com.tw/mops/web/t78sb35_new',
+    'Content-Type': 'application/x-www-form-urlencoded',
+}
+
+def mops_payload(year: int, season: int, co_id: str = '') -> dict:
+    """查詢指定季度的表單；co_id 留空為所有基金"""
+    return {
         'encodeURIComponent': '1',
         'step': '1',
         'firstin': '1',
@@ -144,80 +250,373 @@ def get_all_fund_holdings(year: int, season: int):
         'inpuType': 'co_id',
         'TYPEK': 'all',
         'isnew': 'false',
-        'co_id': '',
+        'co_id': co_id,
         'year': str(year),
         'season': f"{season:02d}",
         'type': '05'
     }
+
+# 可選的解析引擎
+PARSERS = {
+    'stream': iter_fund_holdings,
+    'legacy': iter_fund_holdings_legacy,
+}
+
+def holding_rows(fund_data, figures):
+    """{股票代號: 股票名稱} 與 {股票代號: (持股比率, 持股數)} -> holdings_store 的持股列"""
+    return [(code, name) + figures.get(code, (None, None)) for code, name in fund_data.items()]
+
+def fund_file_name(fund_name: str, fund_code) -> str:
+    """基金的固定檔名（不含年度季度），方便排程自動更新"""
+    if fund_code:
+        # 使用股票代碼作為檔名
+        return f"fund_{fund_code}.json"
+    # 使用基金名稱作為檔名
+    safe_name = re.sub(r'[^\w\s-]', '', fund_name).replace(' ', '_')
+    return f"fund_{safe_name}.json"
+
+def write_funds(generation, funds, year: int, season: int, run):
+    """
+    將解析結果（PARSERS 產生的 (基金名稱, 基金代碼, 持股, 權重) 序列）寫入暫存世代：
+    最新一季寫入固定檔名的 fund_*.json，同時依 (基金, 年度, 季度) 追加到持股歷史與變動紀錄
+    回傳 funds_summary.json 的內容
+    """
+    fund_sections = []
+    quarters = []
+    # 檔名 -> (基金 ID, 寫入前的舊資料, 最後寫入的資料)，用於計算變動
+    snapshots = {}
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-        'Referer': 'https://mopsov.twse.com.tw/mops/web/t78sb35_new',
-        'Content-Type': 'application/x-www-form-urlencoded',
-    }
+    for current_fund, current_fund_code, fund_data, figures in funds:
+        filename = fund_file_name(current_fund, current_fund_code)
+        previous = snapshots[filename][1] if filename in snapshots else generation.read_json(filename)
+        snapshots[filename] = (current_fund_code or current_fund, previous, fund_data)
+        
+        # 內容未變時不重寫，避免觸發下游的檔案監看與 commit
+        with run.stage("write"):
+            written = generation.write_json(filename, fund_data)
+        run.rows(current_fund_code or current_fund, len(fund_data))
+        if written:
+            print(f"✓ {current_fund}: {len(fund_data)} 筆 -> {filename}")
+        else:
+            print(f"= {current_fund}: {len(fund_data)} 筆，內容未變更 ({filename})")
+        
+        fund_sections.append({
+            'fund_name': current_fund,
+            'fund_code': current_fund_code,
+            'holdings_count': len(fund_data),
+            'file': filename
+        })
+        holdings = holding_rows(fund_data, figures)
+        quarters.append((current_fund_code or current_fund, current_fund, year, season, holdings))
+    
+    with run.stage("write"):
+        added = append_quarters(generation, quarters)
+        recorded = record_changes(generation, "mops",
+                                  {fund_id: (old, new) for fund_id, old, new in snapshots.values()})
+    if added:
+        print(f"持股歷史新增 {added} 筆季度資料")
+    if recorded:
+        print(f"成分股變動紀錄新增 {recorded} 筆")
+    
+    return fund_sections
+
+def parse_individual_funds(html_content: str, year: int, season: int, engine: str = 'stream',
+                           generation=None, run=None):
+    """
+    解析 HTML 回應，提取每個基金的持股資料並寫入（見 write_funds）
+    寫入 generation（publish.Generation）暫存世代；未指定時自行建立並發布
+    run（crawler_metrics.CrawlRun）用於記錄解析 / 寫入耗時與各基金筆數
+    """
+    if generation is None:
+        with Generation(DATA_DIR) as generation:
+            fund_sections = parse_individual_funds(html_content, year, season, engine, generation, run)
+            generation.publish()
+        return fund_sections
+
+    run = run or CrawlRun("mops")
+    funds = list(run.timed(PARSERS[engine](html_content), "parse"))
+    return write_funds(generation, funds, year, season, run)
+
+def get_all_fund_holdings(year: int, season: int, engine: str = 'stream'):
+    """
+    獲取所有基金的持股資料並分別儲存
+    engine 可選 'stream'（預設，lxml 單次掃描）或 'legacy'（BeautifulSoup + pandas）
+    """
+    url = MOPS_URL
+    payload = mops_payload(year, season)
+    headers = dict(MOPS_HEADERS)
     
     print(f"發送 POST 請求: 年度={year}, 季度={season:02d}")
     
+    # 同一季度的查詢才可沿用上次的 ETag / Last-Modified
+    source = f"mops:{year}Q{season}"
+    state = CrawlerState()
+    run = CrawlRun("mops")
+    summary_path = os.path.join(DATA_DIR, "funds_summary.json")
+    
     try:
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
-        response = requests.post(url, data=payload, headers=headers, timeout=30, verify=False)
-        response.raise_for_status()
+        # 本地沒有摘要檔時必須完整下載
+        if os.path.exists(summary_path):
+            headers.update(state.conditional_headers(source))
+        with run.stage("fetch"):
+            response = make_session(pool_size=1).post(url, data=payload, headers=headers, timeout=30, verify=False)
+            response.raise_for_status()
         
         print(f"回應狀態碼: {response.status_code}")
+        if response.status_code == 304:
+            print("資料未變更（304），略過解析")
+            summary = load_json_file(summary_path) or []
+            for fund in summary:
+                run.rows(fund.get('fund_code') or fund['fund_name'], fund.get('holdings_count', 0))
+            run.save()
+            return summary
         print(f"回應長度: {len(response.text)} 字元\n")
         
-        # 解析並儲存各個基金
-        fund_sections = parse_individual_funds(response.text, year, season)
-        
-        print(f"\n總共處理了 {len(fund_sections)} 個基金")
+        # 解析並儲存各個基金，連同摘要驗證後一次發布
+        with Generation(DATA_DIR) as generation:
+            fund_sections = parse_individual_funds(response.text, year, season, engine=engine,
+                                                   generation=generation, run=run)
+            
+            print(f"\n總共處理了 {len(fund_sections)} 個基金")
+            
+            # 儲存摘要
+            with run.stage("write"):
+                if generation.write_json("funds_summary.json", fund_sections):
+                    print(f"摘要已更新: {summary_path}")
+                else:
+                    print(f"摘要未變更: {summary_path}")
+                generation.publish()
         
-        # 儲存摘要
-        summary_path = os.path.join(DATA_DIR, "funds_summary.json")
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            json.dump(fund_sections, f, ensure_ascii=False, indent=2)
-        print(f"摘要已儲存至: {summary_path}")
+        if fund_sections:
+            state.update(source, response)
+            state.save()
+        run.save()
         
         return fund_sections
         
     except Exception as e:
         print(f"請求失敗: {e}")
+        run.save(success=False)
         raise
 
-if __name__ == "__main__":
+# 回補（backfill）的預設值
+DEFAULT_BACKFILL_CONCURRENCY = 4
+DEFAULT_RATE = 1.0  # 每秒請求數（所有執行緒合計）
+BACKFILL_CHECKPOINT = os.path.join(".cache", "mops_backfill.json")
+
+# 探測最新季度時查詢的單一基金（元大台灣卓越50），回應遠小於全部基金
+PROBE_CO_ID = os.environ.get("MOPS_PROBE_CO_ID", "A00005")
+
+def parse_quarter(text: str):
+    """'113Q2' 或 '2024Q2' -> (民國年, 季度)"""
+    match = re.fullmatch(r'(\d{2,4})\s*[Qq]\s*([1-4])', text.strip())
+    if not match:
+        raise ValueError(f"Invalid quarter: {text} (expected e.g. 113Q2)")
+    year, season = int(match.group(1)), int(match.group(2))
+    if year > 1911:
+        year -= 1911
+    return year, season
+
+def next_quarter(year: int, season: int):
+    return (year + 1, 1) if season == 4 else (year, season + 1)
+
+def quarter_range(start, end):
+    """由 start 到 end（含）的所有 (民國年, 季度)"""
+    quarters = []
+    quarter = start
+    while quarter <= end:
+        quarters.append(quarter)
+        quarter = next_quarter(*quarter)
+    return quarters
+
+def previous_quarter(year: int, season: int):
+    return (year - 1, 4) if season == 1 else (year, season - 1)
+
+def calendar_quarter(now=None):
+    """
+    依日期推測最新一季（基金持股通常延遲一季公布）
+    1-3月 -> 上一年Q4, 4-6月 -> Q1, 7-9月 -> Q2, 10-12月 -> Q3
+    """
     from datetime import datetime
+    now = now or datetime.now()
+    roc_year = now.year - 1911
+    if now.month <= 3:
+        return roc_year - 1, 4
+    return roc_year, (now.month - 1) // 3
+
+def quarter_entries(html_content: str, year: int, season: int, engine: str = 'stream'):
+    """解析回應為 holdings_store.append_quarters 的輸入（不寫入任何 fund_*.json）"""
+    return [(fund_code or fund_name, fund_name, year, season, holding_rows(holdings, figures))
+            for fund_name, fund_code, holdings, figures in PARSERS[engine](html_content)]
+
+def fetch_quarter(session, year: int, season: int, co_id: str = '', limiter=None,
+                  rate_limiter=None, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF):
+    """查詢一季的持股，回傳 (response 或 None, FetchTiming)"""
+    return fetch(session, "POST", MOPS_URL, source=f"{year}Q{season}", limiter=limiter,
+                 rate_limiter=rate_limiter, retries=retries, backoff=backoff,
+                 data=mops_payload(year, season, co_id), headers=MOPS_HEADERS, verify=False)
+
+def is_published(year: int, season: int, session=None, rate_limiter=None) -> bool:
+    """以單一基金的查詢探測該季是否已公布（回應中有持股表格）"""
+    session = session or make_session(pool_size=1)
+    response, timing = fetch_quarter(session, year, season, co_id=PROBE_CO_ID,
+                                     rate_limiter=rate_limiter, retries=1)
+    if response is None:
+        print(f"探測 {year}Q{season} 失敗: {timing.error}")
+        return False
+    published = next(iter_fund_holdings(response.text), None) is not None
+    print(f"探測 {year}Q{season}: {'已公布' if published else '尚未公布'} ({timing.seconds:.2f}s)")
+    return published
+
+def latest_published_quarter(max_steps: int = 4, session=None):
+    """
+    從最近結束的一季開始往前探測，回傳第一個已公布的季度
+    探測全部失敗（例如網路問題）時退回日曆推測的結果
+    """
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    guess = calendar_quarter()
+    year, season = guess
+    session = session or make_session(pool_size=1)
+    for _ in range(max_steps):
+        if is_published(year, season, session=session):
+            return year, season
+        year, season = previous_quarter(year, season)
+    print(f"無法確認最新季度，改用日曆推測: {guess[0]}Q{guess[1]}")
+    return guess
+
+class BackfillCheckpoint:
+    """已完成回補的季度；中斷後重新執行時略過"""
+
+    def __init__(self, path: str = BACKFILL_CHECKPOINT):
+        self.path = path
+        self.done = load_json_file(path) or {}
+
+    def __contains__(self, quarter) -> bool:
+        return f"{quarter[0]}Q{quarter[1]}" in self.done
+
+    def mark(self, year: int, season: int, funds: int):
+        self.done[f"{year}Q{season}"] = {"funds": funds, "at": time.time()}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.done, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
+
+def backfill(quarters, concurrency: int = DEFAULT_BACKFILL_CONCURRENCY, rate: float = DEFAULT_RATE,
+             retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, engine: str = 'stream',
+             checkpoint: BackfillCheckpoint = None):
+    """
+    並行抓取多個季度並寫入持股歷史（history/holdings.jsonl）
+    - 所有請求共用全域速率限制 rate（每秒請求數）
+    - 每完成一季就發布一次世代並寫入 checkpoint，中斷後重新執行會從未完成的季度繼續
+    - 只寫入歷史，不覆寫代表最新一季的 fund_*.json（由一般模式負責）
+    回傳 {季度: 基金數}；尚未公布（沒有持股表格）的季度不記入 checkpoint
+    """
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    checkpoint = checkpoint or BackfillCheckpoint()
+    pending = [quarter for quarter in quarters if quarter not in checkpoint]
+    skipped = len(quarters) - len(pending)
+    print(f"回補 {len(pending)} 季（略過已完成 {skipped} 季），並行數 {concurrency}，每秒最多 {rate} 個請求")
+
+    session = make_session(pool_size=max(1, concurrency))
+    rate_limiter = RateLimiter(rate)
+    run = CrawlRun("mops_backfill")
+    timings = []
+    results = {}
+
+    def work(quarter):
+        year, season = quarter
+        response, timing = fetch_quarter(session, year, season, rate_limiter=rate_limiter,
+                                         retries=retries, backoff=backoff)
+        run.add_stage("fetch", timing.seconds)
+        if response is None:
+            return quarter, None, timing
+        with run.stage("parse"):
+            return quarter, quarter_entries(response.text, year, season, engine), timing
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(work, quarter) for quarter in pending]
+        for future in as_completed(futures):
+            (year, season), entries, timing = future.result()
+            timings.append(timing)
+            label = f"{year}Q{season}"
+            if entries is None:
+                run.failed(label, timing.error)
+                print(f"✗ {label}: {timing.error}")
+                continue
+            if not entries:
+                print(f"- {label}: 尚未公布或沒有資料")
+                continue
+            # 每季各自發布，已完成的季度不會因之後的失敗而遺失
+            with run.stage("write"), Generation(DATA_DIR) as generation:
+                added = append_quarters(generation, entries)
+                generation.publish()
+            checkpoint.mark(year, season, len(entries))
+            run.rows(label, sum(len(entry[4]) for entry in entries))
+            results[label] = len(entries)
+            print(f"✓ {label}: {len(entries)} 個基金，新增 {added} 筆季度資料")
+
+    run.save()
+    print_timing_report(timings)
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="抓取 MOPS 基金持股")
+    parser.add_argument("--year", type=int, help="民國年（需與 --season 一起指定）")
+    parser.add_argument("--season", type=int, choices=[1, 2, 3, 4])
+    parser.add_argument("--no-probe", action="store_true",
+                        help="不探測最新季度，直接依日期推測")
+    parser.add_argument("--engine", default="stream", choices=sorted(PARSERS))
+    parser.add_argument("--backfill", metavar="FROM:TO",
+                        help="回補季度範圍，例如 110Q1:113Q4；省略 TO 時到最新已公布的季度")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BACKFILL_CONCURRENCY,
+                        help="回補時同時抓取的季度數")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="回補時每秒請求數上限（所有執行緒合計，0 為不限制）")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF)
+    parser.add_argument("--checkpoint", default=BACKFILL_CHECKPOINT,
+                        help="回補進度檔")
+    parser.add_argument("--restart", action="store_true", help="忽略回補進度，全部重新抓取")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
     
-    # 自動計算最新的年度和季度
-    now = datetime.now()
-    current_year = now.year
-    current_month = now.month
-    
-    # 轉換為民國年
-    roc_year = current_year - 1911
+    if args.backfill:
+        start, _, end = args.backfill.partition(":")
+        end = parse_quarter(end) if end else latest_published_quarter()
+        checkpoint = BackfillCheckpoint(args.checkpoint)
+        if args.restart:
+            checkpoint.done = {}
+        results = backfill(quarter_range(parse_quarter(start), end), concurrency=args.concurrency,
+                           rate=args.rate, retries=args.retries, backoff=args.backoff,
+                           engine=args.engine, checkpoint=checkpoint)
+        print(f"\n✅ 回補完成：{len(results)} 季")
+        sys.exit(0)
     
-    # 計算季度 (基金持股通常延遲一季公布)
-    # 1-3月 -> 上一年Q4, 4-6月 -> Q1, 7-9月 -> Q2, 10-12月 -> Q3
-    if current_month <= 3:
-        season = 4
-        roc_year -= 1  # 上一年的 Q4
-    elif current_month <= 6:
-        season = 1
-    elif current_month <= 9:
-        season = 2
+    if args.year and args.season:
+        roc_year, season = args.year, args.season
+    elif args.no_probe:
+        roc_year, season = calendar_quarter()
     else:
-        season = 3
+        # 探測 MOPS 實際已公布的最新季度，而非只依月份推測
+        roc_year, season = latest_published_quarter()
     
-    print(f"自動偵測: 民國 {roc_year} 年第 {season} 季")
+    print(f"最新季度: 民國 {roc_year} 年第 {season} 季")
     print(f"(西元 {roc_year + 1911} 年 Q{season})")
-    print(f"如需指定其他季度，請修改下方參數\n")
-    
-    # 如果需要手動指定，取消註解並修改以下兩行：
-    # roc_year = 114
-    # season = 4
+    print(f"如需指定其他季度，請使用 --year / --season\n")
     
     try:
-        funds = get_all_fund_holdings(year=roc_year, season=season)
+        funds = get_all_fund_holdings(year=roc_year, season=season, engine=args.engine)
         print(f"\n✅ 成功！共處理 {len(funds)} 個基金")
     except Exception as e:
         print(f"❌ 執行失敗: {e}")
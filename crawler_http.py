@@ -0,0 +1,152 @@
+"""
+爬蟲共用的 HTTP 工具：共用 keep-alive 連線的 Session、每個主機的並行上限、
+全域的每秒請求數上限、指數退避加隨機抖動的重試，以及每個資料來源的耗時紀錄。
+Session 可錄製／重播回應以便離線執行（見 http_cache.py）。
+"""
+import random
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import NotRecorded, make_adapter
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+# 預設值，可由各爬蟲的命令列參數覆寫
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+DEFAULT_PER_HOST = 2
+
+# 這些狀態碼視為暫時性錯誤，會重試
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def make_session(pool_size: int = 10, http_cache: bool = True) -> requests.Session:
+    """
+    建立共用連線池的 Session，所有請求重複使用 keep-alive 連線
+    http_cache 為 False 時不錄製／重播（例如上傳資料的請求）
+    """
+    session = requests.Session()
+    if http_cache:
+        adapter = make_adapter(pool_size)
+    else:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+class HostLimiter:
+    """限制同一主機同時進行中的請求數（禮貌性限制）"""
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST):
+        self.per_host = per_host
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def semaphore(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.Semaphore(self.per_host)
+            return self._semaphores[host]
+
+
+class RateLimiter:
+    """所有執行緒共用的速率限制：相鄰兩次請求至少間隔 1 / rate 秒（rate <= 0 表示不限制）"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FetchTiming(NamedTuple):
+    """單一資料來源的抓取紀錄"""
+    source: str
+    url: str
+    status: Optional[int]
+    attempts: int
+    seconds: float
+    bytes: int
+    error: Optional[str] = None
+
+
+def backoff_delay(attempt: int, backoff: float) -> float:
+    """第 attempt 次重試前的等待秒數：指數退避加全抖動"""
+    return random.uniform(0, backoff * (2 ** attempt))
+
+
+def fetch(session: requests.Session, method: str, url: str, source: str = "",
+          limiter: Optional[HostLimiter] = None, retries: int = DEFAULT_RETRIES,
+          backoff: float = DEFAULT_BACKOFF, timeout: float = DEFAULT_TIMEOUT,
+          rate_limiter: Optional[RateLimiter] = None, **kwargs):
+    """
+    發送請求並在連線錯誤或暫時性狀態碼時重試（每次嘗試都受 rate_limiter 限制）
+    回傳 (response, FetchTiming)；重試用盡時 response 為 None，錯誤記在 timing.error
+    """
+    started = time.perf_counter()
+    error = None
+    response = None
+    attempt = 0
+    for attempt in range(1, retries + 2):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            if limiter is not None:
+                with limiter.semaphore(url):
+                    response = session.request(method, url, timeout=timeout, **kwargs)
+            else:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                error = None
+                break
+            error = f"HTTP {response.status_code}"
+        except (requests.HTTPError, NotRecorded) as e:
+            # 非暫時性錯誤（例如 404）與重播時沒有錄製的請求不重試
+            error = str(e)
+            break
+        except requests.RequestException as e:
+            error = str(e)
+            response = None
+        if attempt <= retries:
+            time.sleep(backoff_delay(attempt - 1, backoff))
+
+    timing = FetchTiming(
+        source=source or url,
+        url=url,
+        status=response.status_code if response is not None else None,
+        attempts=attempt,
+        seconds=time.perf_counter() - started,
+        bytes=len(response.content) if response is not None else 0,
+        error=error
+    )
+    return (response if error is None else None), timing
+
+
+def print_timing_report(timings):
+    """輸出每個資料來源的耗時報告"""
+    print("\nFetch timing:")
+    for t in sorted(timings, key=lambda t: -t.seconds):
+        status = t.status if t.status is not None else "-"
+        result = f"error: {t.error}" if t.error else f"{t.bytes} bytes"
+        print(f"  {t.source:<12} {t.seconds:7.2f}s  status={status}  attempts={t.attempts}  {result}")
@@ -0,0 +1,180 @@
+"""
+爬蟲執行紀錄：每次執行各階段（fetch / parse / write / upload）的耗時、
+各來源的筆數與是否成功，寫入 .cache/metrics/<job>.json，由 API 的 /metrics 一併輸出。
+
+來源在上一次執行中存在、這次卻沒有取得資料（例如解析回傳 None）時，
+會以 up=0、rows=0 輸出，最後成功時間則沿用上次的值，可據此設定告警。
+
+上傳階段由 kv_upload.py 以 job "upload" 記錄（每個 KV key 一個來源）。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from crawler_state import load_json_file
+from metrics import format_family, format_labels
+from publish import _write_atomic, list_data_files, resolve_root
+
+METRICS_DIR = os.environ.get("CRAWLER_METRICS_DIR", os.path.join(".cache", "metrics"))
+
+
+class CrawlRun:
+    """
+    一次爬蟲執行的紀錄
+
+        run = CrawlRun("i18n")
+        with run.stage("fetch"):
+            ...
+        run.rows("sp500", 503)
+        run.save()
+    """
+
+    def __init__(self, job: str, metrics_dir: str = METRICS_DIR):
+        self.job = job
+        self.path = os.path.join(metrics_dir, f"{job}.json")
+        self.started_at = time.time()
+        self.stages: Dict[str, float] = {}
+        self.sources: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        """累加階段耗時（並行的來源各自計時時為合計）"""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(stage, time.perf_counter() - started)
+
+    def timed(self, iterable, stage: str):
+        """逐項產出 iterable 的內容，只把產生每一項所花的時間計入 stage（例如串流解析）"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_stage(stage, time.perf_counter() - started)
+                return
+            self.add_stage(stage, time.perf_counter() - started)
+            yield item
+
+    def rows(self, source: str, count: int):
+        """來源取得資料（含 304 未變更）；count 為目前的筆數"""
+        with self._lock:
+            self.sources[source] = {"up": 1, "rows": int(count)}
+
+    def failed(self, source: str, error: Optional[str] = None):
+        with self._lock:
+            self.sources[source] = {"up": 0, "rows": 0, "error": error or ""}
+
+    def save(self, success: Optional[bool] = None):
+        """
+        寫出紀錄；success 未指定時以所有來源都成功為準
+        上次存在但這次沒有回報的來源視為失敗
+        """
+        previous = load_json_file(self.path) or {}
+        now = time.time()
+        sources = {}
+        for source, entry in (previous.get("sources") or {}).items():
+            sources[source] = {"up": 0, "rows": 0, "error": "missing",
+                               "last_success": entry.get("last_success")}
+        for source, entry in self.sources.items():
+            entry = dict(entry)
+            if entry["up"]:
+                entry["last_success"] = now
+            else:
+                entry["last_success"] = (sources.get(source) or {}).get("last_success")
+            sources[source] = entry
+        if success is None:
+            success = bool(sources) and all(entry["up"] for entry in sources.values())
+
+        record = {
+            "job": self.job,
+            "started_at": self.started_at,
+            "finished_at": now,
+            "duration": now - self.started_at,
+            "success": bool(success),
+            "stages": self.stages,
+            "sources": sources,
+            "newest_data": newest_data_time(),
+        }
+        _write_atomic(self.path, json.dumps(record, ensure_ascii=False, indent=2,
+                                            sort_keys=True).encode("utf-8"))
+        return record
+
+
+def newest_data_time(data_dir: str = "data") -> Optional[float]:
+    """目前發布中資料檔的最新修改時間"""
+    root, _ = resolve_root(data_dir)
+    newest = None
+    for name in list_data_files(root):
+        try:
+            mtime = os.stat(os.path.join(root, name)).st_mtime
+        except OSError:
+            continue
+        newest = mtime if newest is None else max(newest, mtime)
+    return newest
+
+
+def read_runs(metrics_dir: str = METRICS_DIR) -> List[Dict]:
+    try:
+        names = sorted(os.listdir(metrics_dir))
+    except FileNotFoundError:
+        return []
+    runs = []
+    for name in names:
+        if name.endswith(".json"):
+            record = load_json_file(os.path.join(metrics_dir, name))
+            if isinstance(record, dict) and record.get("job"):
+                runs.append(record)
+    return runs
+
+
+def render_runs(runs: List[Dict]) -> List[str]:
+    """將各爬蟲的最新紀錄轉成 Prometheus 文字格式的指標行"""
+    families = {
+        "crawler_last_run_timestamp_seconds": ("gauge", "Finish time of the last crawler run", []),
+        "crawler_last_run_success": ("gauge", "Whether every source of the last run produced data", []),
+        "crawler_run_duration_seconds": ("gauge", "Wall time of the last crawler run", []),
+        "crawler_stage_duration_seconds": ("gauge", "Time spent per stage in the last run", []),
+        "crawler_source_up": ("gauge", "Whether the source produced data in the last run", []),
+        "crawler_source_rows": ("gauge", "Rows obtained per source in the last run", []),
+        "crawler_source_last_success_timestamp_seconds": (
+            "gauge", "Last time the source produced data", []),
+        "crawler_newest_data_timestamp_seconds": (
+            "gauge", "Modification time of the newest data file after the run", []),
+    }
+
+    def add(name, names, values, value):
+        if value is not None:
+            families[name][2].append(f"{name}{format_labels(names, values)} {value}")
+
+    for run in runs:
+        job = run["job"]
+        add("crawler_last_run_timestamp_seconds", ("job",), (job,), run.get("finished_at"))
+        add("crawler_last_run_success", ("job",), (job,), int(bool(run.get("success"))))
+        add("crawler_run_duration_seconds", ("job",), (job,), run.get("duration"))
+        add("crawler_newest_data_timestamp_seconds", ("job",), (job,), run.get("newest_data"))
+        for stage, seconds in sorted((run.get("stages") or {}).items()):
+            add("crawler_stage_duration_seconds", ("job", "stage"), (job, stage), seconds)
+        for source, entry in sorted((run.get("sources") or {}).items()):
+            labels = (job, source)
+            add("crawler_source_up", ("job", "source"), labels, entry.get("up", 0))
+            add("crawler_source_rows", ("job", "source"), labels, entry.get("rows", 0))
+            add("crawler_source_last_success_timestamp_seconds", ("job", "source"), labels,
+                entry.get("last_success"))
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        if samples:
+            lines.extend(format_family(name, kind, help_text, samples))
+    return lines
+
@@ -0,0 +1,65 @@
+"""
+爬蟲的變更偵測：
+
+- 保存每個來源上次回應的 ETag / Last-Modified，下次發送條件式請求，
+  伺服器回 304 時直接略過下載與解析
+- 下載後的結果與現有檔案序列化後相同時不重寫檔案（見 publish.Generation.write_json），
+  API 的檔案監看與 git commit 步驟都不會看到變動
+
+狀態檔預設放在 .cache/crawler_state.json（不在 data/ 內，不會被 commit）。
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+STATE_FILE = os.environ.get("CRAWLER_STATE_FILE", os.path.join(".cache", "crawler_state.json"))
+
+
+def load_json_file(path: str) -> Optional[Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class CrawlerState:
+    """每個來源上次 200 回應的 HTTP 驗證資訊"""
+
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        self._sources: Dict[str, Dict[str, str]] = load_json_file(path) or {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def conditional_headers(self, source: str) -> Dict[str, str]:
+        """依上次回應的驗證資訊組出 If-None-Match / If-Modified-Since"""
+        entry = self._sources.get(source, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, source: str, response):
+        """記錄 200 回應的驗證資訊"""
+        with self._lock:
+            entry = {
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", "")
+            }
+            if entry != self._sources.get(source):
+                self._sources[source] = entry
+                self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self._sources, f, ensure_ascii=False, indent=2, sort_keys=True)
+        self._dirty = False
@@ -0,0 +1,118 @@
+"""
+資料集定義：每份成分股資料（美股指數、台股指數、MOPS 基金持股）對應的檔案
+
+資料集在載入時依 data/ 中實際存在的檔案與 funds_summary.json 動態建立，
+新增基金或指數檔案不需要修改程式：
+
+- `{id}_data.json`：美股指數（slickcharts）
+- `stock_data_{id}.json`：台股指數（Goodinfo 成分股檔）
+- funds_summary.json 列出的 `fund_*.json`：MOPS 基金持股
+"""
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# 已知美股指數的排列順序；其他 *_data.json 依檔名排在後面
+US_INDICES = ["SP500", "NASDAQ100", "DOWJONES"]
+
+# MOPS 基金摘要檔
+FUNDS_SUMMARY_FILE = "funds_summary.json"
+
+US_SUFFIX = "_data.json"
+TW_PREFIX = "stock_data_"
+
+# MOPS 沒有對應到股票代碼的基金（基金 ID 為簡化後的名稱）-> ETF 代碼，
+# 讓 /funds/0056 等也能以代碼查詢；名稱中的「臺」與「台」視為相同
+ETF_CODES = {
+    "台灣高股息": "0056",
+    "台灣高股息低波動ETF": "00713",
+    "台灣ESG永續ETF": "00850",
+    "台灣價值高息ETF": "00940",
+}
+
+
+class Dataset(NamedTuple):
+    """一份成分股資料：美股指數、台股指數或 MOPS 基金持股"""
+    market: str
+    type: str
+    id: str
+    name: str
+    file: str
+
+
+def is_table(data: Any) -> bool:
+    """{代號: 名稱} 形式的成分股檔（排除 all_stock_data.json 等彙整檔）"""
+    return isinstance(data, dict) and all(isinstance(v, str) for v in data.values())
+
+
+def etf_code(fund_name: str) -> Optional[str]:
+    return ETF_CODES.get(fund_name.replace("臺", "台"))
+
+
+def list_datasets(files: Dict[str, Any]) -> List[Dataset]:
+    """依 data/ 中的成分股檔與 funds_summary.json 列出所有資料集"""
+    us, tw = {}, {}
+    for name in files:
+        if not is_table(files[name]):
+            continue
+        if name.startswith(TW_PREFIX) and name.endswith(".json"):
+            tw[name[len(TW_PREFIX):-len(".json")]] = name
+        elif name.endswith(US_SUFFIX):
+            us[name[:-len(US_SUFFIX)].upper()] = name
+
+    order = {index: i for i, index in enumerate(US_INDICES)}
+    datasets = [Dataset("US", "index", index, index, us[index])
+                for index in sorted(us, key=lambda index: (order.get(index, len(order)), index))]
+    datasets += [Dataset("TW", "index", index, index, tw[index]) for index in sorted(tw)]
+
+    seen = set()
+    summary = files.get(FUNDS_SUMMARY_FILE) or []
+    for fund in summary:
+        file_name = fund.get("file")
+        # 傘型基金的子基金會寫入同一個檔案，只計一次
+        if not file_name or file_name in seen or file_name not in files:
+            continue
+        seen.add(file_name)
+        fund_id = fund.get("fund_code") or fund.get("fund_name")
+        datasets.append(Dataset("TW", "fund", fund_id, fund.get("fund_name") or fund_id, file_name))
+    return datasets
+
+
+class DatasetRegistry:
+    """
+    資料集的路由表：ID（不分大小寫）-> Dataset，以及各市場的資料集清單
+    每個快照建立一次，API 的端點都透過此表以 O(1) 找到對應的檔案
+    同一個 ID 有多份資料時（例如 0050 同時有指數檔與基金檔）以先列出的指數為準
+    基金另可用 ETF 代碼（見 ETF_CODES）或基金名稱查詢
+    """
+
+    def __init__(self, datasets: List[Dataset]):
+        self.datasets = datasets
+        self.by_id: Dict[str, Dataset] = {}
+        self.by_market: Dict[str, List[Dataset]] = {}
+        # 基金 ID、ETF 代碼與基金名稱 -> 基金資料集
+        self.funds: Dict[str, Dataset] = {}
+        for dataset in datasets:
+            if dataset.type == "fund":
+                for key in (dataset.id, etf_code(dataset.id), dataset.name):
+                    if key:
+                        self.funds.setdefault(key.upper(), dataset)
+            key = dataset.id.upper()
+            if key in self.by_id:
+                continue
+            self.by_id[key] = dataset
+            self.by_market.setdefault(dataset.market, []).append(dataset)
+
+    def resolve(self, dataset_id: str) -> Optional[Dataset]:
+        key = dataset_id.strip().upper()
+        return self.by_id.get(key) or self.funds.get(key)
+
+    def resolve_fund(self, fund_id: str) -> Optional[Dataset]:
+        """只查基金（0050 同時有指數與基金時取基金）"""
+        return self.funds.get(fund_id.strip().upper())
+
+    def market(self, market: str) -> List[Dataset]:
+        return self.by_market.get(market.upper(), [])
+
+    def ids(self) -> Dict[str, List[str]]:
+        """{市場: [ID, ...]}"""
+        return {market: [dataset.id for dataset in datasets]
+                for market, datasets in self.by_market.items()}
@@ -0,0 +1,171 @@
+"""
+跨資料集的公司實體對照表
+
+同一家公司在不同資料集中的名稱不一致（"NVIDIA Corp" / "Nvidia Corp"、
+"Alphabet Inc" / "Alphabet Inc. Class A Common Stock"），同一公司的不同股份類別
+（GOOG / GOOGL）也是不同代號。發布世代時（見 publish.Generation.publish）會將所有成分股
+正規化成實體，寫入 entities.json：
+
+    {"version": 1,
+     "names": ["Alphabet Inc", "Alphabet", ...],              # 內化的公司名稱
+     "entities": [{"id": "US:GOOGL", "market": "US", "name": 0,
+                   "codes": ["GOOGL", "GOOG"], "aliases": [0, 1, ...]}, ...]}
+
+同一市場中代號相同、或正規化後名稱相同的項目視為同一實體；實體 ID 為
+「市場:代表代號」（出現在最多資料集的代號）。API 載入後以 dict 在 O(1) 內由代號或實體 ID 查詢。
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from datasets import Dataset, list_datasets
+
+ENTITIES_FILE = "entities.json"
+FORMAT_VERSION = 1
+
+# 股份類別與證券種類的描述，不影響公司本身
+SHARE_CLASS_RE = re.compile(
+    r"\b(class [a-z]|series [a-z]|(common|capital|ordinary|preferred|subordinate voting) (stock|shares?)"
+    r"|american depositary (shares?|receipts?)|ads|adr)\b")
+
+# 名稱結尾的公司型態
+SUFFIXES = {"inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited",
+            "plc", "llc", "lp", "sa", "nv", "ag", "se"}
+
+
+def canonical_name(name: str) -> str:
+    """
+    比對用的正規化名稱：全半形、大小寫、標點、股份類別與公司型態都不影響結果
+    "Alphabet Inc. Class A Common Stock" -> "alphabet"；"The Walt Disney Company" -> "walt disney"
+    """
+    text = unicodedata.normalize("NFKC", name).casefold().replace("&", " and ")
+    text = re.sub(r"[^\w]+", " ", text)
+    text = SHARE_CLASS_RE.sub(" ", text)
+    words = text.split()
+    while words and words[-1] in SUFFIXES:
+        words.pop()
+    if words and words[0] == "the":
+        words = words[1:]
+    return " ".join(words)
+
+
+class Entity(NamedTuple):
+    id: str
+    market: str
+    name: str
+    codes: tuple
+    aliases: tuple
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict[Any, Any] = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def build_entity_table(files: Dict[str, Any], datasets: Optional[List[Dataset]] = None) -> Dict:
+    """由資料快照的所有成分股建立 entities.json 的內容"""
+    if datasets is None:
+        datasets = list_datasets(files)
+
+    # (市場, 代號) -> 出現的資料集數與各種名稱
+    seen_in: Counter = Counter()
+    names_of: Dict[tuple, Counter] = {}
+    for dataset in datasets:
+        data = files.get(dataset.file) or {}
+        for code, company in data.items():
+            key = (dataset.market, code)
+            seen_in[key] += 1
+            names_of.setdefault(key, Counter())[company] += 1
+
+    groups = _UnionFind()
+    by_name: Dict[tuple, tuple] = {}
+    for key, names in names_of.items():
+        groups.find(key)
+        market = key[0]
+        for company in names:
+            canonical = canonical_name(company)
+            if not canonical:
+                continue
+            other = by_name.setdefault((market, canonical), key)
+            groups.union(other, key)
+
+    members: Dict[tuple, List[tuple]] = {}
+    for key in names_of:
+        members.setdefault(groups.find(key), []).append(key)
+
+    interned: Dict[str, int] = {}
+    names: List[str] = []
+
+    def intern(value: str) -> int:
+        if value not in interned:
+            interned[value] = len(names)
+            names.append(value)
+        return interned[value]
+
+    entities = []
+    for keys in members.values():
+        market = keys[0][0]
+        # 代表代號：出現在最多資料集者，其次為較短、字典序較前者
+        keys.sort(key=lambda key: (-seen_in[key], len(key[1]), key[1]))
+        aliases: Counter = Counter()
+        for key in keys:
+            aliases.update(names_of[key])
+        # 顯示名稱：最常見的名稱，其次為較短者
+        ordered = sorted(aliases, key=lambda company: (-aliases[company], len(company), company))
+        entities.append({
+            "id": f"{market}:{keys[0][1]}",
+            "market": market,
+            "name": intern(ordered[0]),
+            "codes": [key[1] for key in keys],
+            "aliases": [intern(company) for company in ordered]
+        })
+    entities.sort(key=lambda entity: entity["id"])
+    return {"version": FORMAT_VERSION, "names": names, "entities": entities}
+
+
+class EntityTable:
+    """entities.json 的查詢表：代號 -> 實體、實體 ID -> 實體"""
+
+    def __init__(self, entities: Iterable[Entity]):
+        self.entities: List[Entity] = list(entities)
+        self.by_id: Dict[str, Entity] = {}
+        self.by_code: Dict[str, Entity] = {}
+        for entity in self.entities:
+            self.by_id[entity.id.upper()] = entity
+            for code in entity.codes:
+                self.by_code.setdefault(code, entity)
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "EntityTable":
+        names = data["names"]
+        return cls(Entity(entity["id"], entity["market"], names[entity["name"]], tuple(entity["codes"]),
+                          tuple(names[i] for i in entity["aliases"]))
+                   for entity in data["entities"])
+
+    @classmethod
+    def load(cls, files, datasets: List[Dataset]) -> "EntityTable":
+        """使用發布時預先產生的 entities.json；沒有時（例如未以世代發布）當場建立"""
+        data = files.get(ENTITIES_FILE)
+        if not isinstance(data, dict) or data.get("version") != FORMAT_VERSION:
+            data = build_entity_table(files, datasets)
+        return cls.from_json(data)
+
+    def entity_of(self, code: str) -> Optional[Entity]:
+        return self.by_code.get(code) or self.by_code.get(code.upper())
+
+    def resolve(self, key: str) -> Optional[Entity]:
+        """實體 ID（例如 US:GOOGL，不分大小寫）或任一代號"""
+        key = key.strip()
+        return self.by_id.get(key.upper()) or self.entity_of(key)
@@ -0,0 +1,195 @@
+"""
+靜態匯出：將所有可快取端點的回應預先產生成檔案，供 CDN / Cloudflare KV 直接提供
+
+資料快照只載入一次，每個路徑都實際經過 app.py 的 ASGI 應用取得回應，
+因此檔案內容與線上 API 逐位元組相同。每個檔案另附預先壓縮的 .gz（與安裝 brotli 時的 .br），
+並輸出 manifest.json 記錄每個路徑的內容雜湊，上傳端可據此只上傳有變動的檔案。
+
+    python export_static.py                  # 輸出到 export/
+    python export_static.py --out dist --overlap-pairs
+
+匯出的路徑：/、/indices、/funds、/stocks/{id}、/market/{market}、/stock/{code}、/entities/{id}、
+/overlap（以及 --overlap-pairs 時的 /overlap/{a}/{b}）、/funds/{id}/history、/funds/{id}/holdings、
+/funds/concentration、/funds/{id}/top（預設前 10 大）、/funds/{id}/concentration。
+搜尋、輸入提示、批次查詢與帶查詢參數的請求仍由 Python 伺服器處理。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import quote, unquote
+
+from catalog import Snapshot
+from response_cache import compress_body, content_etag
+
+DEFAULT_OUT_DIR = "export"
+MANIFEST_FILE = "manifest.json"
+
+
+def export_paths(snapshot: Snapshot, overlap_pairs: bool = False) -> Iterator[str]:
+    """快照中所有可快取端點的路徑（路徑參數已 URL 編碼）"""
+    registry = snapshot.registry
+    yield "/"
+    yield "/indices"
+    yield "/funds"
+    for dataset in registry.by_id.values():
+        yield f"/stocks/{quote(dataset.id, safe='')}"
+    for market in registry.by_market:
+        yield f"/market/{market}"
+    for code in snapshot.membership:
+        yield f"/stock/{quote(code, safe='')}"
+    for entity in snapshot.entities.entities:
+        yield f"/entities/{quote(entity.id, safe='')}"
+    yield "/overlap"
+    if overlap_pairs:
+        ids = [quote(dataset_id, safe="") for dataset_id in snapshot.overlap.ids]
+        for a in ids:
+            for b in ids:
+                if a != b:
+                    yield f"/overlap/{a}/{b}"
+    for fund in snapshot.history.funds:
+        fund = quote(fund, safe="")
+        yield f"/funds/{fund}/history"
+        yield f"/funds/{fund}/holdings"
+    yield "/funds/concentration"
+    for fund in snapshot.weights.funds:
+        fund = quote(fund, safe="")
+        yield f"/funds/{fund}/top"
+        yield f"/funds/{fund}/concentration"
+
+
+async def asgi_get(app, path: str) -> Tuple[int, Dict[str, str], bytes]:
+    """直接呼叫 ASGI 應用（不經網路、不需 HTTP 用戶端套件）"""
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": unquote(raw_path),
+        "raw_path": raw_path.encode("ascii"),
+        "query_string": query.encode("ascii"),
+        "root_path": "",
+        "headers": [(b"host", b"export")],
+        "client": ("127.0.0.1", 0),
+        "server": ("export", 80),
+    }
+    status, headers, chunks = 0, {}, []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for key, value in message.get("headers", []):
+                headers[key.decode("latin-1").lower()] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, headers, b"".join(chunks)
+
+
+def file_name(path: str) -> str:
+    """請求路徑 -> 匯出目錄中的相對檔名（/ 對應 index.json）"""
+    path = path.strip("/")
+    return (path or "index") + ".json"
+
+
+def _write(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+async def export_responses(app, snapshot: Snapshot, out_dir: str, overlap_pairs: bool = False) -> Dict:
+    """將每個路徑的回應寫入 out_dir，回傳 manifest"""
+    entries = {}
+    skipped: List[str] = []
+    for path in export_paths(snapshot, overlap_pairs):
+        status, headers, body = await asgi_get(app, path)
+        if status != 200:
+            skipped.append(f"{path} ({status})")
+            continue
+        name = file_name(path)
+        _write(os.path.join(out_dir, name), body)
+        entry = {
+            "file": name,
+            "content_type": headers.get("content-type", "application/json"),
+            "size": len(body),
+            "sha256": hashlib.sha256(body).hexdigest(),
+            "etag": content_etag(body),
+        }
+        gz, br = compress_body(body)
+        if gz is not None:
+            _write(os.path.join(out_dir, name + ".gz"), gz)
+            entry["gzip"] = {"file": name + ".gz", "size": len(gz)}
+        if br is not None:
+            _write(os.path.join(out_dir, name + ".br"), br)
+            entry["br"] = {"file": name + ".br", "size": len(br)}
+        entries[path] = entry
+
+    manifest = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "data_signature": snapshot.signature,
+        "count": len(entries),
+        "skipped": skipped,
+        "responses": entries,
+    }
+    _write(os.path.join(out_dir, MANIFEST_FILE),
+           json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def export(out_dir: str = DEFAULT_OUT_DIR, data_dir: str = "data", overlap_pairs: bool = False) -> Dict:
+    """
+    載入一次資料快照並匯出；先寫入暫存目錄再替換 out_dir，
+    讀取端不會看到只匯出一半的內容
+    """
+    import app as app_module
+    from catalog import StockCatalog
+
+    catalog = StockCatalog(data_dir, reload_interval=0)
+    catalog.reload(force=True)
+    app_module.catalog = catalog
+
+    out_dir = out_dir.rstrip("/")
+    staging = out_dir + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = asyncio.run(export_responses(app_module.app, catalog.snapshot, staging, overlap_pairs))
+
+    previous = out_dir + ".old"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, previous)
+    os.rename(staging, out_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將可快取的 API 回應匯出成靜態檔案")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="輸出目錄")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--overlap-pairs", action="store_true",
+                        help="一併匯出所有 /overlap/{a}/{b}（數量為資料集數的平方）")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest = export(args.out, args.data_dir, args.overlap_pairs)
+    size = sum(entry["size"] for entry in manifest["responses"].values())
+    print(f"Exported {manifest['count']} responses ({size / 1024:.0f} KB) to {args.out}/ "
+          f"in {time.perf_counter() - started:.2f}s")
+    for line in manifest["skipped"]:
+        print(f"  skipped {line}")
+
+
+if __name__ == "__main__":
+    main()
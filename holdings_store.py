@@ -0,0 +1,179 @@
+"""
+基金每季持股的版本化儲存
+
+磁碟格式為 data/history/holdings.jsonl，每行一筆 (基金, 年度, 季度) 的持股：
+
+    {"fund": "0050", "fund_name": "元大台灣卓越50", "year": 114, "season": 3,
+     "holdings": [["2330", "台積電", 57.12, 1234567000], ["2317", "鴻海", null], ...]}
+
+每筆持股為 [代號, 名稱, 持股比率]，有持股數時再加上第四欄。
+
+只會新增行（同一季重抓時新的一行覆蓋舊的），git 的差異也只有新增的季度。
+
+記憶體中以欄式儲存：股票代號與名稱皆內化為整數 ID，每一季只保留
+排序後的代號 ID（int32）、名稱 ID（int32）、權重（float32）與持股數（float64，無資料時皆為 NaN），
+數十檔基金、數十季的歷史仍只佔很小的記憶體。
+"""
+import json
+import os
+from bisect import bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+HISTORY_DIR = "history"
+HISTORY_FILE = os.path.join(HISTORY_DIR, "holdings.jsonl")
+
+# 單筆持股：(股票代號, 股票名稱, 持股比率或 None, 持股數或 None)
+Holding = Tuple[str, str, Optional[float], Optional[float]]
+
+
+def quarter_key(year: int, season: int) -> int:
+    """(民國年, 季) -> 可排序的整數"""
+    return year * 4 + (season - 1)
+
+
+def period_label(year: int, season: int) -> str:
+    return f"{year}Q{season}"
+
+
+class Quarter(NamedTuple):
+    year: int
+    season: int
+    fund_name: str
+    codes: np.ndarray
+    names: np.ndarray
+    weights: np.ndarray
+    shares: np.ndarray
+
+
+class StringTable:
+    """字串內化表"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+
+def read_records(path: str) -> Dict[Tuple[str, int, int], Dict]:
+    """讀取已儲存的每一季持股（同一季以最後一行為準）"""
+    records = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records[(record["fund"], record["year"], record["season"])] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+class HoldingsHistory:
+    """所有基金各季持股的唯讀檢視，隨資料快照建立"""
+
+    def __init__(self):
+        self.codes = StringTable()
+        self.names = StringTable()
+        # 基金 -> 依季度排序的 (quarter_key 列表, Quarter 列表)
+        self.funds: Dict[str, Tuple[List[int], List[Quarter]]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "HoldingsHistory":
+        history = cls()
+        for record in read_records(path).values():
+            history.add(record["fund"], record.get("fund_name") or record["fund"],
+                        record["year"], record["season"], record["holdings"])
+        return history
+
+    def add(self, fund: str, fund_name: str, year: int, season: int, holdings: Iterable):
+        rows = []
+        for code, name, *figures in holdings:
+            weight = figures[0] if figures else None
+            shares = figures[1] if len(figures) > 1 else None
+            rows.append((self.codes.intern(code), self.names.intern(name),
+                         np.nan if weight is None else weight,
+                         np.nan if shares is None else shares))
+        rows.sort()
+        quarter = Quarter(
+            year, season, fund_name,
+            np.array([r[0] for r in rows], dtype=np.int32),
+            np.array([r[1] for r in rows], dtype=np.int32),
+            np.array([r[2] for r in rows], dtype=np.float32),
+            np.array([r[3] for r in rows], dtype=np.float64)
+        )
+        keys, quarters = self.funds.setdefault(fund, ([], []))
+        key = quarter_key(year, season)
+        position = bisect_right(keys, key)
+        if position and keys[position - 1] == key:
+            quarters[position - 1] = quarter
+        else:
+            keys.insert(position, key)
+            quarters.insert(position, quarter)
+
+    def quarters(self, fund: str) -> List[Quarter]:
+        return self.funds.get(fund, ([], []))[1]
+
+    def as_of(self, fund: str, year: int, season: int) -> Optional[Quarter]:
+        """該季（含）以前最近一次公布的持股"""
+        keys, quarters = self.funds.get(fund, ([], []))
+        position = bisect_right(keys, quarter_key(year, season))
+        return quarters[position - 1] if position else None
+
+    def holdings(self, quarter: Quarter) -> List[Dict]:
+        return [
+            {
+                "code": self.codes.strings[code],
+                "name": self.names.strings[name],
+                "weight": None if np.isnan(weight) else round(float(weight), 4),
+                "shares": None if np.isnan(shares) else int(shares)
+            }
+            for code, name, weight, shares in zip(quarter.codes, quarter.names, quarter.weights, quarter.shares)
+        ]
+
+    def holders_as_of(self, stock_code: str, year: int, season: int) -> List[Tuple[str, Quarter, int]]:
+        """該季（含）以前各基金最近一次的持股中，持有此股票者 (基金, 季度, 位置)"""
+        code_id = self.codes.ids.get(stock_code)
+        if code_id is None:
+            return []
+        result = []
+        for fund in self.funds:
+            quarter = self.as_of(fund, year, season)
+            if quarter is None:
+                continue
+            position = int(np.searchsorted(quarter.codes, code_id))
+            if position < len(quarter.codes) and quarter.codes[position] == code_id:
+                result.append((fund, quarter, position))
+        return result
+
+
+def append_quarters(generation, entries: Iterable[Tuple[str, str, int, int, List[Holding]]]) -> int:
+    """
+    在暫存世代（publish.Generation）的持股歷史中新增多筆 (基金, 基金名稱, 年度, 季度, 持股)
+    與已儲存內容相同的季度不重複寫入；回傳實際新增的行數
+    """
+    existing = {key: record["holdings"]
+                for key, record in read_records(generation.path(HISTORY_FILE)).items()}
+    lines = []
+    for fund, fund_name, year, season, holdings in entries:
+        rows = [[code, name, weight] + ([] if shares is None else
+                                        [int(shares) if float(shares).is_integer() else shares])
+                for code, name, weight, shares in holdings]
+        if existing.get((fund, year, season)) == rows:
+            continue
+        existing[(fund, year, season)] = rows
+        lines.append(json.dumps({
+            "fund": fund,
+            "fund_name": fund_name,
+            "year": year,
+            "season": season,
+            "holdings": rows
+        }, ensure_ascii=False, separators=(",", ":")))
+    return generation.append_lines(HISTORY_FILE, lines)
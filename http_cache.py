@@ -0,0 +1,199 @@
+"""
+爬蟲 HTTP 請求的錄製／重播快取，供離線開發與可重現的測試、基準測試使用
+
+crawler_http.make_session 建立的 Session 會掛上 RecordReplayAdapter，由環境變數
+（或 configure()）決定模式：
+
+    CRAWLER_HTTP_CACHE=record   正常連線，並將回應寫入快取
+    CRAWLER_HTTP_CACHE=replay   完全不連線，只由快取回應；快取中沒有的請求失敗（NotRecorded）
+    未設定                      不使用快取（預設）
+
+快取的 key 為 (method, URL, 請求本文) 的 sha256，MOPS 的 POST 表單（年度、季度、基金代號）
+因此各自獨立。每個回應以 gzip 壓縮存成一個檔案（預設在 .cache/http/，
+可由 CRAWLER_HTTP_CACHE_DIR 指定，例如指向 repo 中錄好的 fixtures 目錄）。
+
+- 錄製時移除 If-None-Match / If-Modified-Since，快取中一定是完整的回應內容
+- 重播時不理會條件式請求標頭，一律回傳錄製的回應
+- 429 與 5xx 不錄製，避免暫時性錯誤被重播
+
+    CRAWLER_HTTP_CACHE=record python pipeline.py    # 連線執行一次並錄製
+    CRAWLER_HTTP_CACHE=replay python pipeline.py    # 之後離線重播
+    python http_cache.py                            # 列出快取內容
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+MODE = os.environ.get("CRAWLER_HTTP_CACHE", "").strip().lower()
+CACHE_DIR = os.environ.get("CRAWLER_HTTP_CACHE_DIR", os.path.join(".cache", "http"))
+
+MODES = ("record", "replay")
+
+FORMAT_VERSION = 1
+
+# 錄製時移除的條件式請求標頭
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+# 回應內容已由 requests 解壓縮，這些標頭不再正確
+STRIPPED_RESPONSE_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+class NotRecorded(requests.ConnectionError):
+    """重播模式下快取中沒有此請求（不會重試）"""
+
+
+def configure(mode: Optional[str] = None, directory: Optional[str] = None):
+    """改變之後建立的 Session 所使用的模式與目錄（mode 為 None 或空字串時停用）"""
+    global MODE, CACHE_DIR
+    mode = (mode or "").strip().lower()
+    if mode and mode not in MODES:
+        raise ValueError(f"Unknown HTTP cache mode: {mode} (expected {' or '.join(MODES)})")
+    MODE = mode
+    if directory:
+        CACHE_DIR = directory
+
+
+def _body_bytes(body) -> bytes:
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    raise TypeError(f"Cannot cache a streamed request body ({type(body).__name__})")
+
+
+def request_key(method: str, url: str, body=None) -> str:
+    digest = hashlib.sha256()
+    digest.update(method.upper().encode("ascii"))
+    digest.update(b"\n")
+    digest.update(url.encode("utf-8"))
+    digest.update(b"\n")
+    digest.update(_body_bytes(body))
+    return digest.hexdigest()
+
+
+class HTTPCache:
+    """磁碟上的回應快取：<directory>/<key>.gz，內容為一行 JSON 中繼資料加上回應本文"""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or CACHE_DIR
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.gz")
+
+    def load(self, key: str) -> Optional[Dict]:
+        try:
+            with gzip.open(self.path(key), "rb") as f:
+                meta = json.loads(f.readline())
+                meta["content"] = f.read()
+        except FileNotFoundError:
+            return None
+        return meta
+
+    def store(self, key: str, method: str, url: str, body, status: int, reason: str,
+              headers: Dict[str, str], content: bytes):
+        meta = {
+            "version": FORMAT_VERSION,
+            "method": method.upper(),
+            "url": url,
+            "body": _body_bytes(body).decode("utf-8", errors="replace"),
+            "status": status,
+            "reason": reason,
+            "headers": {name: value for name, value in headers.items()
+                        if name.lower() not in STRIPPED_RESPONSE_HEADERS},
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # 執行緒各自寫入暫存檔再替換，並行錄製同一請求時不會讀到寫一半的檔案
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wb") as f:
+            f.write(json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.write(content)
+        os.replace(tmp, path)
+
+    def entries(self) -> List[Dict]:
+        """所有快取項目的中繼資料（不含本文）"""
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            with gzip.open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                meta["size"] = len(f.read())
+            meta["key"] = name[:-len(".gz")]
+            meta["stored_bytes"] = os.path.getsize(path)
+            result.append(meta)
+        return result
+
+
+class RecordReplayAdapter(HTTPAdapter):
+    """在錄製模式下寫入、重播模式下讀取 HTTPCache 的 transport adapter"""
+
+    def __init__(self, mode: str, cache: HTTPCache, **kwargs):
+        super().__init__(**kwargs)
+        self.mode = mode
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        if self.mode == "replay":
+            recorded = self.cache.load(key)
+            if recorded is None:
+                raise NotRecorded(f"{request.method} {request.url} is not recorded in {self.cache.directory}",
+                                  request=request)
+            return self._replay(request, recorded)
+
+        for name in CONDITIONAL_HEADERS:
+            request.headers.pop(name, None)
+        response = super().send(request, **kwargs)
+        if response.status_code != 429 and response.status_code < 500:
+            self.cache.store(key, request.method, request.url, request.body, response.status_code,
+                             response.reason, response.headers, response.content)
+        return response
+
+    def _replay(self, request, recorded: Dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = recorded["status"]
+        response.reason = recorded["reason"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = recorded["content"]
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+def make_adapter(pool_size: int) -> HTTPAdapter:
+    """依目前的模式建立 adapter；未啟用快取時為一般的 HTTPAdapter"""
+    if MODE in MODES:
+        return RecordReplayAdapter(MODE, HTTPCache(CACHE_DIR), pool_connections=pool_size, pool_maxsize=pool_size)
+    return HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else CACHE_DIR
+    entries = HTTPCache(directory).entries()
+    for entry in entries:
+        body = f"  {entry['body']}" if entry["body"] else ""
+        print(f"{entry['key'][:12]}  {entry['status']}  {entry['method']:<4} {entry['url']}{body}  "
+              f"({entry['size']} bytes, {entry['stored_bytes']} stored)")
+    print(f"{len(entries)} recorded response(s) in {directory}")
+
+
+if __name__ == "__main__":
+    main()
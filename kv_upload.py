@@ -0,0 +1,230 @@
+"""
+上傳資料到 Cloudflare KV：只上傳內容有變動的 key，並以 KV bulk write API 批次送出
+
+取代 upload2KV.sh 原本逐一執行 `npx wrangler kv key put` 的迴圈（每個 key 都要啟動一次
+Node 與一次 HTTPS 往返，且只上傳 5 個檔案）：
+
+- 依目前發布中資料建立的資料集路由表（見 datasets.py），上傳每一個指數與基金
+- 每個 key 的內容 sha256 記錄在 .cache/kv_manifest.json（依 namespace 分開），
+  與上次成功上傳的雜湊相同的 key 不會送出
+- 變動的 key 以 bulk API 一次送出（超過單批上限時分批，並以有限的並行數送出）
+- 只有成功的批次才會更新 manifest；失敗的 key 下次執行會重送
+
+    CLOUDFLARE_ACCOUNT_ID=... CLOUDFLARE_API_TOKEN=... CLOUDFLARE_KV_NAMESPACE_ID=... \\
+        python kv_upload.py
+
+`--api-base`（或環境變數 `KV_API_BASE`）可改為本機的 KV 替身服務（見 tests/kv_server.py），
+`--dry-run` 只列出會上傳的 key。
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from catalog import load_snapshot
+from crawler_http import fetch, make_session
+from crawler_metrics import CrawlRun
+from crawler_state import load_json_file
+from datasets import Dataset
+from publish import _write_atomic
+
+API_BASE = os.environ.get("KV_API_BASE", "https://api.cloudflare.com/client/v4")
+MANIFEST_FILE = os.environ.get("KV_MANIFEST_FILE", os.path.join(".cache", "kv_manifest.json"))
+
+# KV bulk write 的單批上限：10,000 個 key、總大小 100 MB（保留一些餘裕給 JSON 包裝）
+MAX_BATCH_KEYS = 10000
+MAX_BATCH_BYTES = 95 * 1024 * 1024
+DEFAULT_CONCURRENCY = 4
+
+# 既有的 KV key（Worker 端依這些名稱讀取），其餘資料集以 kv_key() 的規則命名
+LEGACY_KEYS = {
+    "sp500_data.json": "SP500",
+    "nasdaq100_data.json": "nasdaq100",
+    "dowjones_data.json": "dowjones",
+    "fund_0050.json": "TW0050",
+    "fund_0100.json": "TW0100",
+}
+
+
+class KVEntry(NamedTuple):
+    key: str
+    file: str
+    value: str
+    sha256: str
+    rows: int
+
+
+def kv_key(dataset: Dataset) -> str:
+    """美股指數以 ID 為 key，台股指數與基金加上 TW 前綴（與既有的 TW0050 相同）"""
+    if dataset.file in LEGACY_KEYS:
+        return LEGACY_KEYS[dataset.file]
+    if dataset.market == "US":
+        return dataset.id
+    return f"{dataset.market}{dataset.id}"
+
+
+def collect_entries(data_dir: str = "data") -> List[KVEntry]:
+    """目前發布中的每個資料集對應一個 KV key，值為資料檔的原始內容"""
+    snapshot = load_snapshot(data_dir)
+    entries = []
+    seen = set()
+    for dataset in snapshot.registry.datasets:
+        if dataset.file in seen:
+            continue
+        seen.add(dataset.file)
+        with open(os.path.join(snapshot.root, dataset.file), 'rb') as f:
+            content = f.read()
+        entries.append(KVEntry(
+            key=kv_key(dataset),
+            file=dataset.file,
+            value=content.decode("utf-8"),
+            sha256=hashlib.sha256(content).hexdigest(),
+            rows=len(snapshot.get(dataset.file))
+        ))
+    return entries
+
+
+def load_manifest(namespace_id: str, path: str = MANIFEST_FILE) -> Dict[str, str]:
+    """上次成功上傳到此 namespace 的 {key: sha256}"""
+    manifest = load_json_file(path) or {}
+    return dict(manifest.get(namespace_id) or {})
+
+
+def save_manifest(namespace_id: str, uploaded: Dict[str, str], path: str = MANIFEST_FILE):
+    manifest = load_json_file(path) or {}
+    manifest[namespace_id] = uploaded
+    _write_atomic(path, json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode("utf-8"))
+
+
+def changed_entries(entries: List[KVEntry], uploaded: Dict[str, str]) -> List[KVEntry]:
+    return [entry for entry in entries if uploaded.get(entry.key) != entry.sha256]
+
+
+def make_batches(entries: List[KVEntry], max_keys: int = MAX_BATCH_KEYS,
+                 max_bytes: int = MAX_BATCH_BYTES) -> List[List[KVEntry]]:
+    batches, batch, size = [], [], 0
+    for entry in entries:
+        entry_size = len(entry.key.encode("utf-8")) + len(entry.value.encode("utf-8"))
+        if batch and (len(batch) >= max_keys or size + entry_size > max_bytes):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(entry)
+        size += entry_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class KVClient:
+    """Cloudflare KV 的 bulk write API（PUT .../storage/kv/namespaces/{id}/bulk）"""
+
+    def __init__(self, account_id: str, namespace_id: str, api_token: str,
+                 api_base: str = API_BASE, retries: int = 3, backoff: float = 1.0):
+        self.url = (f"{api_base.rstrip('/')}/accounts/{account_id}"
+                    f"/storage/kv/namespaces/{namespace_id}/bulk")
+        # 上傳一定要實際送出，不經過爬蟲的錄製／重播快取
+        self.session = make_session(http_cache=False)
+        self.session.headers.update({"Authorization": f"Bearer {api_token}"})
+        self.retries = retries
+        self.backoff = backoff
+
+    def put_bulk(self, batch: List[KVEntry]) -> Optional[str]:
+        """送出一批 key；成功時回傳 None，失敗時回傳錯誤訊息"""
+        payload = [{"key": entry.key, "value": entry.value} for entry in batch]
+        response, timing = fetch(self.session, "PUT", self.url, source="kv-bulk",
+                                 retries=self.retries, backoff=self.backoff, json=payload)
+        if response is None:
+            return timing.error
+        try:
+            result = response.json()
+        except ValueError:
+            return f"invalid response (HTTP {response.status_code})"
+        if not result.get("success", False):
+            return "; ".join(str(error.get("message", error)) for error in result.get("errors") or []) \
+                or "request was not successful"
+        return None
+
+
+def upload(entries: List[KVEntry], client: KVClient, uploaded: Dict[str, str],
+           concurrency: int = DEFAULT_CONCURRENCY,
+           max_keys: int = MAX_BATCH_KEYS) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    上傳 entries 中有變動的 key
+    回傳 (更新後的 {key: sha256}, 失敗的 {key: 錯誤訊息})；失敗批次中的 key 維持上次的雜湊
+    """
+    batches = make_batches(changed_entries(entries, uploaded), max_keys=max_keys)
+    uploaded = dict(uploaded)
+    failed: Dict[str, str] = {}
+    if not batches:
+        return uploaded, failed
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as executor:
+        for batch, error in zip(batches, executor.map(client.put_bulk, batches)):
+            for entry in batch:
+                if error is None:
+                    uploaded[entry.key] = entry.sha256
+                else:
+                    failed[entry.key] = error
+    return uploaded, failed
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="將變動的資料集以 bulk API 上傳到 Cloudflare KV")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--namespace-id", default=os.environ.get("CLOUDFLARE_KV_NAMESPACE_ID", ""))
+    parser.add_argument("--account-id", default=os.environ.get("CLOUDFLARE_ACCOUNT_ID", ""))
+    parser.add_argument("--api-base", default=API_BASE, help="KV API 的位址（預設為 KV_API_BASE 或 Cloudflare）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時送出的批次數")
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--force", action="store_true", help="忽略 manifest，上傳所有 key")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會上傳的 key")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    api_token = os.environ.get("CLOUDFLARE_API_TOKEN", "")
+    if not args.namespace_id:
+        print("CLOUDFLARE_KV_NAMESPACE_ID is required.", file=sys.stderr)
+        return 1
+
+    run = CrawlRun("upload")
+    entries = collect_entries(args.data_dir)
+    uploaded = {} if args.force else load_manifest(args.namespace_id, args.manifest)
+    changed = changed_entries(entries, uploaded)
+    print(f"{len(changed)} of {len(entries)} keys changed")
+    for entry in changed:
+        print(f"  {entry.key:<24} {entry.file} ({len(entry.value)} chars)")
+    if args.dry_run:
+        return 0
+    if changed and not (args.account_id and api_token):
+        print("CLOUDFLARE_ACCOUNT_ID and CLOUDFLARE_API_TOKEN are required.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    client = KVClient(args.account_id, args.namespace_id, api_token, api_base=args.api_base)
+    uploaded, failed = upload(entries, client, uploaded, args.concurrency)
+    run.add_stage("upload", time.perf_counter() - started)
+    save_manifest(args.namespace_id, uploaded, args.manifest)
+
+    for entry in entries:
+        if entry.key in failed:
+            run.failed(entry.key, failed[entry.key])
+        else:
+            run.rows(entry.key, entry.rows)
+    run.save()
+
+    print(f"Uploaded {len(changed) - len(failed)} keys in {time.perf_counter() - started:.2f}s")
+    if failed:
+        for key, error in sorted(failed.items()):
+            print(f"  failed {key}: {error}", file=sys.stderr)
+        print(f"Failed to upload {len(failed)} key(s).", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+API 的 Prometheus 指標（文字格式，不依賴 prometheus_client）
+
+- 每個路由的延遲直方圖、回應大小、進行中的請求數
+- 資料快照的重載次數與耗時、資料新舊程度
+- 回應快取的命中 / 未命中與 304 次數
+- 爬蟲每次執行寫出的階段耗時與筆數（見 crawler_metrics.py），於 /metrics 一併輸出
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 延遲直方圖的上界（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# 回應大小直方圖的上界（位元組）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# 重載耗時直方圖的上界（秒）
+RELOAD_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def format_family(name: str, kind: str, help_text: str, samples: List[str]) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + samples
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return format_family(self.name, self.kind, self.help, self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    """可直接設定，或以 callback 在輸出時計算目前值"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._callback is not None:
+            value = self._callback()
+            return [] if value is None else [f"{self.name} {_format_value(value)}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # 標籤 -> [各區間的計數（非累計，最後一格為 +Inf）, 總和]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        names = self.labels + ("le",)
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """於輸出時呼叫，回傳額外的指標行（例如爬蟲寫出的指標）"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "stock_api_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status")))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "stock_api_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route"), LATENCY_BUCKETS))
+RESPONSE_SIZE = REGISTRY.register(Histogram(
+    "stock_api_response_size_bytes", "HTTP response body size by route",
+    ("method", "route"), SIZE_BUCKETS))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "stock_api_requests_in_flight", "HTTP requests currently being served"))
+
+RELOADS = REGISTRY.register(Counter(
+    "stock_api_catalog_reloads_total", "Data snapshot reload attempts by result", ("result",)))
+RELOAD_DURATION = REGISTRY.register(Histogram(
+    "stock_api_catalog_reload_duration_seconds", "Time spent loading a data snapshot",
+    (), RELOAD_BUCKETS))
+
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "stock_api_response_cache_requests_total", "Pre-serialized response lookups by result",
+    ("result",)))
+NOT_MODIFIED = REGISTRY.register(Counter(
+    "stock_api_not_modified_total", "Responses answered with 304 Not Modified"))
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, size: Optional[int]):
+    REQUESTS.inc(method=method, route=route, status=str(status))
+    REQUEST_DURATION.observe(seconds, method=method, route=route)
+    if size is not None:
+        RESPONSE_SIZE.observe(size, method=method, route=route)
+
+
+class Timer:
+    """with Timer() as timer: ...；結束後 timer.seconds 為經過秒數"""
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.started
+        return False
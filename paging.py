@@ -0,0 +1,145 @@
+"""
+大型回應的逐筆輸出：/stocks/{id} 與 /market/{market} 的成分股可以
+
+- 以 `format=ndjson` 串流，每筆一行，邊產生邊送出（不在記憶體中組出整份回應）
+- 以 `limit` 與 `cursor` 分頁，`fields` 只輸出需要的欄位
+
+游標包含資料快照的指紋與位置；快照替換後（位置可能已改變）再使用舊游標會回 409，
+客戶端應從頭重新分頁。成分股以 Records 依位置存取，每頁直接定位到游標的位置，
+成本與頁的大小成正比、與位置無關。未帶這些參數時回應與原本相同（仍走預先序列化的快取）。
+"""
+import base64
+import json
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from response_cache import render_json
+
+# 單頁上限
+MAX_PAGE_SIZE = 5000
+
+# 串流時累積到此大小才送出一段
+STREAM_CHUNK_SIZE = 64 * 1024
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class Records(Sequence):
+    """
+    多個 [(代號, 名稱)] 串接成的唯讀紀錄序列，每個部分可帶固定欄位（例如 {"index": "SP500"}）
+    依位置存取時以二分搜尋找到所屬的部分，紀錄的 dict 只在取用時建立
+    """
+
+    def __init__(self, parts: Iterable[Tuple[Dict[str, Any], Sequence[Tuple[str, str]]]]):
+        self.parts = [(extra, rows) for extra, rows in parts if rows]
+        self.starts = []
+        total = 0
+        for _, rows in self.parts:
+            self.starts.append(total)
+            total += len(rows)
+        self.total = total
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self.total))]
+        if index < 0:
+            index += self.total
+        if not 0 <= index < self.total:
+            raise IndexError("record index out of range")
+        part = bisect_right(self.starts, index) - 1
+        extra, rows = self.parts[part]
+        code, company = rows[index - self.starts[part]]
+        return {**extra, "code": code, "company": company}
+
+
+def encode_cursor(offset: int, fingerprint: str) -> str:
+    raw = json.dumps([offset, fingerprint], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], fingerprint: str) -> int:
+    """游標 -> 起始位置；格式錯誤回 400，快照已替換回 409"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        offset, cursor_fingerprint = json.loads(raw)
+        offset = int(offset)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_fingerprint != fingerprint:
+        raise HTTPException(status_code=409, detail="Data changed since the cursor was issued; restart pagination")
+    return offset
+
+
+def parse_fields(fields: Optional[str], available: Sequence[str]) -> Optional[List[str]]:
+    """以逗號分隔的欄位 -> 欄位列表（依 available 的順序）；未指定時為 None（全部欄位）"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(available)
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown fields: {', '.join(sorted(unknown))} (available: {', '.join(available)})")
+    return [name for name in available if name in requested]
+
+
+def project(records: Iterable[Dict], fields: Optional[List[str]]) -> Iterator[Dict]:
+    if fields is None:
+        return iter(records)
+    return ({name: record[name] for name in fields} for record in records)
+
+
+def page_end(records: Sequence[Dict], offset: int, limit: Optional[int]) -> int:
+    return len(records) if limit is None else min(len(records), offset + limit)
+
+
+def page(records: Sequence[Dict], offset: int, limit: Optional[int]) -> Tuple[List[Dict], bool]:
+    """從 offset 起取 limit 筆（直接切片），回傳 (該頁, 是否還有下一頁)"""
+    end = page_end(records, offset, limit)
+    return list(records[offset:end]), end < len(records)
+
+
+def paginated(records: Sequence[Dict], fingerprint: str, cursor: Optional[str],
+              limit: Optional[int], fields: Optional[List[str]], **meta) -> Dict:
+    """一頁 JSON：meta 欄位 + records + next_cursor（沒有下一頁時為 None）"""
+    offset = decode_cursor(cursor, fingerprint)
+    records, has_more = page(records, offset, limit)
+    return {
+        **meta,
+        "records": list(project(records, fields)),
+        "next_cursor": encode_cursor(offset + len(records), fingerprint) if has_more else None
+    }
+
+
+def ndjson_response(records: Sequence[Dict], fingerprint: str, cursor: Optional[str],
+                    limit: Optional[int], fields: Optional[List[str]]) -> StreamingResponse:
+    """以 NDJSON 逐筆輸出；有 limit 且還有下一頁時，最後一行為 {"next_cursor": ...}"""
+    offset = decode_cursor(cursor, fingerprint)
+    end = page_end(records, offset, limit)
+
+    def lines():
+        buffer, size = [], 0
+        # 依位置逐筆取用，不一次組出整頁
+        for position in range(offset, end):
+            line = render_json(next(project((records[position],), fields))) + b"\n"
+            buffer.append(line)
+            size += len(line)
+            if size >= STREAM_CHUNK_SIZE:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+        if end < len(records):
+            # 還有下一筆：以最後一行的 {"next_cursor": ...} 告知客戶端
+            buffer.append(render_json({"next_cursor": encode_cursor(end, fingerprint)}) + b"\n")
+        if buffer:
+            yield b"".join(buffer)
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
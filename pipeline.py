@@ -0,0 +1,476 @@
+"""
+爬蟲管線：所有資料來源的單一進入點
+
+每個來源（slickcharts 的各美股指數、MOPS 基金持股）依序執行
+
+    fetch -> parse -> normalize -> validate -> publish
+
+- 各來源在執行緒池中並行；同一發布群組（group）的來源在同一個世代一起發布，
+  例如所有美股指數永遠來自同一次爬取（與 crawler-i18n.py 相同），
+  不同群組各自發布（publish.Generation 以檔案鎖串行化），MOPS 回應再慢也不會延後美股指數的發布
+- 重試只在一層進行：HTTP 請求由 crawler_http.fetch 重試（--retries），
+  發布失敗時只重試發布（--publish-retries，已下載與解析的結果不會重做）；
+  解析與驗證的結果是確定的，失敗時不重試。群組中失敗的來源不影響其他來源發布
+- 每個階段的耗時、嘗試次數與筆數會輸出成報表，並累加到 crawler_metrics（job 沿用 i18n / mops）
+- 伺服器回 304 時略過其餘階段
+
+    python pipeline.py                        # 所有來源
+    python pipeline.py --only sp500,mops      # 指定來源
+    python pipeline.py --upload               # 發布後上傳變動的資料到 Cloudflare KV
+    python pipeline.py --http-cache replay    # 由錄製的回應離線執行（見 http_cache.py）
+
+任何來源失敗時結束代碼為 1。
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from changefeed import record_changes
+from crawler_http import (DEFAULT_BACKOFF, DEFAULT_PER_HOST, DEFAULT_RETRIES, HostLimiter,
+                          backoff_delay, fetch, make_session)
+from crawler_metrics import CrawlRun
+from crawler_state import CrawlerState, load_json_file
+import http_cache
+from publish import Generation
+from script_loader import load_script
+
+DATA_DIR = "data"
+
+STAGES = ("fetch", "parse", "normalize", "validate", "publish")
+
+# 發布失敗後的重試次數（HTTP 請求的重試見 crawler_http）
+DEFAULT_PUBLISH_RETRIES = 2
+
+# 各指數至少應有的成分股數；低於此數多半是頁面改版或解析錯誤，不發布
+MIN_INDEX_ROWS = {
+    'sp500': 400,
+    'nasdaq100': 90,
+    'dowjones': 25,
+}
+
+
+i18n = load_script("crawler-i18n.py", "crawler_i18n")
+mops = load_script("crawler-mops-individual.py", "crawler_mops_individual")
+
+SOURCE_NAMES = list(i18n.INDEX_FILES) + ["mops"]
+
+
+class NotModified(Exception):
+    """伺服器回 304，略過其餘階段"""
+
+
+class StageReport(NamedTuple):
+    source: str
+    stage: str
+    seconds: float
+    attempts: int
+    records: Optional[int]
+    error: Optional[str] = None
+
+
+class Source:
+    """
+    一個資料來源；前一階段的回傳值為下一階段的輸入，normalize 回傳 {檔名: 內容}
+    group 相同的來源在同一個世代發布（未指定時為來源名稱）
+    run 為該 job 共用的 CrawlRun（由 prepare 設定）；attempts 為 fetch 的 HTTP 嘗試次數；
+    done 在發布成功後呼叫
+    """
+    name = ""
+    job = ""
+    group = ""
+    run: CrawlRun = None
+    attempts = 1
+
+    def fetch(self) -> Any:
+        raise NotImplementedError
+
+    def parse(self, fetched) -> Any:
+        raise NotImplementedError
+
+    def normalize(self, parsed) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def validate(self, files: Dict[str, Any]) -> Dict[str, Any]:
+        for name, data in files.items():
+            if not data:
+                raise ValueError(f"{name} is empty")
+        return files
+
+    def publish(self, generation: Generation, files: Dict[str, Any]) -> Dict[str, tuple]:
+        """寫入暫存世代；回傳要記錄到變動紀錄的 {資料集: (舊資料, 新資料)}（同一 job 合併記錄）"""
+        for name, data in files.items():
+            generation.write_json(name, data)
+        return {}
+
+    def unchanged(self):
+        """伺服器回 304 時呼叫（記錄目前的筆數）"""
+
+    def failed(self, error: str):
+        self.run.failed(self.name, error)
+
+    def done(self):
+        pass
+
+
+class SlickchartsSource(Source):
+    """slickcharts 的單一美股指數；所有指數一起發布"""
+    job = "i18n"
+    group = "slickcharts"
+
+    def __init__(self, index_name: str, session, limiter: HostLimiter, state: CrawlerState,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF):
+        self.name = index_name
+        self.file = i18n.INDEX_FILES[index_name]
+        self.session = session
+        self.limiter = limiter
+        self.state = state
+        self.retries = retries
+        self.backoff = backoff
+        self.response = None
+        self.stocks = None
+
+    def fetch(self):
+        # 本地沒有舊檔時必須完整下載，不能接受 304
+        conditional = os.path.exists(os.path.join(DATA_DIR, self.file))
+        headers = self.state.conditional_headers(self.name) if conditional else {}
+        response, timing = fetch(self.session, "GET", i18n.URLS[self.name], source=self.name,
+                                 limiter=self.limiter, retries=self.retries, backoff=self.backoff,
+                                 headers=headers)
+        self.attempts = timing.attempts
+        if response is None:
+            raise RuntimeError(timing.error)
+        if response.status_code == 304:
+            raise NotModified()
+        self.response = response
+        return response.text
+
+    def parse(self, html):
+        stocks = i18n.parse_stock_table(html, self.name)
+        if not stocks:
+            raise ValueError(f"No constituents found for {self.name}")
+        return stocks
+
+    def normalize(self, stocks):
+        self.stocks = {code.strip(): company.strip() for code, company in stocks.items()}
+        return {self.file: self.stocks}
+
+    def validate(self, files):
+        files = super().validate(files)
+        rows, minimum = len(files[self.file]), MIN_INDEX_ROWS.get(self.name, 1)
+        if rows < minimum:
+            raise ValueError(f"{self.name} has only {rows} rows (expected at least {minimum})")
+        return files
+
+    def publish(self, generation, files):
+        previous = generation.read_json(self.file)
+        super().publish(generation, files)
+        return {self.name.upper(): (previous, files[self.file])}
+
+    def unchanged(self):
+        self.run.rows(self.name, len(load_json_file(os.path.join(DATA_DIR, self.file)) or {}))
+
+    def done(self):
+        self.run.rows(self.name, len(self.stocks))
+        self.state.update(self.name, self.response)
+
+
+class MopsSource(Source):
+    """MOPS 基金持股（t78sb04），所有基金在同一個回應中"""
+    name = "mops"
+    job = "mops"
+
+    def __init__(self, state: CrawlerState, year: Optional[int] = None, season: Optional[int] = None,
+                 engine: str = "stream", probe: bool = True,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF):
+        self.state = state
+        self.year, self.season = year, season
+        self.engine = engine
+        self.probe = probe
+        self.retries = retries
+        self.backoff = backoff
+        self.session = make_session(pool_size=1)
+        self.response = None
+        self.funds: List = []
+
+    @property
+    def source_key(self) -> str:
+        # 同一季度的查詢才可沿用上次的 ETag / Last-Modified
+        return f"mops:{self.year}Q{self.season}"
+
+    @property
+    def summary_path(self) -> str:
+        return os.path.join(DATA_DIR, "funds_summary.json")
+
+    def fetch(self):
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        if self.year is None or self.season is None:
+            if self.probe:
+                self.year, self.season = mops.latest_published_quarter(session=self.session)
+            else:
+                self.year, self.season = mops.calendar_quarter()
+        print(f"MOPS 季度: 民國 {self.year} 年第 {self.season} 季")
+
+        headers = dict(mops.MOPS_HEADERS)
+        # 本地沒有摘要檔時必須完整下載
+        if os.path.exists(self.summary_path):
+            headers.update(self.state.conditional_headers(self.source_key))
+        response, timing = fetch(self.session, "POST", mops.MOPS_URL, source=self.source_key,
+                                 retries=self.retries, backoff=self.backoff, headers=headers,
+                                 data=mops.mops_payload(self.year, self.season), verify=False)
+        self.attempts = timing.attempts
+        if response is None:
+            raise RuntimeError(timing.error)
+        if response.status_code == 304:
+            raise NotModified()
+        self.response = response
+        return response.text
+
+    def parse(self, html):
+        funds = list(mops.PARSERS[self.engine](html))
+        if not funds:
+            raise ValueError(f"No fund holdings found for {self.year}Q{self.season}")
+        return funds
+
+    def normalize(self, funds):
+        # 同一檔名（傘型基金的子基金）以最後一筆為準，與 write_funds 相同
+        self.funds = funds
+        return {mops.fund_file_name(fund_name, fund_code): holdings
+                for fund_name, fund_code, holdings, _ in funds}
+
+    def publish(self, generation, files):
+        # write_funds 同時追加持股歷史、變動紀錄並記錄各基金筆數
+        summary = mops.write_funds(generation, self.funds, self.year, self.season, self.run)
+        generation.write_json("funds_summary.json", summary)
+        return {}
+
+    def unchanged(self):
+        for fund in load_json_file(self.summary_path) or []:
+            self.run.rows(fund.get('fund_code') or fund['fund_name'], fund.get('holdings_count', 0))
+
+    def failed(self, error: str):
+        # 各基金沒有回報，CrawlRun.save 會將它們標為 missing
+        pass
+
+    def done(self):
+        self.state.update(self.source_key, self.response)
+
+
+def _count(result) -> Optional[int]:
+    """階段結果的筆數；{檔名: 內容} 為各檔筆數的合計"""
+    if not isinstance(result, (dict, list)):
+        return None
+    if result and isinstance(result, dict) and all(isinstance(data, (dict, list)) for data in result.values()):
+        return sum(len(data) for data in result.values())
+    return len(result)
+
+
+class Prepared(NamedTuple):
+    """fetch 到 validate 的結果；files 為 None 表示不發布（失敗或 304）"""
+    source: Source
+    reports: List[StageReport]
+    files: Optional[Dict[str, Any]]
+
+
+def prepare(source: Source, run: CrawlRun) -> Prepared:
+    """執行 fetch 到 validate；失敗的階段不重試（HTTP 的重試在 crawler_http.fetch）"""
+    source.run = run
+    reports = []
+    value = None
+    for stage in STAGES[:-1]:
+        started = time.perf_counter()
+        try:
+            value = source.fetch() if stage == "fetch" else getattr(source, stage)(value)
+        except NotModified:
+            seconds = time.perf_counter() - started
+            run.add_stage(stage, seconds)
+            reports.append(StageReport(source.name, stage, seconds, source.attempts, None, "not modified"))
+            print(f"[{source.name}] not modified, skip remaining stages")
+            source.unchanged()
+            return Prepared(source, reports, None)
+        except Exception as e:
+            seconds = time.perf_counter() - started
+            run.add_stage(stage, seconds)
+            error = f"{type(e).__name__}: {e}"
+            attempts = source.attempts if stage == "fetch" else 1
+            reports.append(StageReport(source.name, stage, seconds, attempts, None, error))
+            print(f"[{source.name}] {stage} failed: {error}")
+            source.failed(error)
+            return Prepared(source, reports, None)
+        seconds = time.perf_counter() - started
+        run.add_stage(stage, seconds)
+        reports.append(StageReport(source.name, stage, seconds,
+                                   source.attempts if stage == "fetch" else 1, _count(value)))
+    return Prepared(source, reports, value)
+
+
+def _publish(ready: List[Prepared]):
+    """在一個新的暫存世代寫入群組中所有來源並發布；失敗時暫存內容會被丟棄，可直接重試"""
+    with Generation(DATA_DIR) as generation:
+        changes: Dict[str, Dict[str, tuple]] = {}
+        for prepared in ready:
+            changes.setdefault(prepared.source.job, {}).update(
+                prepared.source.publish(generation, prepared.files) or {})
+        for job, snapshots in changes.items():
+            if snapshots:
+                record_changes(generation, job, snapshots)
+        generation.publish()
+
+
+def publish_group(members: List, retries: int = DEFAULT_PUBLISH_RETRIES,
+                  backoff: float = DEFAULT_BACKOFF) -> List[Prepared]:
+    """
+    等待群組中所有來源完成 validate（members 為 prepare 的 Future），再一起發布
+    發布失敗時只重試發布；回傳加上 publish 報告後的結果
+    """
+    prepared = [future.result() for future in members]
+    ready = [item for item in prepared if item.files is not None]
+    if not ready:
+        return prepared
+
+    started = time.perf_counter()
+    attempt, error = 0, None
+    while True:
+        attempt += 1
+        try:
+            _publish(ready)
+            error = None
+            break
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt > retries:
+                break
+            print(f"[{', '.join(item.source.name for item in ready)}] publish failed (attempt {attempt}): "
+                  f"{error}; retrying")
+            time.sleep(backoff_delay(attempt - 1, backoff))
+    seconds = time.perf_counter() - started
+
+    jobs_timed = set()
+    for item in ready:
+        source = item.source
+        if source.job not in jobs_timed:
+            source.run.add_stage("publish", seconds)
+            jobs_timed.add(source.job)
+        item.reports.append(StageReport(source.name, "publish", seconds, attempt,
+                                        _count(item.files) if error is None else None, error))
+        if error is None:
+            source.done()
+        else:
+            print(f"[{source.name}] publish failed: {error}")
+            source.failed(error)
+    return prepared
+
+
+def succeeded(reports: List[StageReport]) -> bool:
+    return all(report.error in (None, "not modified") for report in reports)
+
+
+def run_pipeline(sources: List[Source], state: CrawlerState, concurrency: Optional[int] = None,
+                 retries: int = DEFAULT_PUBLISH_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF) -> Dict[str, List[StageReport]]:
+    """
+    並行執行所有來源；同一群組的來源完成後在同一個世代發布，各群組互不等待
+    同一 job 的來源共用一份 crawler_metrics 紀錄
+    """
+    runs = {source.job: CrawlRun(source.job) for source in sources}
+    groups: Dict[str, List[Source]] = {}
+    for source in sources:
+        groups.setdefault(source.group or source.name, []).append(source)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or len(sources))) as executor, \
+            ThreadPoolExecutor(max_workers=len(groups)) as publishers:
+        prepared = {source.name: executor.submit(prepare, source, runs[source.job]) for source in sources}
+        published = [publishers.submit(publish_group, [prepared[source.name] for source in members],
+                                       retries, backoff)
+                     for members in groups.values()]
+        results = {item.source.name: item.reports for future in published for item in future.result()}
+    results = {source.name: results[source.name] for source in sources}
+
+    for job, run in runs.items():
+        run.save(success=all(succeeded(results[source.name]) for source in sources if source.job == job))
+    # 驗證資訊只在發布成功後更新（見 Source.done），否則下次會收到 304 而漏掉這次的資料
+    state.save()
+    return results
+
+
+def print_report(results: Dict[str, List[StageReport]]):
+    print("\nPipeline report:")
+    print(f"  {'source':<12} {'stage':<10} {'seconds':>8} {'attempts':>8} {'records':>8}  result")
+    for name, reports in results.items():
+        for report in reports:
+            records = "-" if report.records is None else report.records
+            print(f"  {name:<12} {report.stage:<10} {report.seconds:8.2f} {report.attempts:8d} "
+                  f"{records:>8}  {report.error or 'ok'}")
+
+
+def build_sources(names: List[str], args, state: CrawlerState) -> List[Source]:
+    unknown = [name for name in names if name not in SOURCE_NAMES]
+    if unknown:
+        raise SystemExit(f"Unknown source(s): {', '.join(unknown)} (available: {', '.join(SOURCE_NAMES)})")
+    # 美股指數共用同一個 keep-alive Session，並限制對 slickcharts 的同時請求數
+    session = make_session(pool_size=max(len(i18n.INDEX_FILES), args.per_host))
+    limiter = HostLimiter(args.per_host)
+    sources: List[Source] = []
+    for name in names:
+        if name == "mops":
+            sources.append(MopsSource(state, year=args.year, season=args.season, engine=args.engine,
+                                      probe=not args.no_probe, retries=args.retries, backoff=args.backoff))
+        else:
+            sources.append(SlickchartsSource(name, session, limiter, state,
+                                             retries=args.retries, backoff=args.backoff))
+    return sources
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="執行所有爬蟲來源並發布資料")
+    parser.add_argument("--only", help=f"以逗號分隔的來源（預設全部：{','.join(SOURCE_NAMES)}）")
+    parser.add_argument("--concurrency", type=int, help="同時執行的來源數（預設全部同時）")
+    parser.add_argument("--publish-retries", type=int, default=DEFAULT_PUBLISH_RETRIES,
+                        help="發布失敗後的重試次數")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="單一 HTTP 請求的重試次數")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help="重試的退避基準秒數")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                        help="同一主機同時進行中的請求上限")
+    parser.add_argument("--year", type=int, help="MOPS 民國年（需與 --season 一起指定）")
+    parser.add_argument("--season", type=int, choices=[1, 2, 3, 4], help="MOPS 季度")
+    parser.add_argument("--no-probe", action="store_true", help="MOPS 不探測最新季度，直接依日期推測")
+    parser.add_argument("--engine", default="stream", choices=["stream", "legacy"], help="MOPS 解析引擎")
+    parser.add_argument("--upload", action="store_true", help="發布後以 kv_upload.py 上傳變動的資料")
+    parser.add_argument("--http-cache", choices=http_cache.MODES, default=http_cache.MODE or None,
+                        help="錄製 HTTP 回應，或只由錄製的回應離線執行")
+    parser.add_argument("--http-cache-dir", default=http_cache.CACHE_DIR, help="錄製回應的目錄")
+    args = parser.parse_args(argv)
+    if (args.year is None) != (args.season is None):
+        parser.error("--year and --season must be given together")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    http_cache.configure(args.http_cache, args.http_cache_dir)
+    names = [name.strip() for name in args.only.split(",") if name.strip()] if args.only else SOURCE_NAMES
+    state = CrawlerState()
+    started = time.perf_counter()
+    results = run_pipeline(build_sources(names, args, state), state, args.concurrency,
+                           args.publish_retries, args.backoff)
+    print_report(results)
+    print(f"Total wall time: {time.perf_counter() - started:.2f}s")
+
+    status = 0
+    if args.upload:
+        # 失敗的來源沿用上次發布的資料，其餘變動照常上傳
+        import kv_upload
+        status = kv_upload.main(["--data-dir", DATA_DIR])
+    failed = [name for name, reports in results.items() if not succeeded(reports)]
+    if failed:
+        print(f"Failed sources: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+資料快照的原子發布
+
+爬蟲不再直接覆寫 data/ 下的檔案，而是：
+
+1. 以目前發布中的版本為基礎建立暫存的新世代（檔案以硬連結共用，不複製）
+2. 所有寫入都先寫到暫存檔再 rename，不會改動舊世代的檔案
+3. 驗證新世代的內容
+4. 將暫存目錄 rename 為 data/generations/<id>，再以 os.replace 原子替換
+   指標檔 data/CURRENT
+
+發布前會先產生跨資料集的公司實體對照表 entities.json（見 entities.py），
+再將世代內容編譯成 catalog.bin（見 compiled_catalog.py），API worker 以 mmap 直接開啟。
+
+API 只依 CURRENT 指向的世代讀取（世代目錄建立後不再變動），因此不會讀到
+寫到一半的檔案，也不會在同一個快照中混到兩次抓取的資料。發布後變動的檔案
+會同步回 data/ 頂層，供 git commit 與上傳 KV 使用。
+
+同一時間只允許一個爬蟲持有暫存世代（以檔案鎖串行化）。
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from compiled_catalog import compile_catalog
+from entities import ENTITIES_FILE, build_entity_table
+
+try:
+    import fcntl
+except ImportError:  # Windows 不支援 flock，僅靠單一排程避免同時執行
+    fcntl = None
+
+GENERATIONS_DIR = "generations"
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".publish.lock"
+
+# 保留的舊世代數（讓仍在讀取舊世代的程序有時間完成）
+KEEP_GENERATIONS = int(os.environ.get("KEEP_GENERATIONS", "3"))
+
+# 非資料檔（wrangler 的 node 設定檔）
+IGNORED_FILES = {"package.json", "package-lock.json"}
+
+# 追加式紀錄檔所在的子目錄
+LOG_DIR = "history"
+
+
+def list_data_files(root: str) -> List[str]:
+    """列出世代（或 data/）中的資料檔：頂層的 *.json 與 history/ 下的紀錄檔"""
+    names = []
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return names
+    for entry in entries:
+        if entry.is_file() and entry.name.endswith(".json") and entry.name not in IGNORED_FILES:
+            names.append(entry.name)
+    log_dir = os.path.join(root, LOG_DIR)
+    if os.path.isdir(log_dir):
+        for name in os.listdir(log_dir):
+            if os.path.isfile(os.path.join(log_dir, name)):
+                names.append(os.path.join(LOG_DIR, name))
+    return sorted(names)
+
+
+def current_generation(data_dir: str) -> Optional[str]:
+    """CURRENT 指向的世代 ID；尚未以世代方式發布過時為 None"""
+    try:
+        with open(os.path.join(data_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            generation = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if generation and os.path.isdir(os.path.join(data_dir, GENERATIONS_DIR, generation)):
+        return generation
+    return None
+
+
+def resolve_root(data_dir: str):
+    """回傳 (實際讀取的目錄, 世代 ID)；沒有世代時直接讀 data/"""
+    generation = current_generation(data_dir)
+    if generation is None:
+        return data_dir, None
+    return os.path.join(data_dir, GENERATIONS_DIR, generation), generation
+
+
+def _write_atomic(path: str, content: bytes):
+    """寫入同目錄的暫存檔後 rename，讀取端只會看到完整的舊檔或新檔"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _dump_json(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+class Generation:
+    """
+    一次爬蟲執行的暫存世代
+
+        with Generation(DATA_DIR) as generation:
+            generation.write_json("sp500_data.json", data)
+            generation.publish()
+
+    未呼叫 publish() 就離開（或發生例外）時，暫存內容會被丟棄。
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.generations_dir = os.path.join(data_dir, GENERATIONS_DIR)
+        self.staging = None
+        self.changed: Dict[str, bool] = {}
+        self._lock_file = None
+
+    def __enter__(self) -> "Generation":
+        os.makedirs(self.generations_dir, exist_ok=True)
+        self._lock_file = open(os.path.join(self.data_dir, LOCK_FILE), 'a')
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            # 先前中斷的執行留下的暫存目錄
+            for name in os.listdir(self.generations_dir):
+                if name.startswith(".staging-"):
+                    shutil.rmtree(os.path.join(self.generations_dir, name), ignore_errors=True)
+            self.staging = tempfile.mkdtemp(dir=self.generations_dir, prefix=".staging-")
+            self._populate()
+        except BaseException:
+            self._cleanup()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cleanup()
+        return False
+
+    def _populate(self):
+        """以目前發布中的內容為基礎；已發布的世代不可變，可直接硬連結"""
+        base, generation = resolve_root(self.data_dir)
+        for name in list_data_files(base):
+            source = os.path.join(base, name)
+            target = os.path.join(self.staging, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if generation is not None:
+                try:
+                    os.link(source, target)
+                    continue
+                except OSError:
+                    pass
+            # 第一次從 data/ 頂層建立世代（或不支援硬連結）時複製
+            shutil.copy2(source, target)
+
+    def _cleanup(self):
+        if self.staging and os.path.isdir(self.staging):
+            shutil.rmtree(self.staging, ignore_errors=True)
+        self.staging = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def path(self, name: str) -> str:
+        """暫存世代中的檔案路徑（讀取用；寫入請用 write_json / append_lines）"""
+        return os.path.join(self.staging, name)
+
+    def read_json(self, name: str):
+        try:
+            with open(self.path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_json(self, name: str, data) -> bool:
+        """
+        寫入 JSON；序列化結果與現有檔案完全相同時不寫入，回傳是否寫入
+        比較的是位元組而非正規化的雜湊，只有順序改變（例如成分股排名）也會寫入
+        """
+        content = _dump_json(data)
+        try:
+            with open(self.path(name), 'rb') as f:
+                if f.read() == content:
+                    return False
+        except FileNotFoundError:
+            pass
+        _write_atomic(self.path(name), content)
+        self.changed[name] = True
+        return True
+
+    def append_lines(self, name: str, lines: Iterable[str]) -> int:
+        """追加多行到紀錄檔（寫成新檔再替換，硬連結的舊世代不受影響）"""
+        lines = list(lines)
+        if not lines:
+            return 0
+        try:
+            with open(self.path(name), 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = b""
+        if content and not content.endswith(b"\n"):
+            content += b"\n"
+        content += ("\n".join(lines) + "\n").encode("utf-8")
+        _write_atomic(self.path(name), content)
+        self.changed[name] = True
+        return len(lines)
+
+    def validate(self):
+        """檢查這次寫入的檔案；有問題時拋出 ValueError，不發布"""
+        for name in self.changed:
+            path = self.path(name)
+            with open(path, 'r', encoding='utf-8') as f:
+                if name.endswith(".jsonl"):
+                    for number, line in enumerate(f, 1):
+                        if line.strip():
+                            try:
+                                json.loads(line)
+                            except ValueError as e:
+                                raise ValueError(f"{name}:{number}: {e}")
+                    continue
+                data = json.load(f)
+            if not data:
+                raise ValueError(f"{name} is empty")
+
+        summary = self.read_json("funds_summary.json") or []
+        for fund in summary:
+            if fund.get("file") and not os.path.exists(self.path(fund["file"])):
+                raise ValueError(f"funds_summary.json refers to missing file {fund['file']}")
+
+    def normalize(self):
+        """依這個世代的所有成分股重建實體對照表（內容未變時不重寫）"""
+        files = {}
+        for name in list_data_files(self.staging):
+            if name.endswith(".json") and name != ENTITIES_FILE:
+                files[name] = self.read_json(name)
+        self.write_json(ENTITIES_FILE, build_entity_table(files))
+
+    def publish(self) -> Optional[str]:
+        """
+        驗證並發布新世代，回傳世代 ID
+        沒有任何檔案變動時不發布（API 與 git 都不會看到變化），回傳 None
+        """
+        if not self.changed:
+            print("No data changes, nothing to publish")
+            return None
+        self.normalize()
+        self.validate()
+        # 與資料一起發布編譯好的目錄
+        compile_catalog(self.staging, list_data_files(self.staging))
+
+        # 世代 ID 依時間排序，供 _prune 判斷新舊
+        generation = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+        target = os.path.join(self.generations_dir, generation)
+        if os.path.exists(target):
+            raise RuntimeError(f"Generation {generation} already exists")
+        os.rename(self.staging, target)
+        self.staging = None
+
+        # 指標替換是唯一讓新世代生效的動作
+        _write_atomic(os.path.join(self.data_dir, CURRENT_FILE), (generation + "\n").encode("utf-8"))
+        print(f"Published data generation {generation} ({len(self.changed)} file(s) changed)")
+
+        self._mirror(target)
+        self._prune(generation)
+        return generation
+
+    def _mirror(self, root: str):
+        """將變動的檔案同步回 data/ 頂層（git commit 與 KV 上傳讀取此處）"""
+        for name in self.changed:
+            with open(os.path.join(root, name), 'rb') as f:
+                _write_atomic(os.path.join(self.data_dir, name), f.read())
+
+    def _prune(self, keep: str):
+        generations = sorted(name for name in os.listdir(self.generations_dir)
+                             if not name.startswith("."))
+        for name in generations[:-KEEP_GENERATIONS]:
+            if name != keep:
+                shutil.rmtree(os.path.join(self.generations_dir, name), ignore_errors=True)
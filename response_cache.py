@@ -0,0 +1,141 @@
+"""
+預先序列化的回應內容：每個資料快照只將同一份回應編碼成 JSON 一次，
+並附上以內容雜湊計算的強 ETag 與預先壓縮的 gzip / brotli 版本。
+
+客戶端帶 If-None-Match 且資料未變時直接回 304，不再重新編碼與傳送。
+"""
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+
+from metrics import CACHE_REQUESTS, NOT_MODIFIED
+
+try:
+    import brotli
+except ImportError:  # brotli 為選用套件
+    brotli = None
+
+# 小於此大小的回應不壓縮
+MIN_COMPRESS_SIZE = 512
+
+# 預先壓縮可以用最高等級，成本只在每個快照付一次
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    gzip: Optional[bytes]
+    br: Optional[bytes]
+
+
+def render_json(payload: Any) -> bytes:
+    """與 FastAPI JSONResponse 相同的序列化方式，輸出位元組完全一致"""
+    return json.dumps(
+        payload,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def content_etag(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def compress_body(body: bytes) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """(gzip, brotli) 版本；太小或未安裝 brotli 時對應的值為 None"""
+    gz = br = None
+    if len(body) >= MIN_COMPRESS_SIZE:
+        gz = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            br = brotli.compress(body, quality=BROTLI_QUALITY)
+    return gz, br
+
+
+def encode_body(payload: Any) -> CachedBody:
+    """序列化並計算 ETag 與壓縮版本"""
+    body = render_json(payload)
+    return CachedBody(body, content_etag(body), *compress_body(body))
+
+
+class ResponseCache:
+    """同一個快照內的回應快取；快照替換時整個快取隨之丟棄"""
+
+    def __init__(self):
+        self._bodies: Dict[str, CachedBody] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, build: Callable[[], Any]) -> CachedBody:
+        cached = self._bodies.get(key)
+        if cached is None:
+            with self._lock:
+                cached = self._bodies.get(key)
+                if cached is None:
+                    CACHE_REQUESTS.inc(result="miss")
+                    cached = encode_body(build())
+                    self._bodies[key] = cached
+                    return cached
+        CACHE_REQUESTS.inc(result="hit")
+        return cached
+
+    def __len__(self):
+        return len(self._bodies)
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """檢查 Accept-Encoding 是否接受某種編碼（q=0 視為拒絕）"""
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() not in (coding, "*"):
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比對；同內容的不同壓縮版本視為相同"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag.split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def cached_response(request: Request, cached: CachedBody) -> Response:
+    """依 If-None-Match 與 Accept-Encoding 回傳 304 或對應版本的內容"""
+    accept_encoding = request.headers.get("accept-encoding", "")
+    body, coding = cached.body, None
+    if cached.br is not None and _accepts(accept_encoding, "br"):
+        body, coding = cached.br, "br"
+    elif cached.gzip is not None and _accepts(accept_encoding, "gzip"):
+        body, coding = cached.gzip, "gzip"
+
+    etag = f'"{cached.etag}-{coding}"' if coding else f'"{cached.etag}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, cached.etag):
+        NOT_MODIFIED.inc()
+        return Response(status_code=304, headers=headers)
+
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
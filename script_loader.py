@@ -0,0 +1,16 @@
+"""
+載入檔名含 '-' 的爬蟲腳本（例如 crawler-i18n.py，無法直接 import）
+pipeline.py、tests/ 與 bench/ 共用
+"""
+import importlib.util
+import os
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(file_name: str, module_name: str):
+    """以 module_name 載入 repo 根目錄下的 file_name"""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
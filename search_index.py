@@ -0,0 +1,173 @@
+"""
+公司名稱搜尋索引：每個資料快照建立一次，查詢時不再逐筆比對所有檔案。
+
+- 字元 bigram 倒排索引：處理中文名稱（台積電、台新新光金）與任意子字串查詢
+- 英文單字排序表：支援單字前綴查詢（"alph" -> Alphabet Inc）
+- 名稱與代號排序表：以二分搜尋處理 /suggest 的前綴補全
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+# 異體字統一，讓「台灣」也能找到「臺灣」
+VARIANTS = str.maketrans({'臺': '台'})
+
+TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+# 排名分數
+SCORE_CODE = 100
+SCORE_EXACT = 90
+SCORE_PREFIX = 80
+SCORE_WORD_PREFIX = 60
+SCORE_CODE_PREFIX = 50
+SCORE_SUBSTRING = 40
+
+# 前綴掃描的上限，避免單一字元前綴掃過整張表
+PREFIX_SCAN_LIMIT = 2000
+
+
+def normalize(text: str) -> str:
+    """全半形、大小寫與異體字正規化"""
+    return unicodedata.normalize("NFKC", text).casefold().translate(VARIANTS).strip()
+
+
+def ngrams(text: str, n: int = 2) -> Set[str]:
+    """字元 n-gram（去除空白）；長度不足 n 時回傳整個字串"""
+    text = "".join(text.split())
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class Document(NamedTuple):
+    code: str
+    company: str
+    market: str
+    indices: Tuple[str, ...]
+    key: str
+    tokens: Tuple[str, ...]
+
+
+def _prefix_range(keys: List[str], prefix: str) -> Iterable[int]:
+    """回傳排序表中以 prefix 開頭的元素位置"""
+    start = bisect_left(keys, prefix)
+    for i in range(start, min(len(keys), start + PREFIX_SCAN_LIMIT)):
+        if not keys[i].startswith(prefix):
+            break
+        yield i
+
+
+class SearchIndex:
+    """不可變的搜尋索引，隨 Snapshot 一起建立"""
+
+    def __init__(self, docs: List[Document]):
+        self.docs = docs
+        self.grams: Dict[str, Set[int]] = {}
+        self.chars: Dict[str, Set[int]] = {}
+        self.codes: Dict[str, List[int]] = {}
+        token_docs: Dict[str, Set[int]] = {}
+
+        for doc_id, doc in enumerate(docs):
+            for gram in ngrams(doc.key):
+                self.grams.setdefault(gram, set()).add(doc_id)
+            for char in set(doc.key.replace(" ", "")):
+                self.chars.setdefault(char, set()).add(doc_id)
+            for token in doc.tokens:
+                token_docs.setdefault(token, set()).add(doc_id)
+            self.codes.setdefault(doc.code.casefold(), []).append(doc_id)
+
+        # 前綴查詢用的排序表
+        self.token_keys = sorted(token_docs)
+        self.token_docs = [sorted(token_docs[t]) for t in self.token_keys]
+        names = sorted((doc.key, doc_id) for doc_id, doc in enumerate(docs))
+        self.name_keys = [key for key, _ in names]
+        self.name_docs = [doc_id for _, doc_id in names]
+        self.code_keys = sorted(self.codes)
+
+    @classmethod
+    def build(cls, files: Dict, datasets: Iterable) -> "SearchIndex":
+        """由快照的檔案內容與資料集清單建立索引；同市場同代號只建一筆文件"""
+        merged: Dict[Tuple[str, str], Tuple[str, List[str]]] = {}
+        for dataset in datasets:
+            for code, company in (files.get(dataset.file) or {}).items():
+                entry = merged.setdefault((dataset.market, code), (company, []))
+                if dataset.id not in entry[1]:
+                    entry[1].append(dataset.id)
+
+        docs = []
+        for (market, code), (company, indices) in merged.items():
+            key = normalize(company)
+            docs.append(Document(code, company, market, tuple(indices), key,
+                                 tuple(dict.fromkeys(TOKEN_RE.findall(key)))))
+        return cls(docs)
+
+    def _candidates(self, query: str) -> Set[int]:
+        """以 bigram（或單字元）倒排索引取得可能包含 query 的文件"""
+        compact = "".join(query.split())
+        if len(compact) == 1:
+            return set(self.chars.get(compact, ()))
+        postings = [self.grams.get(gram) for gram in ngrams(compact)]
+        if not postings or any(p is None for p in postings):
+            return set()
+        postings.sort(key=len)
+        result = set(postings[0])
+        for p in postings[1:]:
+            result &= p
+            if not result:
+                break
+        return result
+
+    def _score(self, doc: Document, query: str) -> int:
+        if doc.key == query:
+            return SCORE_EXACT
+        if doc.key.startswith(query):
+            return SCORE_PREFIX
+        if any(token.startswith(query) for token in doc.tokens):
+            return SCORE_WORD_PREFIX
+        return SCORE_SUBSTRING
+
+    def _rank(self, scored: Dict[int, int]) -> List[int]:
+        # 分數高者優先，其次為被較多指數／基金持有者、名稱較短者
+        return sorted(scored, key=lambda i: (-scored[i], -len(self.docs[i].indices),
+                                             len(self.docs[i].company), self.docs[i].code))
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[int, List[Document]]:
+        """
+        子字串搜尋公司名稱（與舊版 `in` 比對結果相同），並加入代號完全符合
+        回傳 (總筆數, 該頁結果)
+        """
+        query = normalize(query)
+        if not query:
+            return 0, []
+
+        scored = {}
+        for doc_id in self._candidates(query):
+            if query in self.docs[doc_id].key:
+                scored[doc_id] = self._score(self.docs[doc_id], query)
+        for doc_id in self.codes.get(query, ()):
+            scored[doc_id] = SCORE_CODE
+
+        ranked = self._rank(scored)
+        return len(ranked), [self.docs[i] for i in ranked[offset:offset + limit]]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Document]:
+        """前綴補全：名稱開頭、英文單字開頭或股票代號開頭"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        scored = {}
+        for i in _prefix_range(self.code_keys, prefix):
+            score = SCORE_CODE if self.code_keys[i] == prefix else SCORE_CODE_PREFIX
+            for doc_id in self.codes[self.code_keys[i]]:
+                scored[doc_id] = max(scored.get(doc_id, 0), score)
+        for i in _prefix_range(self.token_keys, prefix):
+            for doc_id in self.token_docs[i]:
+                scored.setdefault(doc_id, SCORE_WORD_PREFIX)
+        for i in _prefix_range(self.name_keys, prefix):
+            doc_id = self.name_docs[i]
+            score = SCORE_EXACT if self.name_keys[i] == prefix else SCORE_PREFIX
+            scored[doc_id] = max(scored.get(doc_id, 0), score)
+
+        return [self.docs[i] for i in self._rank(scored)[:limit]]
@@ -0,0 +1,13 @@
+"""
+測試共用設定：將 repo 根目錄加入 sys.path，並提供載入檔名含 '-' 的爬蟲腳本的 helper（script_loader）
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from script_loader import load_script  # noqa: E402
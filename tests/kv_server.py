@@ -0,0 +1,88 @@
+"""
+Cloudflare KV bulk write API 的最小替身（測試用）
+
+只實作 kv_upload.py 用到的 PUT /accounts/{account}/storage/kv/namespaces/{namespace}/bulk，
+回應格式與 Cloudflare 相同（{"success": ..., "errors": [...]}）。
+
+    with KVServer() as server:
+        client = KVClient("account", "namespace", "token", api_base=server.url)
+        server.fail_keys = {"SP500"}    # 含有這些 key 的批次整批失敗（HTTP 400）
+        server.store["namespace"]       # 已寫入的 {key: value}
+        server.requests                 # 每個請求送出的 key 列表
+"""
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set
+
+BULK_PATH = re.compile(r"^/accounts/[^/]+/storage/kv/namespaces/([^/]+)/bulk$")
+
+
+class KVServer:
+    def __init__(self, token: str = "token"):
+        self.token = token
+        self.store: Dict[str, Dict[str, str]] = {}
+        self.requests: List[List[str]] = []
+        self.fail_keys: Set[str] = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/client/v4"
+
+    def __enter__(self) -> "KVServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+    def _put_bulk(self, namespace: str, authorization: str, body: bytes):
+        """回傳 (HTTP 狀態碼, 回應內容)"""
+        if authorization != f"Bearer {self.token}":
+            return 401, {"success": False, "errors": [{"code": 10000, "message": "Authentication error"}]}
+        try:
+            pairs = json.loads(body)
+        except ValueError:
+            return 400, {"success": False, "errors": [{"code": 10001, "message": "invalid JSON"}]}
+        keys = [pair["key"] for pair in pairs]
+        with self._lock:
+            self.requests.append(keys)
+            failing = sorted(self.fail_keys.intersection(keys))
+            if failing:
+                return 400, {"success": False,
+                             "errors": [{"code": 10021, "message": f"rejected {', '.join(failing)}"}]}
+            values = self.store.setdefault(namespace, {})
+            for pair in pairs:
+                values[pair["key"]] = pair["value"]
+        return 200, {"success": True, "errors": [], "result": {"successful_key_count": len(keys)}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_PUT(self):
+                match = BULK_PATH.match(self.path.replace("/client/v4", "", 1))
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if match is None:
+                    status, result = 404, {"success": False, "errors": [{"code": 7003, "message": "No route"}]}
+                else:
+                    status, result = server._put_bulk(match.group(1), self.headers.get("Authorization", ""), body)
+                content = json.dumps(result).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
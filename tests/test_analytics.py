@@ -0,0 +1,133 @@
+"""
+analytics：各基金最新一季權重的排序、累計權重與集中度，以及穿透曝險（/exposure）
+"""
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as api
+from analytics import HoldingWeights
+from holdings_store import HoldingsHistory, append_quarters
+from publish import Generation
+
+# (基金 ID, 基金名稱, 檔名, 持股)；0100 只有 fund_*.json，持股歷史中沒有任何一季
+FUNDS = [
+    ("0050", "元大台灣卓越50", "fund_0050.json",
+     [("2330", "台積電", 50.0, 1000), ("2317", "鴻海", 30.0, 500), ("2454", "聯發科", 20.0, None)]),
+    ("台灣高股息", "台灣高股息", "fund_台灣高股息.json",
+     [("2303", "聯電", 60.0, 3000), ("2330", "台積電", 40.0, 800)]),
+    ("0100", "元大台灣中型100", "fund_0100.json", None),
+]
+
+
+def build_history() -> HoldingsHistory:
+    history = HoldingsHistory()
+    for fund, fund_name, _, holdings in FUNDS:
+        if holdings is not None:
+            history.add(fund, fund_name, 114, 2, [list(holding) for holding in holdings])
+    return history
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    with Generation(str(tmp_path)) as generation:
+        summary = []
+        for fund, fund_name, file_name, holdings in FUNDS:
+            generation.write_json(file_name, {code: name for code, name, _, _ in holdings or [("2308", "台達電", None, None)]})
+            summary.append({"fund_name": fund_name, "fund_code": fund if fund.isdigit() else None,
+                            "holdings_count": len(holdings or []), "file": file_name})
+        generation.write_json("funds_summary.json", summary)
+        append_quarters(generation, [(fund, fund_name, 114, 2, holdings)
+                                     for fund, fund_name, _, holdings in FUNDS if holdings is not None])
+        generation.publish()
+    monkeypatch.setattr(api.catalog, "data_dir", str(tmp_path))
+    with TestClient(api.app) as client:
+        yield client
+
+
+def test_top_orders_by_weight_with_missing_weights_last():
+    history = build_history()
+    history.add("0050", "元大台灣卓越50", 114, 3,
+                [["2412", "中華電", None], ["2330", "台積電", 50.0, 1000], ["2317", "鴻海", 30.0], ["2454", "聯發科", 20.0]])
+    weights = HoldingWeights.build(history)
+    position = weights.positions["0050"]
+    assert (weights.quarters[position].year, weights.quarters[position].season) == (114, 3)
+    assert [(h["rank"], h["code"], h["weight"], h["cumulative_weight"]) for h in weights.top(position)] == [
+        (1, "2330", 50.0, 50.0), (2, "2317", 30.0, 80.0), (3, "2454", 20.0, 100.0), (4, "2412", None, None)]
+    assert [h["code"] for h in weights.top(position, n=2)] == ["2330", "2317"]
+    assert weights.top(position)[0]["shares"] == 1000
+
+
+@pytest.mark.parametrize("cumulative, expected", [(30, 1), (50, 1), (50.01, 2), (80, 2), (100, 3)])
+def test_top_until_cumulative_weight(cumulative, expected):
+    weights = HoldingWeights.build(build_history())
+    assert len(weights.top(weights.positions["0050"], cumulative=cumulative)) == expected
+
+
+def test_concentration():
+    weights = HoldingWeights.build(build_history())
+    assert weights.concentration(weights.positions["0050"]) == {
+        "fund": "0050", "fund_name": "元大台灣卓越50", "holdings_count": 3, "weighted_count": 3,
+        "total_weight": 100.0, "top10_weight": 100.0, "hhi": 0.38, "effective_holdings": 2.63}
+    assert weights.concentration(weights.positions["台灣高股息"])["hhi"] == 0.52
+
+
+def test_concentration_without_weights():
+    history = HoldingsHistory()
+    history.add("摩臺", "摩臺", 114, 2, [["2330", "台積電", None]])
+    concentration = HoldingWeights.build(history).concentration(0)
+    assert concentration["weighted_count"] == 0
+    assert concentration["hhi"] is None and concentration["top10_weight"] is None
+
+
+def test_top_and_concentration_endpoints(client):
+    top = client.get("/funds/0050/top", params={"n": 2}).json()
+    assert top["period"] == "114Q2"
+    assert [h["code"] for h in top["holdings"]] == ["2330", "2317"]
+    assert [h["code"] for h in client.get("/funds/0056/top", params={"cumulative": 60}).json()["holdings"]] == ["2303"]
+    assert client.get("/funds/0050/concentration").json()["hhi"] == 0.38
+    assert [fund["fund"] for fund in client.get("/funds/concentration").json()["funds"]] == ["0050", "台灣高股息"]
+
+    missing = client.get("/funds/0100/top")
+    assert missing.status_code == 404 and "No weight data" in missing.json()["detail"]
+    assert client.get("/funds/XYZ/concentration").status_code == 404
+
+
+def test_exposure_is_amounts_times_weight_matrix():
+    weights = HoldingWeights.build(build_history())
+    amounts = np.zeros(len(weights.funds))
+    amounts[weights.positions["0050"]] = 100.0
+    amounts[weights.positions["台灣高股息"]] = 50.0
+    exposure = weights.exposure(amounts)
+    assert {weights.code_strings[code]: round(float(value), 6)
+            for code, value in enumerate(exposure) if value} == {
+        "2330": 70.0, "2317": 30.0, "2454": 20.0, "2303": 30.0}
+
+
+def test_exposure_sums_repeated_funds_and_lists_funds_without_weights(client):
+    body = client.get("/exposure", params={"positions": "0050:60,0056:50,0050:40,0100:10,XYZ:5",
+                                           "breakdown": "true"}).json()
+    assert [stock["exposure"] for stock in body["stocks"]] == [70.0, 30.0, 30.0, 20.0]
+    assert {stock["code"]: stock["exposure"] for stock in body["stocks"]} == {
+        "2330": 70.0, "2303": 30.0, "2317": 30.0, "2454": 20.0}
+    assert body["stocks"][0]["funds"] == {"0050": 50.0, "台灣高股息": 20.0}
+    assert body["total"] == 150.0
+    assert body["covered"] == 150.0
+    assert body["no_weight_data"] == ["0100"]
+    assert body["not_found"] == ["XYZ"]
+
+
+def test_post_exposure_matches_get(client):
+    positions = [{"fund": "0050", "amount": 100}, {"fund": "0056", "amount": 50}]
+    posted = client.post("/exposure", json={"positions": positions}).json()
+    assert posted == client.get("/exposure", params={"positions": "0050:100,0056:50"}).json()
+
+
+@pytest.mark.parametrize("positions", ["0050", "0050:abc", "0050:-1", "0050:0", ":100", "0050:nan", "0050:inf"])
+def test_invalid_positions_are_rejected(client, positions):
+    assert client.get("/exposure", params={"positions": positions}).status_code == 400
+
+
+def test_invalid_posted_amount_is_rejected(client):
+    response = client.post("/exposure", json={"positions": [{"fund": "0050", "amount": -1}]})
+    assert response.status_code == 400
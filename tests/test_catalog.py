@@ -0,0 +1,87 @@
+"""
+catalog：檔案變動時重新載入、載入失敗時保留舊快照，以及停止時取消背景工作
+"""
+import asyncio
+import json
+import os
+
+from catalog import StockCatalog
+
+
+def write(path, content, mtime_ns=None):
+    path.write_text(content if isinstance(content, str) else json.dumps(content), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_file_change_triggers_reload(tmp_path):
+    write(tmp_path / "sp500_data.json", {"AAPL": "Apple Inc."}, 1_000_000_000)
+    catalog = StockCatalog(str(tmp_path), reload_interval=0)
+    assert catalog.reload()
+    first = catalog.snapshot
+    assert not catalog.reload()
+    assert catalog.snapshot is first
+
+    write(tmp_path / "sp500_data.json", {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp"}, 2_000_000_000)
+    assert catalog.reload()
+    assert catalog.snapshot.version == first.version + 1
+    assert catalog.snapshot.get("sp500_data.json") == {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp"}
+    assert catalog.snapshot.search.search("microsoft")[0] == 1
+
+
+def test_failed_load_keeps_old_snapshot(tmp_path):
+    write(tmp_path / "sp500_data.json", {"AAPL": "Apple Inc."}, 1_000_000_000)
+    catalog = StockCatalog(str(tmp_path), reload_interval=0)
+    catalog.reload()
+    old = catalog.snapshot
+
+    # 寫到一半的檔案
+    write(tmp_path / "sp500_data.json", '{"AAPL": "Apple', 2_000_000_000)
+    assert not catalog.reload()
+    assert catalog.snapshot is old
+    assert catalog.snapshot.get("sp500_data.json") == {"AAPL": "Apple Inc."}
+
+    # 檔案寫完後下一次檢查即載入
+    write(tmp_path / "sp500_data.json", {"MSFT": "Microsoft Corp"}, 3_000_000_000)
+    assert catalog.reload()
+    assert catalog.snapshot.get("sp500_data.json") == {"MSFT": "Microsoft Corp"}
+
+
+def test_watcher_reloads_and_stop_cancels_background_tasks(tmp_path):
+    write(tmp_path / "sp500_data.json", {"AAPL": "Apple Inc."}, 1_000_000_000)
+    catalog = StockCatalog(str(tmp_path), reload_interval=0.01)
+
+    async def scenario():
+        await catalog.start()
+        warming, watcher = catalog._warming, catalog._task
+        version = catalog.snapshot.version
+        write(tmp_path / "sp500_data.json", {"MSFT": "Microsoft Corp"}, 2_000_000_000)
+        for _ in range(500):
+            if catalog.snapshot.version > version:
+                break
+            await asyncio.sleep(0.01)
+        await catalog.stop()
+        return warming, watcher
+
+    warming, watcher = asyncio.run(scenario())
+    assert catalog.snapshot.get("sp500_data.json") == {"MSFT": "Microsoft Corp"}
+    assert warming.done() and watcher.done()
+    assert catalog._warming is None and catalog._task is None
+
+
+def test_stop_cancels_pending_warm(tmp_path, monkeypatch):
+    write(tmp_path / "sp500_data.json", {"AAPL": "Apple Inc."})
+    catalog = StockCatalog(str(tmp_path), reload_interval=0)
+
+    async def never_warm(snapshot):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(catalog, "_warm", never_warm)
+
+    async def scenario():
+        await catalog.start()
+        warming = catalog._warming
+        await catalog.stop()
+        return warming
+
+    assert asyncio.run(scenario()).cancelled()
@@ -0,0 +1,69 @@
+"""
+changefeed：變動紀錄的寫入（第一次爬取為基準）與 /changes 的資料集篩選
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import app as api
+from changefeed import CHANGES_FILE, read_changes, record_changes
+from publish import Generation
+
+
+def crawl(data_dir, sp500, fund):
+    """模擬一次 i18n 與 mops 的爬取"""
+    with Generation(str(data_dir)) as generation:
+        snapshots = {"SP500": (generation.read_json("sp500_data.json"), sp500)}
+        funds = {"台灣高股息": (generation.read_json("fund_台灣高股息.json"), fund)}
+        generation.write_json("sp500_data.json", sp500)
+        generation.write_json("fund_台灣高股息.json", fund)
+        generation.write_json("funds_summary.json", [
+            {"fund_name": "台灣高股息", "fund_code": None, "holdings_count": len(fund),
+             "file": "fund_台灣高股息.json"},
+        ])
+        recorded = record_changes(generation, "i18n", snapshots) + record_changes(generation, "mops", funds)
+        generation.publish()
+    return recorded
+
+
+def test_first_crawl_is_baseline(tmp_path):
+    assert crawl(tmp_path, {"AAPL": "Apple Inc."}, {"2330": "台積電"}) == 0
+    assert read_changes(str(tmp_path / CHANGES_FILE)) == []
+
+
+def test_later_crawls_record_added_removed_and_renamed(tmp_path):
+    crawl(tmp_path, {"AAPL": "Apple Inc.", "FB": "Facebook Inc"}, {"2330": "台積電"})
+    assert crawl(tmp_path, {"AAPL": "Apple Inc.", "FB": "Meta Platforms Inc", "NVDA": "NVIDIA Corp"},
+                 {"2330": "台積電"}) == 1
+    assert crawl(tmp_path, {"AAPL": "Apple Inc."}, {"2330": "台積電", "2317": "鴻海"}) == 2
+
+    entries = read_changes(str(tmp_path / CHANGES_FILE))
+    assert [(entry["seq"], entry["dataset"]) for entry in entries] == [(1, "SP500"), (2, "SP500"), (3, "台灣高股息")]
+    assert entries[0]["added"] == {"NVDA": "NVIDIA Corp"}
+    assert entries[0]["renamed"] == {"FB": ["Facebook Inc", "Meta Platforms Inc"]}
+    assert entries[1]["removed"] == {"FB": "Meta Platforms Inc", "NVDA": "NVIDIA Corp"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    crawl(tmp_path, {"AAPL": "Apple Inc."}, {"2330": "台積電"})
+    crawl(tmp_path, {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp"}, {"2330": "台積電", "2317": "鴻海"})
+    monkeypatch.setattr(api.catalog, "data_dir", str(tmp_path))
+    with TestClient(api.app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("dataset, expected", [
+    ("SP500", ["SP500"]),
+    ("sp500", ["SP500"]),
+    ("台灣高股息", ["台灣高股息"]),
+    ("0056", ["台灣高股息"]),
+])
+def test_changes_filter_resolves_dataset(client, dataset, expected):
+    response = client.get("/changes", params={"dataset": dataset})
+    assert response.status_code == 200
+    assert [entry["dataset"] for entry in response.json()["changes"]] == expected
+
+
+def test_changes_filter_unknown_dataset(client):
+    assert client.get("/changes", params={"dataset": "nope"}).status_code == 404
+    assert len(client.get("/changes").json()["changes"]) == 2
@@ -0,0 +1,140 @@
+"""
+compiled_catalog：catalog.bin 編譯後以 mmap 讀回的內容必須與原本的 JSON 相同
+"""
+import json
+import os
+import shutil
+
+import pytest
+
+import catalog
+from catalog import build_membership, load_snapshot, scan_signature
+from compiled_catalog import CATALOG_FILE, CompiledCatalog, FileView, compile_catalog
+from conftest import ROOT_DIR
+from datasets import list_datasets
+from publish import Generation, list_data_files
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    """repo 的資料加上重複的公司名稱與非成分股檔，編譯成 catalog.bin"""
+    root = tmp_path_factory.mktemp("data")
+    for name in list_data_files(os.path.join(ROOT_DIR, "data")):
+        if not name.startswith("history"):
+            shutil.copy(os.path.join(ROOT_DIR, "data", name), root / name)
+    (root / "stock_data_0050.json").write_text(json.dumps({"2330": "台積電", "2317": "鴻海"}, ensure_ascii=False),
+                                               encoding="utf-8")
+    return root
+
+
+@pytest.fixture(scope="module")
+def files(data_dir):
+    result = {}
+    for name in list_data_files(str(data_dir)):
+        with open(data_dir / name, 'r', encoding='utf-8') as f:
+            result[name] = json.load(f)
+    return result
+
+
+@pytest.fixture(scope="module")
+def compiled(data_dir):
+    compile_catalog(str(data_dir), list_data_files(str(data_dir)), signature={"CURRENT": "test"})
+    return CompiledCatalog(str(data_dir / CATALOG_FILE))
+
+
+def test_files_round_trip(compiled, files):
+    assert sorted(compiled.files) == sorted(files)
+    for name, content in files.items():
+        restored = compiled.files[name]
+        assert restored == content
+        # {代號: 名稱} 檔案保留原檔順序
+        if isinstance(content, dict):
+            assert list(restored) == list(content)
+        assert compiled.files.row_count(name) == len(content)
+    assert compiled.signature == {"CURRENT": "test"}
+
+
+def test_files_are_materialized_once(compiled):
+    assert compiled.files["sp500_data.json"] is compiled.files["sp500_data.json"]
+    assert "missing.json" not in compiled.files
+    assert compiled.files.row_count("missing.json") == 0
+    with pytest.raises(KeyError):
+        compiled.files["missing.json"]
+
+
+def test_datasets_and_membership_match_json(compiled, files):
+    datasets = list_datasets(files)
+    assert compiled.datasets == datasets
+    membership = build_membership(files, datasets)
+    assert len(compiled.membership) == len(membership)
+    assert list(compiled.membership) == sorted(membership)
+    for code, markets in membership.items():
+        assert compiled.membership[code] == markets
+    assert "NO-SUCH-CODE" not in compiled.membership
+    assert compiled.membership.get(2330) is None
+
+
+def test_rejects_foreign_and_incompatible_files(tmp_path, compiled):
+    foreign = tmp_path / "foreign.bin"
+    foreign.write_bytes(b"NOTACATALOG" + b"\0" * 16)
+    with pytest.raises(ValueError):
+        CompiledCatalog(str(foreign))
+
+    with open(compiled.path, 'rb') as f:
+        content = f.read()
+    incompatible = tmp_path / "incompatible.bin"
+    incompatible.write_bytes(content.replace(b'"version": 1', b'"version": 9', 1))
+    with pytest.raises(ValueError):
+        CompiledCatalog(str(incompatible))
+
+
+def test_snapshot_from_generation_uses_catalog(tmp_path, monkeypatch, files):
+    with Generation(str(tmp_path)) as generation:
+        for name, content in files.items():
+            generation.write_json(name, content)
+        generation.publish()
+
+    snapshot = load_snapshot(str(tmp_path))
+    assert isinstance(snapshot.files, FileView)
+    for name, content in files.items():
+        assert snapshot.get(name) == content
+        assert snapshot.row_count(name) == len(content)
+
+    monkeypatch.setattr(catalog, "USE_COMPILED", False)
+    json_snapshot = load_snapshot(str(tmp_path))
+    assert not isinstance(json_snapshot.files, FileView)
+    assert snapshot.datasets == json_snapshot.datasets
+    assert dict(snapshot.membership) == json_snapshot.membership
+
+
+def test_warm_does_not_materialize_files(tmp_path, files):
+    with Generation(str(tmp_path)) as generation:
+        for name, content in files.items():
+            generation.write_json(name, content)
+        generation.publish()
+
+    snapshot = load_snapshot(str(tmp_path))
+    snapshot.warm()
+    assert snapshot.files._materialized == {}
+    assert snapshot.search.search("台積電")[0]
+    assert snapshot.overlap.positions
+
+    # 請求已還原過的檔案時沿用同一個物件
+    sp500 = snapshot.get("sp500_data.json")
+    assert snapshot.sources["sp500_data.json"] is sp500
+    assert list(snapshot.files._materialized) == ["sp500_data.json"]
+
+
+def test_stale_top_level_catalog_falls_back_to_json(tmp_path, data_dir):
+    for name in list_data_files(str(data_dir)):
+        shutil.copy(data_dir / name, tmp_path / name)
+    names = list_data_files(str(tmp_path))
+
+    compile_catalog(str(tmp_path), names, signature=scan_signature(str(tmp_path)))
+    assert isinstance(load_snapshot(str(tmp_path)).files, FileView)
+
+    # 編譯後資料檔又被修改：catalog.bin 已過期
+    (tmp_path / "sp500_data.json").write_text(json.dumps({"AAPL": "Apple Inc."}), encoding="utf-8")
+    snapshot = load_snapshot(str(tmp_path))
+    assert not isinstance(snapshot.files, FileView)
+    assert snapshot.get("sp500_data.json") == {"AAPL": "Apple Inc."}
@@ -0,0 +1,56 @@
+"""
+datasets：由資料檔建立資料集，以及路由表的查詢（不分大小寫、基金的 ETF 代碼與名稱）
+"""
+from datasets import Dataset, DatasetRegistry, list_datasets
+
+FILES = {
+    "dowjones_data.json": {"KO": "Coca-Cola Co"},
+    "sp500_data.json": {"AAPL": "Apple Inc."},
+    "russell2000_data.json": {"AA": "Alcoa Corp"},
+    "all_stock_data.json": {"SP500": {"AAPL": "Apple Inc."}},
+    "stock_data_0050.json": {"2330": "台積電"},
+    "fund_0050.json": {"2330": "台積電"},
+    "fund_台灣高股息.json": {"2303": "聯電"},
+    "fund_摩臺.json": {"2330": "台積電"},
+    "funds_summary.json": [
+        {"fund_name": "元大台灣卓越50", "fund_code": "0050", "holdings_count": 1, "file": "fund_0050.json"},
+        {"fund_name": "台灣高股息", "fund_code": None, "holdings_count": 1, "file": "fund_台灣高股息.json"},
+        # 傘型基金的子基金寫入同一個檔案，只列一次
+        {"fund_name": "台灣高股息", "fund_code": None, "holdings_count": 1, "file": "fund_台灣高股息.json"},
+        # 檔案不存在的基金不列出
+        {"fund_name": "元大台灣中型100", "fund_code": "0100", "holdings_count": 0, "file": "fund_0100.json"},
+        {"fund_name": "摩臺", "fund_code": None, "holdings_count": 1, "file": "fund_摩臺.json"},
+    ],
+}
+
+
+def test_list_datasets_orders_markets_and_skips_non_tables():
+    assert list_datasets(FILES) == [
+        Dataset("US", "index", "SP500", "SP500", "sp500_data.json"),
+        Dataset("US", "index", "DOWJONES", "DOWJONES", "dowjones_data.json"),
+        Dataset("US", "index", "RUSSELL2000", "RUSSELL2000", "russell2000_data.json"),
+        Dataset("TW", "index", "0050", "0050", "stock_data_0050.json"),
+        Dataset("TW", "fund", "0050", "元大台灣卓越50", "fund_0050.json"),
+        Dataset("TW", "fund", "台灣高股息", "台灣高股息", "fund_台灣高股息.json"),
+        Dataset("TW", "fund", "摩臺", "摩臺", "fund_摩臺.json"),
+    ]
+
+
+def test_resolve_is_case_insensitive_and_prefers_indices():
+    registry = DatasetRegistry(list_datasets(FILES))
+    assert registry.resolve(" sp500 ").file == "sp500_data.json"
+    assert registry.resolve("RussELL2000").id == "RUSSELL2000"
+    # 0050 同時是台股指數與基金：resolve 取指數，resolve_fund 取基金
+    assert registry.resolve("0050").file == "stock_data_0050.json"
+    assert registry.resolve_fund("0050").file == "fund_0050.json"
+    assert registry.resolve("nope") is None
+    assert [dataset.id for dataset in registry.market("tw")] == ["0050", "台灣高股息", "摩臺"]
+    assert registry.ids()["US"] == ["SP500", "DOWJONES", "RUSSELL2000"]
+
+
+def test_funds_resolve_by_etf_code_and_name():
+    registry = DatasetRegistry(list_datasets(FILES))
+    assert registry.resolve("0056").file == "fund_台灣高股息.json"
+    assert registry.resolve_fund("元大台灣卓越50").id == "0050"
+    assert registry.resolve_fund("摩臺").id == "摩臺"
+    assert registry.resolve_fund("SP500") is None
@@ -0,0 +1,105 @@
+"""
+entities：名稱正規化、以 union-find 合併同一公司的代號，以及實體查詢
+"""
+import pytest
+
+from entities import ENTITIES_FILE, EntityTable, _UnionFind, build_entity_table, canonical_name
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Alphabet Inc. Class A Common Stock", "alphabet"),
+    ("Alphabet Inc (Class C)", "alphabet"),
+    ("The Walt Disney Company", "walt disney"),
+    ("AT&T Inc.", "at and t"),
+    ("ＮＶＩＤＩＡ　Corp", "nvidia"),
+    ("Taiwan Semiconductor Manufacturing Co Ltd ADR", "taiwan semiconductor manufacturing"),
+    ("台積電", "台積電"),
+    ("Inc", ""),
+])
+def test_canonical_name(name, expected):
+    assert canonical_name(name) == expected
+
+
+def test_union_find_merges_transitively():
+    groups = _UnionFind()
+    groups.union("c", "b")
+    groups.union("d", "e")
+    assert groups.find("b") == groups.find("c") == "b"
+    groups.union("e", "c")
+    # 根為最小的元素，與合併順序無關
+    assert {groups.find(item) for item in "bcde"} == {"b"}
+    assert groups.find("z") == "z"
+
+
+def test_union_find_compresses_paths():
+    groups = _UnionFind()
+    for a, b in zip("edcb", "dcba"):
+        groups.union(a, b)
+    assert groups.find("e") == "a"
+    assert groups.parent["e"] == "a"
+
+
+FILES = {
+    "sp500_data.json": {"GOOGL": "Alphabet Inc. Class A", "GOOG": "Alphabet Inc. Class C",
+                        "NVDA": "NVIDIA Corp", "DIS": "Walt Disney Co"},
+    "nasdaq100_data.json": {"GOOGL": "Alphabet Inc", "GOOG": "Alphabet Inc", "NVDA": "Nvidia Corporation",
+                            "ABC": "Acme Holdings"},
+    "dowjones_data.json": {"DIS": "The Walt Disney Company", "XYZ": "Acme Holdings Inc"},
+    "fund_0050.json": {"2330": "台積電", "2454": "聯發科"},
+    "fund_0100.json": {"2330": "台灣積體電路製造"},
+    "funds_summary.json": [
+        {"fund_name": "元大台灣卓越50", "fund_code": "0050", "holdings_count": 2, "file": "fund_0050.json"},
+        {"fund_name": "元大台灣中型100", "fund_code": "0100", "holdings_count": 1, "file": "fund_0100.json"},
+    ],
+}
+
+
+@pytest.fixture(scope="module")
+def table():
+    return EntityTable.from_json(build_entity_table(FILES))
+
+
+def test_share_classes_and_name_variants_form_one_entity(table):
+    alphabet = table.resolve("GOOG")
+    assert alphabet is table.resolve("GOOGL")
+    assert alphabet.id == "US:GOOG"
+    assert set(alphabet.codes) == {"GOOG", "GOOGL"}
+    # 各名稱出現次數相同時以較短者為顯示名稱
+    assert table.resolve("NVDA").name == "NVIDIA Corp"
+    assert table.resolve("NVDA").aliases == ("NVIDIA Corp", "Nvidia Corporation")
+    assert set(table.resolve("DIS").aliases) == {"Walt Disney Co", "The Walt Disney Company"}
+
+
+def test_different_codes_with_the_same_name_are_merged(table):
+    # ABC 與 XYZ 正規化後名稱相同，經名稱合併為同一實體
+    assert table.resolve("ABC") is table.resolve("XYZ")
+    assert table.resolve("ABC").id == "US:ABC"
+
+
+def test_markets_are_never_merged(table):
+    tsmc = table.resolve("2330")
+    assert tsmc.id == "TW:2330"
+    assert tsmc.market == "TW"
+    # 相同代號的不同名稱記為別名
+    assert tsmc.name == "台積電"
+    assert set(tsmc.aliases) == {"台積電", "台灣積體電路製造"}
+    assert table.resolve("2454").id == "TW:2454"
+    assert len({entity.id for entity in table.entities}) == len(table.entities) == 6
+
+
+def test_resolve_by_entity_id_or_code(table):
+    # 只有代表代號是實體 ID
+    assert table.resolve("us:googl") is None
+    assert table.resolve("us:goog").id == "US:GOOG"
+    assert table.resolve(" nvda ").id == "US:NVDA"
+    assert table.resolve("MISSING") is None
+
+
+def test_load_rebuilds_missing_or_outdated_table():
+    outdated = dict(FILES, **{ENTITIES_FILE: {"version": 0, "names": [], "entities": []}})
+    table = EntityTable.load(outdated, None)
+    assert table.resolve("GOOGL").id == "US:GOOG"
+
+    published = dict(FILES, **{ENTITIES_FILE: build_entity_table(FILES)})
+    assert [entity.id for entity in EntityTable.load(published, None).entities] == \
+        [entity.id for entity in table.entities]
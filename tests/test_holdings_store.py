@@ -0,0 +1,104 @@
+"""
+holdings_store：指定季度（含）以前最近一次持股的查詢（as_of / holders_as_of）與 /funds/{id}/holdings
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import app as api
+from holdings_store import HoldingsHistory, append_quarters
+from publish import Generation
+
+# (基金, 基金名稱, 年度, 季度, 持股)；0050 缺 113Q3，年度交界為 113Q4 -> 114Q1
+QUARTERS = [
+    ("0050", "元大台灣卓越50", 113, 2, [("2330", "台積電", 50.0, 1000), ("2317", "鴻海", 10.0, 200)]),
+    ("0050", "元大台灣卓越50", 113, 4, [("2330", "台積電", 55.0, 1100)]),
+    ("0050", "元大台灣卓越50", 114, 1, [("2330", "台積電", 56.0, 1200), ("2454", "聯發科", 5.0, None)]),
+    ("台灣高股息", "台灣高股息", 113, 3, [("2317", "鴻海", 4.0, 300)]),
+]
+
+
+def build_history() -> HoldingsHistory:
+    history = HoldingsHistory()
+    for fund, fund_name, year, season, holdings in QUARTERS:
+        history.add(fund, fund_name, year, season, [list(holding) for holding in holdings])
+    return history
+
+
+def period(quarter):
+    return None if quarter is None else (quarter.year, quarter.season)
+
+
+@pytest.mark.parametrize("year, season, expected", [
+    (113, 1, None),        # 第一次公布之前
+    (113, 2, (113, 2)),    # 恰好為公布的季度
+    (113, 3, (113, 2)),    # 缺少的季度沿用前一次
+    (113, 4, (113, 4)),
+    (114, 1, (114, 1)),    # 跨年度
+    (120, 4, (114, 1)),    # 晚於最後一次公布
+])
+def test_as_of_boundaries(year, season, expected):
+    assert period(build_history().as_of("0050", year, season)) == expected
+
+
+def test_as_of_unknown_fund():
+    assert build_history().as_of("9999", 114, 1) is None
+
+
+def test_readding_a_quarter_replaces_it():
+    history = build_history()
+    history.add("0050", "元大台灣卓越50", 113, 4, [["2303", "聯電", 1.0]])
+    assert [period(quarter) for quarter in history.quarters("0050")] == [(113, 2), (113, 4), (114, 1)]
+    assert [h["code"] for h in history.holdings(history.as_of("0050", 113, 4))] == ["2303"]
+
+
+@pytest.mark.parametrize("code, year, season, expected", [
+    ("2317", 113, 2, [("0050", (113, 2))]),
+    ("2317", 113, 3, [("0050", (113, 2)), ("台灣高股息", (113, 3))]),
+    # 0050 在 113Q4 已不再持有鴻海
+    ("2317", 113, 4, [("台灣高股息", (113, 3))]),
+    ("2454", 113, 4, []),
+    ("2454", 114, 1, [("0050", (114, 1))]),
+    ("9999", 114, 1, []),
+])
+def test_holders_as_of(code, year, season, expected):
+    holders = build_history().holders_as_of(code, year, season)
+    assert [(fund, period(quarter)) for fund, quarter, _ in holders] == expected
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    with Generation(str(tmp_path)) as generation:
+        generation.write_json("fund_0050.json", {"2330": "台積電"})
+        generation.write_json("funds_summary.json", [
+            {"fund_name": "元大台灣卓越50", "fund_code": "0050", "holdings_count": 1, "file": "fund_0050.json"},
+        ])
+        append_quarters(generation, QUARTERS)
+        generation.publish()
+    monkeypatch.setattr(api.catalog, "data_dir", str(tmp_path))
+    with TestClient(api.app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({}, "114Q1"),
+    ({"year": 113, "season": 3}, "113Q2"),
+    ({"year": 113}, "113Q4"),
+    ({"year": 114, "season": 1}, "114Q1"),
+])
+def test_fund_holdings_as_of(client, params, expected):
+    body = client.get("/funds/0050/holdings", params=params).json()
+    assert body["period"] == expected
+    assert body["holdings_count"] == len(body["holdings"])
+
+
+def test_fund_holdings_errors(client):
+    assert client.get("/funds/0050/holdings", params={"season": 2}).status_code == 400
+    assert client.get("/funds/0050/holdings", params={"year": 113, "season": 1}).status_code == 404
+    assert client.get("/funds/9999/holdings").status_code == 404
+
+
+def test_stock_funds_as_of(client):
+    body = client.get("/stock/2317/funds", params={"year": 113, "season": 3}).json()
+    assert [(fund["fund"], fund["period"], fund["weight"]) for fund in body["funds"]] == [
+        ("0050", "113Q2", 10.0), ("台灣高股息", "113Q3", 4.0)]
+    assert client.get("/stock/2317/funds", params={"year": 113, "season": 1}).status_code == 404
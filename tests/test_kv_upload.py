@@ -0,0 +1,118 @@
+"""
+kv_upload：只上傳變動的 key、分批，以及 manifest 只在批次成功時更新
+"""
+import hashlib
+import json
+
+import pytest
+
+import kv_upload
+from kv_server import KVServer
+from kv_upload import KVClient, KVEntry, changed_entries, load_manifest, make_batches, upload
+from publish import Generation
+
+NAMESPACE = "namespace"
+
+
+def entry(key: str, value: str) -> KVEntry:
+    return KVEntry(key, f"{key}.json", value, hashlib.sha256(value.encode("utf-8")).hexdigest(), 1)
+
+
+@pytest.fixture
+def server():
+    with KVServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    return KVClient("account", NAMESPACE, server.token, api_base=server.url, retries=0)
+
+
+def test_make_batches_splits_by_key_count_and_size():
+    entries = [entry(f"K{i}", "x" * 10) for i in range(5)]
+    assert [len(batch) for batch in make_batches(entries, max_keys=2)] == [2, 2, 1]
+    # 每個 key 12 bytes（key 2 + value 10）
+    assert [len(batch) for batch in make_batches(entries, max_bytes=30)] == [2, 2, 1]
+    # 單一 key 超過上限時仍自成一批
+    assert [len(batch) for batch in make_batches([entry("BIG", "x" * 100)], max_bytes=30)] == [1]
+    assert make_batches([]) == []
+
+
+def test_changed_entries_compares_hashes():
+    entries = [entry("A", "1"), entry("B", "2"), entry("C", "3")]
+    uploaded = {"A": entries[0].sha256, "B": "stale"}
+    assert [e.key for e in changed_entries(entries, uploaded)] == ["B", "C"]
+
+
+def test_partial_batch_failure_then_retry(server, client):
+    entries = [entry(key, key.lower()) for key in ("A", "B", "C", "D", "E")]
+
+    server.fail_keys = {"C"}
+    uploaded, failed = upload(entries, client, {}, concurrency=2, max_keys=2)
+    # 批次 [A, B] 與 [E] 成功，含 C 的 [C, D] 整批失敗
+    assert sorted(uploaded) == ["A", "B", "E"]
+    assert sorted(failed) == ["C", "D"]
+    assert "400" in failed["C"]
+    assert server.store[NAMESPACE] == {"A": "a", "B": "b", "E": "e"}
+
+    server.fail_keys = set()
+    server.requests.clear()
+    uploaded, failed = upload(entries, client, uploaded, max_keys=2)
+    # 重試時只送出上次失敗的 key
+    assert failed == {}
+    assert server.requests == [["C", "D"]]
+    assert uploaded == {e.key: e.sha256 for e in entries}
+
+    server.requests.clear()
+    assert upload(entries, client, uploaded) == (uploaded, {})
+    assert server.requests == []
+
+
+def test_rejected_token_fails_every_key(server):
+    client = KVClient("account", NAMESPACE, "wrong", api_base=server.url, retries=0)
+    uploaded, failed = upload([entry("A", "a")], client, {})
+    assert uploaded == {}
+    assert list(failed) == ["A"]
+
+
+def publish_data(data_dir, sp500):
+    with Generation(str(data_dir)) as generation:
+        generation.write_json("sp500_data.json", sp500)
+        generation.write_json("fund_0050.json", {"2330": "台積電", "2317": "鴻海"})
+        generation.write_json("funds_summary.json", [
+            {"fund_name": "元大台灣卓越50", "fund_code": "0050", "holdings_count": 2, "file": "fund_0050.json"},
+        ])
+        generation.publish()
+
+
+def test_main_advances_manifest_only_for_successful_batches(tmp_path, monkeypatch, server):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CLOUDFLARE_API_TOKEN", server.token)
+    data_dir = tmp_path / "data"
+    manifest = tmp_path / "manifest.json"
+    args = ["--data-dir", str(data_dir), "--namespace-id", NAMESPACE, "--account-id", "account",
+            "--api-base", server.url, "--manifest", str(manifest)]
+    publish_data(data_dir, {"AAPL": "Apple Inc."})
+
+    server.fail_keys = {"SP500"}
+    assert kv_upload.main(args) == 1
+    # 唯一的批次失敗，manifest 沒有任何 key
+    assert load_manifest(NAMESPACE, str(manifest)) == {}
+    assert NAMESPACE not in server.store
+
+    server.fail_keys = set()
+    assert kv_upload.main(args) == 0
+    uploaded = load_manifest(NAMESPACE, str(manifest))
+    assert {"SP500", "TW0050"} <= set(uploaded)
+    assert json.loads(server.store[NAMESPACE]["SP500"]) == {"AAPL": "Apple Inc."}
+
+    # 沒有變動時不送出任何請求；只有變動的 key 會再上傳
+    server.requests.clear()
+    assert kv_upload.main(args) == 0
+    assert server.requests == []
+
+    publish_data(data_dir, {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp"})
+    assert kv_upload.main(args) == 0
+    assert server.requests == [["SP500"]]
+    assert load_manifest(NAMESPACE, str(manifest))["TW0050"] == uploaded["TW0050"]
@@ -0,0 +1,98 @@
+"""
+MOPS 最新季度探測與季度回補：以重播快取提供各季的回應（不連線）
+- latest_published_quarter 由日曆推測的季度往前略過尚未公布的季度
+- backfill 中斷後重新執行時略過 checkpoint 中已完成的季度
+"""
+import json
+import os
+
+import pytest
+import requests
+
+import http_cache
+from conftest import FIXTURE_DIR, load_script
+from holdings_store import HISTORY_FILE, read_records
+
+mops = load_script("crawler-mops-individual.py", "crawler_mops_individual")
+
+UNPUBLISHED = "<html><body><center>查無所需資料！</center></body></html>".encode("utf-8")
+
+
+def published_body() -> bytes:
+    """tests/fixtures/http 中錄製的 t78sb04 回應（所有基金）"""
+    cache = http_cache.HTTPCache(os.path.join(FIXTURE_DIR, "http"))
+    for entry in cache.entries():
+        if entry["url"] == mops.MOPS_URL and entry["status"] == 200:
+            return cache.load(entry["key"])["content"]
+    raise AssertionError("tests/fixtures/http has no recorded t78sb04 response")
+
+
+class ReplayCache:
+    """以 fetch_quarter 實際送出的請求本文為 key 寫入重播快取"""
+
+    def __init__(self, directory: str):
+        self.cache = http_cache.HTTPCache(directory)
+
+    def key(self, year: int, season: int, co_id: str = ''):
+        request = requests.Request("POST", mops.MOPS_URL, data=mops.mops_payload(year, season, co_id)).prepare()
+        return http_cache.request_key(request.method, request.url, request.body), request
+
+    def store(self, year: int, season: int, content: bytes, co_id: str = ''):
+        key, request = self.key(year, season, co_id)
+        self.cache.store(key, request.method, request.url, request.body, 200, "OK",
+                         {"Content-Type": "text/html; charset=utf-8"}, content)
+
+    def remove(self, year: int, season: int, co_id: str = ''):
+        os.remove(self.cache.path(self.key(year, season, co_id)[0]))
+
+
+@pytest.fixture
+def replay(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(http_cache, "MODE", "replay")
+    monkeypatch.setattr(http_cache, "CACHE_DIR", str(tmp_path / "http"))
+    monkeypatch.setattr(mops, "DATA_DIR", str(tmp_path / "data"))
+    return ReplayCache(str(tmp_path / "http"))
+
+
+def test_latest_published_quarter_steps_back_past_unpublished(replay, monkeypatch):
+    monkeypatch.setattr(mops, "calendar_quarter", lambda now=None: (114, 1))
+    replay.store(114, 1, UNPUBLISHED, co_id=mops.PROBE_CO_ID)
+    replay.store(113, 4, UNPUBLISHED, co_id=mops.PROBE_CO_ID)
+    replay.store(113, 3, published_body(), co_id=mops.PROBE_CO_ID)
+    assert mops.latest_published_quarter() == (113, 3)
+
+
+def test_latest_published_quarter_falls_back_to_calendar(replay, monkeypatch):
+    # 探測全部失敗（快取中沒有任何回應）時退回日曆推測
+    monkeypatch.setattr(mops, "calendar_quarter", lambda now=None: (114, 1))
+    replay.store(114, 1, UNPUBLISHED, co_id=mops.PROBE_CO_ID)
+    assert mops.latest_published_quarter(max_steps=2) == (114, 1)
+
+
+def test_backfill_resumes_after_partial_run(replay, tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    quarters = [(113, 1), (113, 2), (113, 3)]
+    body = published_body()
+    replay.store(113, 1, body)
+    replay.store(113, 3, UNPUBLISHED)
+
+    # 第一次執行：113Q2 沒有回應（失敗），113Q3 尚未公布，只有 113Q1 完成
+    first = mops.backfill(quarters, concurrency=1, rate=0, backoff=0,
+                          checkpoint=mops.BackfillCheckpoint(checkpoint_path))
+    assert list(first) == ["113Q1"]
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        assert list(json.load(f)) == ["113Q1"]
+
+    # 重新執行：113Q1 已在 checkpoint 中，即使快取中已沒有它的回應也不會再抓取
+    replay.remove(113, 1)
+    replay.store(113, 2, body)
+    second = mops.backfill(quarters, concurrency=1, rate=0, backoff=0,
+                           checkpoint=mops.BackfillCheckpoint(checkpoint_path))
+    assert list(second) == ["113Q2"]
+    assert second["113Q2"] == first["113Q1"]
+
+    checkpoint = mops.BackfillCheckpoint(checkpoint_path)
+    assert (113, 1) in checkpoint and (113, 2) in checkpoint and (113, 3) not in checkpoint
+    records = read_records(os.path.join(mops.DATA_DIR, HISTORY_FILE))
+    assert {(year, season) for _, year, season in records} == {(113, 1), (113, 2)}
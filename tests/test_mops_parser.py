@@ -0,0 +1,76 @@
+"""
+MOPS t78sb04 的兩種解析引擎（legacy / stream）在每個可取得的回應上輸出必須相同：
+bench/fixtures 的 HTML，以及 tests/fixtures/http 中錄製的 t78sb04 回應
+（以 readme 的錄製指令更新後，新的回應會自動納入）
+"""
+import contextlib
+import glob
+import io
+import os
+
+import pytest
+
+import http_cache
+from conftest import FIXTURE_DIR, ROOT_DIR, load_script
+
+mops = load_script("crawler-mops-individual.py", "crawler_mops_individual")
+
+
+def recorded_responses():
+    cache = http_cache.HTTPCache(os.path.join(FIXTURE_DIR, "http"))
+    cases = []
+    for entry in cache.entries():
+        if entry["url"] == mops.MOPS_URL and entry["status"] == 200:
+            cases.append(pytest.param(cache.load(entry["key"])["content"].decode("utf-8"),
+                                      id=f"recorded-{entry['key'][:12]}"))
+    return cases
+
+
+def bench_fixtures():
+    cases = []
+    for path in sorted(glob.glob(os.path.join(ROOT_DIR, "bench", "fixtures", "mops_*.html"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            cases.append(pytest.param(f.read(), id=os.path.basename(path)))
+    return cases
+
+
+def run_parser(engine: str, html: str):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return list(mops.PARSERS[engine](html))
+
+
+@pytest.mark.parametrize("html", recorded_responses() + bench_fixtures())
+def test_stream_parser_matches_legacy(html):
+    stream = run_parser("stream", html)
+    assert stream, "no funds found"
+    assert stream == run_parser("legacy", html)
+
+
+def test_recorded_response_is_available():
+    assert recorded_responses(), "tests/fixtures/http has no recorded t78sb04 response"
+
+
+def fund_header(name: str) -> str:
+    return f"<table><tr><td>{name}證券投資信託基金    公司代號：    A00005</td></tr></table>"
+
+
+HOLDINGS_TD_HEADER = """<table>
+<tr><td>股票代號</td><td>股票名稱</td><td>持股數</td><td>持股比率</td></tr>
+<tr><td>2330</td><td>台積電</td><td>1,000</td><td>50.5</td></tr>
+<tr><td>小計</td><td></td><td></td><td></td></tr>
+</table>"""
+
+
+def test_td_header_parsed_by_both_engines():
+    html = f"<html><body>{fund_header('元大台灣卓越50')}{HOLDINGS_TD_HEADER}</body></html>"
+    expected = [("元大台灣卓越50", "0050", {"2330": "台積電"}, {"2330": (50.5, 1000.0)})]
+    assert run_parser("stream", html) == expected
+    assert run_parser("legacy", html) == expected
+
+
+def test_fund_header_without_holdings_does_not_swallow_next_fund():
+    html = ("<html><body>" + fund_header("元大台灣高股息") + fund_header("元大台灣卓越50")
+            + HOLDINGS_TD_HEADER + "</body></html>")
+    for engine in ("stream", "legacy"):
+        funds = run_parser(engine, html)
+        assert [(name, code) for name, code, _, _ in funds] == [("元大台灣卓越50", "0050")], engine
@@ -0,0 +1,91 @@
+"""
+paging：游標編碼、依位置切片的分頁，以及 /stocks 與 /market 的逐頁輸出
+"""
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app as api
+from conftest import ROOT_DIR
+from paging import Records, decode_cursor, encode_cursor, page
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(1200, "abc123")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "abc123") == 1200
+    assert decode_cursor(None, "abc123") == 0
+    assert decode_cursor("", "abc123") == 0
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor(-1, "abc123"), "W10", "eyJhIjoxfQ"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "abc123")
+    assert error.value.status_code == 400
+
+
+def test_cursor_from_another_snapshot():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(encode_cursor(10, "old"), "new")
+    assert error.value.status_code == 409
+
+
+def test_records_index_across_parts():
+    records = Records([({"index": "A"}, [("1", "one"), ("2", "two")]),
+                       ({"index": "B"}, []),
+                       ({"index": "C"}, [("3", "three")])])
+    assert len(records) == 3
+    assert records[2] == {"index": "C", "code": "3", "company": "three"}
+    assert records[-1] == records[2]
+    assert records[1:] == [{"index": "A", "code": "2", "company": "two"}, records[2]]
+    with pytest.raises(IndexError):
+        records[3]
+
+
+def test_page_slices_from_offset():
+    records = Records([({}, [(str(i), f"company {i}") for i in range(10)])])
+    assert page(records, 0, 4) == (records[0:4], True)
+    assert page(records, 8, 4) == (records[8:10], False)
+    assert page(records, 6, 4) == (records[6:10], False)
+    assert page(records, 3, None) == (records[3:], False)
+    assert page(records, 20, 4) == ([], False)
+
+
+@pytest.fixture(scope="module")
+def client():
+    data_dir, api.catalog.data_dir = api.catalog.data_dir, os.path.join(ROOT_DIR, "data")
+    with TestClient(api.app) as client:
+        yield client
+    api.catalog.data_dir = data_dir
+
+
+@pytest.mark.parametrize("path, key", [("/stocks/sp500", "stocks"), ("/market/us", None)])
+def test_pages_cover_full_response(client, path, key):
+    full = client.get(path).json()
+    expected = (list(full[key].items()) if key else
+                [(index, code, company) for index, stocks in full["data"].items() for code, company in stocks.items()])
+
+    rows, cursor = [], None
+    while True:
+        params = {"limit": 97, **({"cursor": cursor} if cursor else {})}
+        body = client.get(path, params=params).json()
+        rows.extend(tuple(record.values()) for record in body["records"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert rows == [row[-2:] if key else row for row in expected]
+
+
+def test_ndjson_ends_with_next_cursor(client):
+    lines = client.get("/stocks/sp500", params={"format": "ndjson", "limit": 2, "fields": "code"}).text.splitlines()
+    first, second, last = (json.loads(line) for line in lines)
+    assert list(first) == ["code"]
+
+    following = client.get("/stocks/sp500", params={"format": "ndjson", "limit": 1,
+                                                    "cursor": last["next_cursor"]}).text.splitlines()
+    third = client.get("/stocks/sp500", params={"limit": 3}).json()["records"][2]
+    assert json.loads(following[0]) == third
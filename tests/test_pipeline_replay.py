@@ -0,0 +1,72 @@
+"""
+以 tests/fixtures/http 中錄製的回應（slickcharts sp500 的 GET 與 MOPS t78sb04 113Q2 的 POST）
+離線執行 pipeline.py --http-cache replay（以及交由 pipeline 執行的 crawler-i18n.py），檢查發布的結果
+"""
+import json
+import os
+import subprocess
+import sys
+
+from conftest import FIXTURE_DIR, ROOT_DIR
+
+HTTP_FIXTURES = os.path.join(FIXTURE_DIR, "http")
+
+
+def run_pipeline(cwd, *args):
+    env = {name: value for name, value in os.environ.items() if not name.startswith("CRAWLER_")}
+    return subprocess.run(
+        [sys.executable, os.path.join(ROOT_DIR, "pipeline.py"), "--http-cache", "replay",
+         "--http-cache-dir", HTTP_FIXTURES, "--only", "sp500,mops", "--year", "113", "--season", "2",
+         "--backoff", "0", *args],
+        cwd=cwd, env=env, capture_output=True, text=True, timeout=120)
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_replay_publishes_without_network(tmp_path):
+    result = run_pipeline(tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    data_dir = tmp_path / "data"
+    current = (data_dir / "CURRENT").read_text().strip()
+    assert (data_dir / "generations" / current).is_dir()
+
+    sp500 = read_json(data_dir / "sp500_data.json")
+    assert len(sp500) == 503
+    assert sp500["AAPL"] == read_json(os.path.join(ROOT_DIR, "data", "sp500_data.json"))["AAPL"]
+
+    summary = read_json(data_dir / "funds_summary.json")
+    assert {fund["fund_code"] for fund in summary} >= {"0050", "0100"}
+    for fund in summary:
+        holdings = read_json(data_dir / fund["file"])
+        assert len(holdings) == fund["holdings_count"] > 0
+
+    # 第一次爬取的資料即為基準，不產生變動紀錄
+    assert not (data_dir / "history" / "changes.jsonl").exists()
+
+
+def test_replay_fails_for_unrecorded_request(tmp_path):
+    # 快取中沒有 113Q3 的回應：不連線、不重試，MOPS 失敗但 sp500 照常發布
+    result = run_pipeline(tmp_path, "--season", "3")
+    assert result.returncode == 1
+    assert "is not recorded" in result.stdout
+    assert len(read_json(tmp_path / "data" / "sp500_data.json")) == 503
+    assert not (tmp_path / "data" / "funds_summary.json").exists()
+
+
+def test_i18n_crawler_runs_through_pipeline(tmp_path):
+    # crawler-i18n.py 交由 pipeline 的 SlickchartsSource 執行；只錄製了 sp500，其餘指數失敗且不影響發布
+    env = {name: value for name, value in os.environ.items() if not name.startswith("CRAWLER_")}
+    env.update(CRAWLER_HTTP_CACHE="replay", CRAWLER_HTTP_CACHE_DIR=HTTP_FIXTURES)
+    result = subprocess.run([sys.executable, os.path.join(ROOT_DIR, "crawler-i18n.py"), "--backoff", "0"],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "Pipeline report" in result.stdout
+    assert "sp500: 503 stocks collected" in result.stdout
+    assert len(read_json(tmp_path / "data" / "sp500_data.json")) == 503
+    assert not (tmp_path / "data" / "nasdaq100_data.json").exists()
+    # 驗證資訊只記錄發布成功的來源
+    assert list(read_json(tmp_path / ".cache" / "crawler_state.json")) == ["sp500"]
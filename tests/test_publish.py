@@ -0,0 +1,117 @@
+"""
+publish.Generation：暫存世代的寫入與發布
+"""
+import json
+import os
+
+import pytest
+
+import publish
+from compiled_catalog import CATALOG_FILE
+from publish import CURRENT_FILE, Generation, current_generation, resolve_root
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_write_json_skips_identical_content(tmp_path):
+    with Generation(str(tmp_path)) as generation:
+        assert generation.write_json("sp500_data.json", {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp"})
+        generation.publish()
+
+    with Generation(str(tmp_path)) as generation:
+        assert not generation.write_json("sp500_data.json", {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp"})
+        assert generation.publish() is None
+
+
+def test_write_json_keeps_reordered_content(tmp_path):
+    with Generation(str(tmp_path)) as generation:
+        generation.write_json("sp500_data.json", {"AAPL": "Apple Inc.", "MSFT": "Microsoft Corp"})
+        generation.publish()
+
+    # 只有順序改變（例如權重排名變動）也要發布
+    with Generation(str(tmp_path)) as generation:
+        assert generation.write_json("sp500_data.json", {"MSFT": "Microsoft Corp", "AAPL": "Apple Inc."})
+        assert generation.publish() is not None
+
+    assert list(read_json(tmp_path / "sp500_data.json")) == ["MSFT", "AAPL"]
+
+
+def test_publish_swaps_current_and_mirrors_changed_files(tmp_path):
+    with Generation(str(tmp_path)) as generation:
+        generation.write_json("sp500_data.json", {"AAPL": "Apple Inc."})
+        first = generation.publish()
+    assert current_generation(str(tmp_path)) == first
+    assert read_json(tmp_path / "generations" / first / "sp500_data.json") == {"AAPL": "Apple Inc."}
+    # 變動的檔案同步回 data/ 頂層；編譯好的目錄只在世代中
+    assert read_json(tmp_path / "sp500_data.json") == {"AAPL": "Apple Inc."}
+    assert (tmp_path / "generations" / first / CATALOG_FILE).exists()
+
+    with Generation(str(tmp_path)) as generation:
+        generation.write_json("nasdaq100_data.json", {"MSFT": "Microsoft Corp"})
+        second = generation.publish()
+    assert second != first
+    assert (tmp_path / CURRENT_FILE).read_text().strip() == second
+    # 未修改的檔案由上一個世代硬連結而來
+    assert os.path.samefile(tmp_path / "generations" / first / "sp500_data.json",
+                            tmp_path / "generations" / second / "sp500_data.json")
+    # 舊世代不受新的寫入影響
+    assert not (tmp_path / "generations" / first / "nasdaq100_data.json").exists()
+
+
+def test_first_generation_starts_from_top_level_files(tmp_path):
+    (tmp_path / "dowjones_data.json").write_text(json.dumps({"KO": "Coca-Cola Co"}), encoding="utf-8")
+    with Generation(str(tmp_path)) as generation:
+        assert generation.read_json("dowjones_data.json") == {"KO": "Coca-Cola Co"}
+        generation.write_json("sp500_data.json", {"AAPL": "Apple Inc."})
+        generation.publish()
+    root, _ = resolve_root(str(tmp_path))
+    assert read_json(os.path.join(root, "dowjones_data.json")) == {"KO": "Coca-Cola Co"}
+
+
+def test_failed_run_leaves_current_untouched(tmp_path):
+    with Generation(str(tmp_path)) as generation:
+        generation.write_json("sp500_data.json", {"AAPL": "Apple Inc."})
+        published = generation.publish()
+
+    with pytest.raises(RuntimeError):
+        with Generation(str(tmp_path)) as generation:
+            generation.write_json("sp500_data.json", {"MSFT": "Microsoft Corp"})
+            raise RuntimeError("crawler failed")
+
+    # 驗證失敗（空的資料）也不發布
+    with Generation(str(tmp_path)) as generation:
+        generation.write_json("nasdaq100_data.json", {})
+        with pytest.raises(ValueError):
+            generation.publish()
+
+    assert current_generation(str(tmp_path)) == published
+    assert read_json(tmp_path / "sp500_data.json") == {"AAPL": "Apple Inc."}
+    assert not (tmp_path / "nasdaq100_data.json").exists()
+    assert os.listdir(tmp_path / "generations") == [published]
+
+
+def test_append_lines_does_not_touch_previous_generation(tmp_path):
+    with Generation(str(tmp_path)) as generation:
+        generation.write_json("sp500_data.json", {"AAPL": "Apple Inc."})
+        generation.append_lines("history/changes.jsonl", ['{"seq":1}'])
+        first = generation.publish()
+    with Generation(str(tmp_path)) as generation:
+        generation.append_lines("history/changes.jsonl", ['{"seq":2}'])
+        second = generation.publish()
+
+    assert (tmp_path / "generations" / first / "history" / "changes.jsonl").read_text() == '{"seq":1}\n'
+    assert (tmp_path / "generations" / second / "history" / "changes.jsonl").read_text() == '{"seq":1}\n{"seq":2}\n'
+    assert (tmp_path / "history" / "changes.jsonl").read_text() == '{"seq":1}\n{"seq":2}\n'
+
+
+def test_old_generations_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(publish, "KEEP_GENERATIONS", 2)
+    published = []
+    for count in range(4):
+        with Generation(str(tmp_path)) as generation:
+            generation.write_json("sp500_data.json", {f"S{i}": f"Stock {i}" for i in range(count + 1)})
+            published.append(generation.publish())
+    assert sorted(os.listdir(tmp_path / "generations")) == published[-2:]
@@ -0,0 +1,70 @@
+"""
+response_cache：快取回應的 ETag、If-None-Match -> 304 與 Accept-Encoding 協商
+"""
+import gzip
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as api
+from conftest import ROOT_DIR
+from response_cache import MIN_COMPRESS_SIZE, content_etag, encode_body, render_json
+
+
+@pytest.fixture(scope="module")
+def client():
+    data_dir, api.catalog.data_dir = api.catalog.data_dir, os.path.join(ROOT_DIR, "data")
+    with TestClient(api.app) as client:
+        yield client
+    api.catalog.data_dir = data_dir
+
+
+def get(client, path, **headers):
+    return client.get(path, headers={"Accept-Encoding": "identity", **headers})
+
+
+def test_etag_is_content_hash(client):
+    response = get(client, "/stocks/sp500")
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == f'"{content_etag(response.content)}"'
+    assert response.content == render_json(response.json())
+    assert response.headers["vary"] == "Accept-Encoding"
+    # 同一快照的同一回應 ETag 不變
+    assert get(client, "/stocks/sp500").headers["etag"] == response.headers["etag"]
+    assert get(client, "/stocks/dowjones").headers["etag"] != response.headers["etag"]
+
+
+def test_if_none_match_returns_304(client):
+    etag = get(client, "/stocks/sp500").headers["etag"]
+    tag = etag.strip('"')
+    for if_none_match in (etag, f'W/{etag}', f'"{tag}-gzip"', f'"other", {etag}', "*"):
+        response = get(client, "/stocks/sp500", **{"If-None-Match": if_none_match})
+        assert response.status_code == 304, if_none_match
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    assert get(client, "/stocks/sp500", **{"If-None-Match": '"other"'}).status_code == 200
+    assert get(client, "/stocks/dowjones", **{"If-None-Match": etag}).status_code == 200
+
+
+def test_gzip_negotiation(client):
+    identity = get(client, "/stocks/sp500")
+    with client.stream("GET", "/stocks/sp500", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+    assert len(raw) < len(identity.content)
+    assert gzip.decompress(raw) == identity.content
+
+    refused = client.get("/stocks/sp500", headers={"Accept-Encoding": "gzip;q=0, deflate"})
+    assert "content-encoding" not in refused.headers
+    assert refused.headers["etag"] == identity.headers["etag"]
+
+
+def test_small_bodies_are_not_compressed():
+    small = encode_body({"a": 1})
+    assert small.gzip is None and small.br is None
+    large = encode_body({str(i): "x" * 10 for i in range(MIN_COMPRESS_SIZE)})
+    assert gzip.decompress(large.gzip) == large.body
@@ -0,0 +1,76 @@
+"""
+search_index：/search 與 /suggest 的排名（代號 > 完全相同 > 名稱前綴 > 單字前綴 > 子字串）、同分排序與筆數限制
+"""
+from datasets import Dataset
+from search_index import SearchIndex
+
+FILES = {
+    "sp500_data.json": {
+        "GMT": "Gametal Inc",
+        "AMC": "Applied Meta Corp",
+        "MTLW": "Metal Works",
+        "MPLT": "Meta Platforms",
+        "MTA": "Meta",
+        "MTX": "Metax",
+        "MTB": "Metay",
+        "MET": "MetLife Inc.",
+    },
+    "nasdaq100_data.json": {"MPLT": "Meta Platforms"},
+    "fund_0050.json": {"2330": "台積電", "2317": "鴻海", "2303": "聯電"},
+    "fund_台灣高股息.json": {"2330": "台積電"},
+}
+
+DATASETS = [
+    Dataset("US", "index", "SP500", "SP500", "sp500_data.json"),
+    Dataset("US", "index", "NASDAQ100", "NASDAQ100", "nasdaq100_data.json"),
+    Dataset("TW", "fund", "0050", "元大台灣卓越50", "fund_0050.json"),
+    Dataset("TW", "fund", "台灣高股息", "台灣高股息", "fund_台灣高股息.json"),
+]
+
+INDEX = SearchIndex.build(FILES, DATASETS)
+
+
+def codes(docs):
+    return [doc.code for doc in docs]
+
+
+def test_search_ranks_exact_before_prefix_before_substring():
+    total, docs = INDEX.search("meta")
+    assert total == 7
+    # 完全相同、名稱前綴（多個指數持有者優先，其次名稱較短、代號）、單字前綴、子字串
+    assert codes(docs) == ["MTA", "MPLT", "MTB", "MTX", "MTLW", "AMC", "GMT"]
+
+
+def test_search_code_match_ranks_first():
+    total, docs = INDEX.search("met")
+    assert codes(docs)[0] == "MET"
+    assert total == 8
+
+
+def test_search_offset_and_limit():
+    total, page = INDEX.search("meta", offset=2, limit=3)
+    assert total == 7
+    assert codes(page) == ["MTB", "MTX", "MTLW"]
+    assert INDEX.search("meta", offset=7)[1] == []
+
+
+def test_search_normalizes_variants_and_width():
+    assert codes(INDEX.search("臺積")[1]) == ["2330"]
+    assert codes(INDEX.search("ＭＥＴＡ")[1])[0] == "MTA"
+    assert INDEX.search("  ") == (0, [])
+    assert INDEX.search("xyz") == (0, [])
+
+
+def test_search_merges_datasets_per_market():
+    doc = INDEX.search("2330")[1][0]
+    assert doc.indices == ("0050", "台灣高股息")
+    assert doc.market == "TW"
+
+
+def test_suggest_ranking_and_limit():
+    assert codes(INDEX.suggest("meta")) == ["MTA", "MPLT", "MTB", "MTX", "MTLW", "AMC"]
+    assert codes(INDEX.suggest("meta", limit=2)) == ["MTA", "MPLT"]
+    # 代號前綴同分：較多基金持有者優先，其次名稱較短、代號
+    assert codes(INDEX.suggest("23")) == ["2330", "2303", "2317"]
+    assert codes(INDEX.suggest("2317")) == ["2317"]
+    assert INDEX.suggest("") == []
@@ -19,28 +19,12 @@ fi
 
 cd "$ROOT_DIR"
 
-"$PYTHON_BIN" crawler-mops-individual.py
-"$PYTHON_BIN" crawler-i18n.py
+# 所有來源並行抓取並各自發布；部分來源失敗時仍上傳其餘的變動，最後以非零代碼結束
+status=0
+"$PYTHON_BIN" pipeline.py || status=$?
 
-cd "$DATA_DIR"
+# 只上傳內容有變動的資料集，以 KV bulk API 批次送出；
+# 上傳階段的耗時與各 key 的筆數寫入 .cache/metrics/upload.json（由 API 的 /metrics 輸出）
+"$PYTHON_BIN" kv_upload.py --data-dir "$DATA_DIR" --namespace-id "$KV_NAMESPACE_ID"
 
-if [[ ! -d node_modules ]]; then
-  echo "Node.js dependencies are missing in $DATA_DIR. Run 'npm ci' in the data directory first." >&2
-  exit 1
-fi
-
-upload_json() {
-  local key="$1"
-  local file_path="$2"
-
-  npx wrangler kv key put "$key" \
-    --namespace-id="$KV_NAMESPACE_ID" \
-    --path "$file_path" \
-    --remote
-}
-
-upload_json "SP500" "sp500_data.json"
-upload_json "TW0050" "fund_0050.json"
-upload_json "TW0100" "fund_0100.json"
-upload_json "nasdaq100" "nasdaq100_data.json"
-upload_json "dowjones" "dowjones_data.json"
+exit "$status"